@@ -0,0 +1,24 @@
+from contextlib import closing
+
+from minerva.directory import EntityType
+from minerva.directory.helpers import create_entity_from_name, \
+    names_to_entity_ids
+from minerva.test import clear_database
+
+
+def test_names_to_entity_ids(start_db_container):
+    conn = clear_database(start_db_container)
+
+    with closing(conn.cursor()) as cursor:
+        EntityType.create("Node", "")(cursor)
+        existing_id = create_entity_from_name(cursor, "Node", "Node=002")
+
+        names = ["Node=003", "Node=002", "Node=001", "Node=003"]
+
+        entity_ids = names_to_entity_ids(cursor, "node", names)
+
+        assert entity_ids[1] == existing_id
+        assert entity_ids[0] == entity_ids[3]
+        assert len(set(entity_ids)) == 3
+
+        assert names_to_entity_ids(cursor, "node", names) == entity_ids
@@ -0,0 +1,140 @@
+"""Test trend data storage using the binary COPY format."""
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from pytz import timezone
+
+from minerva.storage import DataPackage, datatype
+from minerva.storage.trend.trend import Trend
+from minerva.storage.trend.trendstorepart import TrendStorePart
+from minerva.storage.trend.trendstore import TrendStore
+from minerva.storage.trend.granularity import create_granularity
+from minerva.directory.datasource import DataSource
+from minerva.directory.entitytype import EntityType
+from minerva.db.query import Table, Column
+from minerva.test import clear_database, row_count
+from minerva.test.trend import refined_package_type_for_entity_type
+
+
+def create_trend_store(cursor, conn, part_name, trends, timestamp):
+    data_source = DataSource.from_name("test-src-binary")(cursor)
+    entity_type = EntityType.from_name("test-type-binary")(cursor)
+
+    trend_store = TrendStore.create(
+        TrendStore.Descriptor(
+            data_source,
+            entity_type,
+            create_granularity("900s"),
+            [TrendStorePart.Descriptor(part_name, trends)],
+            timedelta(seconds=86400),
+        )
+    )(cursor)
+
+    trend_store.create_partitions_for_timestamp(conn, timestamp)
+
+    return trend_store.part_by_name[part_name]
+
+
+def test_store_copy_from_binary(start_db_container):
+    conn = clear_database(start_db_container)
+
+    trends = [
+        Trend.Descriptor("CellID", datatype.registry["integer"], ""),
+        Trend.Descriptor("CCR", datatype.registry["numeric"], ""),
+        Trend.Descriptor("Load", datatype.registry["double precision"], ""),
+        Trend.Descriptor("Curve", datatype.registry["smallint[]"], ""),
+        Trend.Descriptor("Remark", datatype.registry["text"], ""),
+    ]
+
+    curr_timezone = timezone("Europe/Amsterdam")
+    timestamp = curr_timezone.localize(datetime(2013, 1, 2, 10, 45, 0))
+    modified = curr_timezone.localize(datetime.now())
+
+    data_rows = [
+        (10023, timestamp, ("10023", "0.9919", 0.5, [1, 2, None], "a")),
+        (10047, timestamp, ("10047", "-12.5", None, [], None)),
+    ]
+
+    data_package_type = refined_package_type_for_entity_type("test-type-binary")
+
+    with conn.cursor() as cursor:
+        part = create_trend_store(cursor, conn, "test_store_binary", trends, timestamp)
+
+        data_package = DataPackage(
+            data_package_type, create_granularity("900s"), trends, data_rows
+        )
+
+        part.store_copy_from_binary(data_package, modified, 42)(cursor)
+
+        conn.commit()
+
+        table = Table("trend", part.name)
+
+        table.select(
+            [Column("entity_id"), Column("timestamp"), Column("job_id")]
+            + [Column(trend.name) for trend in trends]
+        ).execute(cursor)
+
+        rows = sorted(cursor.fetchall())
+
+    assert rows == [
+        (10023, timestamp, 42, 10023, Decimal("0.9919"), 0.5, [1, 2, None], "a"),
+        (10047, timestamp, 42, 10047, Decimal("-12.5"), None, [], None),
+    ]
+
+
+def test_benchmark_binary_vs_text(start_db_container):
+    """Compare the duration of storing a wide package in text and binary format."""
+    conn = clear_database(start_db_container)
+
+    trend_count = 300
+    entity_count = 2000
+
+    trends = [
+        Trend.Descriptor(f"counter_{i}", datatype.registry["bigint"], "")
+        for i in range(trend_count)
+    ]
+
+    curr_timezone = timezone("Europe/Amsterdam")
+    timestamp = curr_timezone.localize(datetime(2013, 1, 2, 10, 45, 0))
+    modified = curr_timezone.localize(datetime.now())
+
+    data_rows = [
+        (entity_id, timestamp, tuple(entity_id * i for i in range(trend_count)))
+        for entity_id in range(entity_count)
+    ]
+
+    data_package_type = refined_package_type_for_entity_type("test-type-binary")
+
+    data_package = DataPackage(
+        data_package_type, create_granularity("900s"), trends, data_rows
+    )
+
+    durations = {}
+
+    with conn.cursor() as cursor:
+        part = create_trend_store(cursor, conn, "test_store_bench", trends, timestamp)
+
+        conn.commit()
+
+        table = Table("trend", part.name)
+
+        for name, store_copy_from in [
+            ("text", part.store_copy_from_text),
+            ("binary", part.store_copy_from_binary),
+        ]:
+            start = time.monotonic()
+
+            store_copy_from(data_package, modified, 1)(cursor)
+
+            durations[name] = time.monotonic() - start
+
+            assert row_count(cursor, table.identifier()) == entity_count
+
+            conn.rollback()
+
+    print(
+        f"text: {durations['text']:.3f}s, binary: {durations['binary']:.3f}s "
+        f"({entity_count} rows x {trend_count} trends)"
+    )
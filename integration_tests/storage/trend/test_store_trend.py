@@ -271,3 +271,122 @@ def test_update(start_db_container):
 
     assert rows[0][0] != rows[1][0]
     assert rows[0][1] != rows[1][1]
+
+
+def test_mark_modified_timestamps(start_db_container):
+    conn = clear_database(start_db_container)
+
+    curr_timezone = timezone("Europe/Amsterdam")
+
+    trends = [Trend.Descriptor("DROPS", datatype.registry["integer"], "")]
+
+    start = curr_timezone.localize(datetime(2013, 1, 2, 10, 0, 0))
+    timestamps = [start + timedelta(minutes=15 * i) for i in range(4)]
+
+    data_rows = [
+        (10023, timestamp, ("17",)) for timestamp in timestamps
+    ]
+
+    granularity = create_granularity("900s")
+    entity_type_name = "test-type001"
+
+    with conn.cursor() as cursor:
+        data_source = DataSource.from_name("test-src010")(cursor)
+        entity_type = EntityType.from_name(entity_type_name)(cursor)
+
+        trend_store = TrendStore.create(
+            TrendStore.Descriptor(
+                data_source,
+                entity_type,
+                granularity,
+                [TrendStorePart.Descriptor("test-store-modified", trends)],
+                timedelta(seconds=86400),
+            )
+        )(cursor)
+
+        trend_store.create_partitions_for_timestamp(conn, start)
+
+        conn.commit()
+
+        data_package_type = refined_package_type_for_entity_type(entity_type_name)
+        data_package = DataPackage(data_package_type, granularity, trends, data_rows)
+
+        trend_store.store(data_package, 1)(conn)
+
+        part = trend_store.part_by_name["test-store-modified"]
+
+        cursor.execute(
+            "SELECT timestamp FROM trend_directory.modified "
+            "WHERE trend_store_part_id = %s ORDER BY timestamp",
+            (part.id,),
+        )
+
+        assert [timestamp for timestamp, in cursor.fetchall()] == timestamps
+
+
+def test_store_via_staging(start_db_container):
+    conn = clear_database(start_db_container)
+
+    curr_timezone = timezone("Europe/Amsterdam")
+
+    trends = [
+        Trend.Descriptor("CCR", datatype.registry["numeric"], ""),
+        Trend.Descriptor("Drops", datatype.registry["integer"], ""),
+    ]
+
+    timestamp = curr_timezone.localize(datetime(2013, 1, 2, 10, 45, 0))
+    granularity = create_granularity("900s")
+    entity_type_name = "test-type001"
+
+    with conn.cursor() as cursor:
+        data_source = DataSource.from_name("test-src011")(cursor)
+        entity_type = EntityType.from_name(entity_type_name)(cursor)
+
+        trend_store = TrendStore.create(
+            TrendStore.Descriptor(
+                data_source,
+                entity_type,
+                granularity,
+                [TrendStorePart.Descriptor("test-store-staging", trends)],
+                timedelta(seconds=86400),
+            )
+        )(cursor)
+
+        trend_store.create_partitions_for_timestamp(conn, timestamp)
+
+        conn.commit()
+
+        part = trend_store.part_by_name["test-store-staging"]
+        data_package_type = refined_package_type_for_entity_type(entity_type_name)
+        modified = curr_timezone.localize(datetime.now())
+
+        part.store_copy_from(
+            DataPackage(
+                data_package_type, granularity, trends,
+                [(10023, timestamp, ("0.9919", "17"))]
+            ),
+            modified, 10
+        )(cursor)
+
+        part.store_via_staging(
+            DataPackage(
+                data_package_type, granularity, trends,
+                [
+                    (10023, timestamp, ("0.5555", "18")),
+                    (10047, timestamp, ("0.9963", "19")),
+                ]
+            ),
+            modified, 11
+        )(cursor)
+
+        conn.commit()
+
+        table = Table("trend", part.name)
+
+        table.select(
+            [Column("entity_id"), Column("job_id"), Column("Drops")]
+        ).execute(cursor)
+
+        rows = sorted(cursor.fetchall())
+
+    assert rows == [(10023, 11, 18), (10047, 11, 19)]
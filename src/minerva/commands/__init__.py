@@ -61,6 +61,19 @@ class LoadHarvestPlugin(argparse.Action):
         setattr(namespace, self.dest, plugin)
 
 
+def positive_int(value: str) -> int:
+    """Argument type for options like --jobs that must be at least 1."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: '{value}'")
+
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1: {number}")
+
+    return number
+
+
 def load_json(path):
     with open(path) as config_file:
         return json.load(config_file)
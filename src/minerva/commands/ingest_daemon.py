@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""Provides the ingest-daemon sub-command."""
+import logging
+import signal
+import threading
+from contextlib import closing
+from pathlib import Path
+
+from minerva.commands import ListPlugins, load_json
+from minerva.db.pool import configure_pool, pooled_connection
+from minerva.error import ConfigurationError
+from minerva.harvest.plugins import get_plugin
+from minerva.loading.loader import Loader
+from minerva.storage.trend.trendstore import TrendStore
+from minerva.loading.ingest import IngestDaemon, create_watcher, \
+    DEFAULT_POLL_INTERVAL, DEFAULT_SETTLE_TIME
+
+
+def setup_command_parser(subparsers):
+    cmd = subparsers.add_parser(
+        "ingest-daemon", help="load data files appearing in spool directories"
+    )
+
+    cmd.add_argument(
+        "directory", nargs="+", type=Path, help="spool directory to watch"
+    )
+
+    cmd.add_argument("--type", required=True, help="type of data files to process")
+
+    cmd.add_argument(
+        "-l", "--list-plugins", action=ListPlugins,
+        help="list installed Harvester plug-ins"
+    )
+
+    cmd.add_argument(
+        "--parser-config", type=Path, help="parser specific configuration"
+    )
+
+    cmd.add_argument(
+        "--pattern", default="*", help="file name pattern of files to process"
+    )
+
+    cmd.add_argument(
+        "--data-source", default="load-data", help="data source to use"
+    )
+
+    cmd.add_argument(
+        "--done-dir", type=Path,
+        help="directory for loaded files (default: 'done' in spool directory)"
+    )
+
+    cmd.add_argument(
+        "--failed-dir", type=Path,
+        help="directory for failed files (default: 'failed' in spool directory)"
+    )
+
+    cmd.add_argument(
+        "--jobs", type=int, default=1,
+        help="number of files to load concurrently"
+    )
+
+    cmd.add_argument(
+        "--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL,
+        help="time to wait for new files between checks (in seconds)"
+    )
+
+    cmd.add_argument(
+        "--settle-time", type=float, default=DEFAULT_SETTLE_TIME,
+        help="minimum age of files before processing when polling (in seconds)"
+    )
+
+    cmd.add_argument(
+        "--no-inotify", action="store_false", dest="inotify", default=True,
+        help="always use polling instead of inotify to detect new files"
+    )
+
+    cmd.add_argument(
+        "--merge-packages", action="store_true", default=False,
+        help="merge packages by entity type and granularity"
+    )
+
+    cmd.add_argument(
+        "--binary-copy", action="store_true", default=False,
+        help="use the binary COPY format for storing trend data"
+    )
+
+    cmd.add_argument(
+        "--pretend", action="store_true", default=False,
+        help="only process data, do not write to database"
+    )
+
+    cmd.set_defaults(cmd=ingest_daemon_cmd)
+
+
+def ingest_daemon_cmd(args):
+    logging.basicConfig(format="%(asctime)s %(message)s", level=logging.INFO)
+
+    if get_plugin(args.type) is None:
+        raise ConfigurationError(f"Data type '{args.type}' not supported")
+
+    for directory in args.directory:
+        if not directory.is_dir():
+            raise ConfigurationError(f"No such directory: {directory}")
+
+    if args.parser_config is not None:
+        parser_config = load_json(args.parser_config)
+    else:
+        parser_config = None
+
+    loader = Loader()
+    loader.data_source = args.data_source
+    loader.merge_packages = args.merge_packages
+    loader.binary_copy = args.binary_copy
+    loader.pretend = args.pretend
+
+    if not args.pretend:
+        configure_pool(min_size=1, max_size=args.jobs)
+
+        with pooled_connection() as conn:
+            with closing(conn.cursor()) as cursor:
+                trend_store_count = TrendStore.warm_cache()(cursor)
+
+            conn.commit()
+
+        logging.info(f"Loaded {trend_store_count} trend stores")
+
+    watcher = create_watcher(
+        args.directory, args.pattern, args.inotify, args.settle_time
+    )
+
+    daemon = IngestDaemon(
+        loader, args.type, parser_config, watcher, args.jobs,
+        args.done_dir, args.failed_dir, args.poll_interval
+    )
+
+    stop_event = threading.Event()
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+
+    logging.info(
+        "Watching {} for files of type {}".format(
+            ", ".join(map(str, args.directory)), args.type
+        )
+    )
+
+    try:
+        daemon.run(stop_event)
+    except KeyboardInterrupt:
+        stop_event.set()
+    finally:
+        watcher.close()
+
+    logging.info(
+        f"Stopped after loading {daemon.processed_count} files "
+        f"({daemon.failed_count} failed)"
+    )
@@ -11,6 +11,7 @@ from minerva.commands import ConfigurationError
 from minerva.commands.live_monitor import live_monitor
 
 from minerva.db import connect
+from minerva.db.pool import configure_pool, pooled_connection
 from minerva.db.error import translate_postgresql_exception
 
 from minerva.instance import INSTANCE_ROOT_VARIABLE, MinervaInstance
@@ -24,7 +25,8 @@ from minerva.commands.notification_store import (
     create_notification_store_from_definition,
     DuplicateNotificationStore,
 )
-from minerva.commands.partition import create_partitions_for_trend_store
+from minerva.commands.partition import create_partitions_for_trend_store, \
+    create_partitions_parallel, get_missing_partitions
 from minerva.commands.trigger import create_trigger
 from minerva.commands.load_sample_data import load_sample_data
 from minerva.commands.relation import define_relation, materialize_relations
@@ -64,6 +66,13 @@ def setup_command_parser(subparsers):
         help="number of partitions to create (default is full retention period)",  # noqa: E501
     )
 
+    cmd.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of partitions to create in parallel",
+    )
+
     cmd.set_defaults(cmd=initialize_cmd)
 
 
@@ -75,7 +84,7 @@ def initialize_cmd(args):
     sys.stdout.write("Initializing Minerva instance from '{}'\n".format(instance_root))
 
     try:
-        initialize_instance(instance_root, args.num_partitions)
+        initialize_instance(instance_root, args.num_partitions, args.jobs)
     except Exception as exc:
         sys.stdout.write("Error:\n\t{}".format(str(exc)))
         raise exc
@@ -108,7 +117,7 @@ def header(title):
     print("")
 
 
-def initialize_instance(instance_root, num_partitions):
+def initialize_instance(instance_root, num_partitions, jobs=1):
     header("Custom pre-init SQL")
     load_custom_pre_init_sql(instance_root)
 
@@ -140,7 +149,7 @@ def initialize_instance(instance_root, num_partitions):
     define_triggers(instance_root)
 
     header("Creating partitions")
-    create_partitions(num_partitions)
+    create_partitions(num_partitions, jobs)
 
     header("Custom post-init SQL")
     load_custom_post_init_sql(instance_root)
@@ -314,10 +323,28 @@ def define_triggers(instance_root):
         create_trigger(trigger)
 
 
-def create_partitions(num_partitions):
+def create_partitions(num_partitions, jobs=1):
     partitions_created = 0
     query = "SELECT id FROM trend_directory.trend_store"
 
+    if jobs > 1:
+        configure_pool(max_size=jobs, session_settings={"lock_timeout": "1s"})
+
+        with pooled_connection() as conn:
+            work_items = get_missing_partitions(conn, None, "1 day", num_partitions)
+
+        for name, partition_index, i, num in create_partitions_parallel(
+            pooled_connection, work_items, jobs
+        ):
+            print(" " * 60, end="\r")
+            print("{} - {} ({}/{})".format(name, partition_index, i, num), end="\r")
+            partitions_created += 1
+
+        print(" " * 60, end="\r")
+        print("Created {} partitions".format(partitions_created))
+
+        return
+
     with closing(connect()) as conn:
         conn.autocommit = True
 
@@ -1,7 +1,16 @@
-from typing import Optional
+from typing import Optional, Callable
+import argparse
 import time
 
-from minerva.commands.trend_store import materialize_all, process_modified_log
+from minerva.commands.trend_store import materialize_all, process_modified_log, \
+    materialization_stats, seconds_until_next_chunk_due
+from minerva.commands import positive_int
+from minerva.db.pool import configure_pool
+from minerva.db.notify import NotificationListener, MODIFIED_CHANNEL
+
+# Seconds to wait at most for a notification when listening, as a safety net
+# for missed notifications
+DEFAULT_FALLBACK_INTERVAL = 300
 
 
 def setup_command_parser(subparsers):
@@ -12,7 +21,23 @@ def setup_command_parser(subparsers):
 
     cmd.add_argument(
         "--poll-timeout", default=2, type=float,
-        help="Time to wait between poll cycles (in seconds)"
+        help="Time to wait between poll cycles when not listening (in seconds)"
+    )
+
+    cmd.add_argument(
+        "--fallback-interval", default=DEFAULT_FALLBACK_INTERVAL, type=float,
+        help=(
+            "Maximum time to wait for a modification notification before "
+            "running a cycle anyway (in seconds). Chunks that become due "
+            "through their timestamp or processing delay are run when they "
+            "become due"
+        )
+    )
+
+    cmd.add_argument(
+        "--no-listen", dest="listen", action="store_false", default=True,
+        help="Poll every --poll-timeout seconds instead of waiting for "
+        "modification notifications"
     )
 
     cmd.add_argument(
@@ -20,6 +45,17 @@ def setup_command_parser(subparsers):
         help="Number of materializations per batch (0=No limit)"
     )
 
+    cmd.add_argument(
+        "--jobs", default=1, type=positive_int,
+        help="Number of materializations to run in parallel"
+    )
+
+    cmd.add_argument(
+        "--stats-log", type=argparse.FileType("a"),
+        help="File to append the statistics of each materialized chunk to as "
+        "JSON lines"
+    )
+
     cmd.set_defaults(cmd=live_monitor_cmd)
 
 
@@ -31,15 +67,66 @@ def live_monitor_cmd(args):
     else:
         batch_size = args.batch_size
 
+    if args.jobs > 1:
+        configure_pool(max_size=args.jobs)
+
+    materialization_stats.log_file = args.stats_log
+
+    if args.listen:
+        listener = NotificationListener(MODIFIED_CHANNEL)
+        # Start listening before the first cycle, so that no modification
+        # after it is missed
+        listener.wait(0)
+        wait = listener.wait
+        timeout = args.fallback_interval
+        next_due = seconds_until_next_chunk_due
+    else:
+        listener = None
+        wait = time.sleep
+        timeout = args.poll_timeout
+        next_due = None
+
     try:
-        live_monitor(batch_size, args.poll_timeout)
+        live_monitor(batch_size, timeout, args.jobs, wait, next_due)
     except KeyboardInterrupt:
         print("Stopped")
+    finally:
+        if listener is not None:
+            listener.close()
+
 
+def live_monitor(
+        batch_size: Optional[int], poll_timeout: float, jobs: int = 1,
+        wait=time.sleep,
+        next_due: Optional[Callable[[], Optional[float]]] = None):
+    """
+    Process the modified log and materialize in cycles.
 
-def live_monitor(batch_size: Optional[int], poll_timeout: float):
+    :param wait: Function called with the timeout between cycles, returning
+    early when there is new data, e.g. NotificationListener.wait
+    :param next_due: Optional function returning the seconds until the next
+    chunk becomes due, to wait at most that long instead of poll_timeout
+    """
     while True:
         process_modified_log(False)
-        materialize_all(False, batch_size, False)
+        chunk_count = materialize_all(False, batch_size, False, jobs)
+
+        if batch_size is not None and chunk_count >= batch_size:
+            # More chunks may be due already
+            continue
+
+        wait(cycle_timeout(poll_timeout, next_due))
+
+
+def cycle_timeout(
+        poll_timeout: float,
+        next_due: Optional[Callable[[], Optional[float]]]) -> float:
+    if next_due is None:
+        return poll_timeout
+
+    seconds = next_due()
+
+    if seconds is None:
+        return poll_timeout
 
-        time.sleep(poll_timeout)
+    return max(0.0, min(poll_timeout, seconds))
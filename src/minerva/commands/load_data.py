@@ -2,7 +2,10 @@
 import logging
 from pathlib import Path
 
-from minerva.loading.loader import Loader, create_regex_filter
+from minerva.loading.loader import Loader, create_regex_filter, \
+    DEFAULT_MAX_BATCH_FILES
+from minerva.storage.trend.datapackage import DUPLICATE_POLICIES, \
+    DUPLICATES_KEEP_LAST
 from minerva.util import k
 from minerva.commands import ListPlugins, load_json
 
@@ -78,6 +81,32 @@ def setup_command_parser(subparsers):
         help="merge packages by entity type and granularity"
     )
 
+    cmd.add_argument(
+        "--binary-copy", action="store_true", default=False,
+        help="use the binary COPY format for storing trend data"
+    )
+
+    cmd.add_argument(
+        "--duplicate-policy", choices=DUPLICATE_POLICIES + ("none",),
+        default=DUPLICATES_KEEP_LAST,
+        help=(
+            "which row to keep of rows with the same entity and timestamp; "
+            "with 'none' duplicates are only removed when storing falls back "
+            "to a staging table, keeping the last row"
+        )
+    )
+
+    cmd.add_argument(
+        "--jobs", type=int, default=1,
+        help="number of worker processes for loading multiple files"
+    )
+
+    cmd.add_argument(
+        "--max-batch-files", type=int, default=DEFAULT_MAX_BATCH_FILES,
+        help="maximum number of files a worker loads (and merges) at once "
+        "when using --jobs"
+    )
+
     cmd.set_defaults(cmd=load_data_cmd(cmd))
 
 
@@ -92,6 +121,14 @@ def load_data_cmd(cmd_parser, stop_on_missing_entity_type=False):
         loader.debug = args.debug
         loader.data_source = args.data_source
         loader.merge_packages = args.merge_packages
+        loader.binary_copy = args.binary_copy
+        loader.max_batch_files = args.max_batch_files
+
+        if args.duplicate_policy == "none":
+            loader.duplicate_policy = None
+        else:
+            loader.duplicate_policy = args.duplicate_policy
+
         loader.stop_on_missing_entity_type = stop_on_missing_entity_type
 
         # Only show the logged message
@@ -110,12 +147,22 @@ def load_data_cmd(cmd_parser, stop_on_missing_entity_type=False):
             cmd_parser.print_help()
             return
 
+        file_paths = []
+
         for file_path_str in args.file:
             file_path = Path(file_path_str)
 
             if file_path.is_file():
-                loader.load_data(args.type, parser_config, file_path)
+                file_paths.append(file_path)
             else:
                 print(f"No such file: {file_path}")
 
+        if args.jobs > 1 and len(file_paths) > 1:
+            loader.load_files_parallel(
+                args.type, parser_config, file_paths, args.jobs
+            )
+        else:
+            for file_path in file_paths:
+                loader.load_data(args.type, parser_config, file_path)
+
     return cmd
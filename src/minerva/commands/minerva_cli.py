@@ -23,6 +23,7 @@ from minerva.commands import (
     quick_start,
     report,
     generate_sample_data,
+    ingest_daemon,
 )
 
 
@@ -45,6 +46,7 @@ def main():
     data_source.setup_command_parser(subparsers)
     entity_type.setup_command_parser(subparsers)
     initialize.setup_command_parser(subparsers)
+    ingest_daemon.setup_command_parser(subparsers)
     live_monitor.setup_command_parser(subparsers)
     load_data.setup_command_parser(subparsers)
     load_sample_data.setup_command_parser(subparsers)
@@ -1,12 +1,28 @@
+import queue
 from time import sleep
+from random import uniform
+from datetime import datetime
+from operator import itemgetter
 from contextlib import closing
-from typing import Optional, Generator, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, Generator, Tuple, List, Callable, ContextManager
 
 import psycopg2.errors
 from psycopg2 import sql
 
 from minerva.db.error import LockNotAvailable, DeadLockDetected
 
+# Number of attempts to create a partition when it cannot be locked
+DEFAULT_MAX_ATTEMPTS = 5
+
+# Seconds to wait before the first retry, doubled for every next retry
+DEFAULT_INITIAL_BACKOFF = 0.5
+
+MAX_BACKOFF = 8.0
+
+# Lock conflicts on which the creation of a partition is retried
+LOCK_CONFLICT_ERRORS = (LockNotAvailable, DeadLockDetected)
+
 
 def create_specific_partitions_for_trend_store(conn, trend_store_id, timestamp):
     query = (
@@ -21,30 +37,16 @@ def create_specific_partitions_for_trend_store(conn, trend_store_id, timestamp):
 
         rows = cursor.fetchall()
 
-    retry = True
-    attempt = 0
-
     for i, (trend_store_part_id, partition_index) in enumerate(rows):
-        while retry and attempt < 3:
-            attempt += 1
-            try:
-                name = create_partition_for_trend_store_part(
-                    conn, trend_store_part_id, partition_index
-                )
-
-                conn.commit()
-
+        try:
+            name = create_partition_with_retry(
+                conn, trend_store_part_id, partition_index
+            )
+        except LOCK_CONFLICT_ERRORS as exc:
+            print(exc)
+        else:
+            if name is not None:
                 yield name, partition_index, i + 1, len(rows)
-                retry = False
-            except PartitionExistsError:
-                conn.rollback()
-                retry = False
-            except LockNotAvailable as exc:
-                conn.rollback()
-                print(exc)
-                sleep(1)
-            except DeadLockDetected:
-                pass
 
 
 def create_partitions_for_trend_store(
@@ -60,67 +62,153 @@ def create_partitions_for_trend_store(
     :param partition_count: The number of partitions to create or None
     to create partitions for the full retention period.
     """
+    rows = get_missing_partitions(conn, trend_store_id, ahead_interval, partition_count)
+
+    for i, (trend_store_part_id, partition_index) in enumerate(rows):
+        try:
+            name = create_partition_with_retry(
+                conn, trend_store_part_id, partition_index
+            )
+        except LOCK_CONFLICT_ERRORS as exc:
+            print(
+                f"Could not create partition for part {trend_store_part_id} - {partition_index}: {exc}\n"
+            )
+        else:
+            if name is not None:
+                yield name, partition_index, i, len(rows)
+
+
+def get_missing_partitions(
+    conn,
+    trend_store_id: Optional[int],
+    ahead_interval: str,
+    partition_count: Optional[int] = None,
+) -> List[Tuple[int, int]]:
+    """
+    Return (trend_store_part_id, partition_index) of the partitions that do
+    not exist yet, ordered by index so that consecutive partitions belong to
+    different parts.
+
+    :param trend_store_id: Id of trend store or None for all trend stores
+    """
     if partition_count is None:
-        query = sql.SQL(
-            "WITH partition_indexes AS ("
-            "SELECT trend_directory.timestamp_to_index(partition_size, t) AS i, p.id AS part_id "
-            "FROM trend_directory.trend_store "
-            "JOIN trend_directory.trend_store_part p ON p.trend_store_id = trend_store.id "
-            "JOIN generate_series(now() - partition_size - trend_store.retention_period, now() + partition_size + %s::interval, partition_size) t ON true "
-            "WHERE trend_store.id = %s"
-            ") "
-            "SELECT partition_indexes.part_id, partition_indexes.i FROM partition_indexes "
-            "LEFT JOIN trend_directory.partition ON partition.index = i AND partition.trend_store_part_id = partition_indexes.part_id "
-            "WHERE partition.id IS NULL"
-        )
+        start = sql.SQL("now() - partition_size - trend_store.retention_period")
+        query_args = []
+    else:
+        start = sql.SQL("now() - partition_size - (partition_size * %s)")
+        query_args = [partition_count]
 
-        query_args = [ahead_interval, trend_store_id]
+    query_args.append(ahead_interval)
+
+    if trend_store_id is None:
+        where_clause = sql.SQL("")
     else:
-        query = sql.SQL(
-            "WITH partition_indexes AS ("
-            "SELECT trend_directory.timestamp_to_index(partition_size, t) AS i, p.id AS part_id "
-            "FROM trend_directory.trend_store "
-            "JOIN trend_directory.trend_store_part p ON p.trend_store_id = trend_store.id "
-            "JOIN generate_series(now() - partition_size - (partition_size * %s), now() + partition_size + %s::interval, partition_size) t ON true "
-            "WHERE trend_store.id = %s"
-            ") "
-            "SELECT partition_indexes.part_id, partition_indexes.i FROM partition_indexes "
-            "LEFT JOIN trend_directory.partition ON partition.index = i AND partition.trend_store_part_id = partition_indexes.part_id "
-            "WHERE partition.id IS NULL"
-        )
+        where_clause = sql.SQL("WHERE trend_store.id = %s")
+        query_args.append(trend_store_id)
 
-        query_args = [partition_count, ahead_interval, trend_store_id]
+    query = sql.SQL(
+        "WITH partition_indexes AS ("
+        "SELECT trend_directory.timestamp_to_index(partition_size, t) AS i, p.id AS part_id "
+        "FROM trend_directory.trend_store "
+        "JOIN trend_directory.trend_store_part p ON p.trend_store_id = trend_store.id "
+        "JOIN generate_series({}, now() + partition_size + %s::interval, partition_size) t ON true "
+        "{}"
+        ") "
+        "SELECT partition_indexes.part_id, partition_indexes.i FROM partition_indexes "
+        "LEFT JOIN trend_directory.partition ON partition.index = i AND partition.trend_store_part_id = partition_indexes.part_id "
+        "WHERE partition.id IS NULL "
+        "ORDER BY partition_indexes.i, partition_indexes.part_id"
+    ).format(start, where_clause)
 
     with closing(conn.cursor()) as cursor:
         cursor.execute(query, query_args)
 
-        rows = cursor.fetchall()
+        return cursor.fetchall()
 
-    retry = True
-    attempt = 0
 
-    while retry and attempt < 3:
-        attempt += 1
-        for i, (trend_store_part_id, partition_index) in enumerate(rows):
-            try:
-                name = create_partition_for_trend_store_part(
-                    conn, trend_store_part_id, partition_index
-                )
-                conn.commit()
+def create_partition_with_retry(
+    conn, trend_store_part_id: int, partition_index: int,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    initial_backoff: float = DEFAULT_INITIAL_BACKOFF,
+) -> Optional[str]:
+    """
+    Create a partition and commit, retrying lock conflicts with exponential
+    backoff and jitter.
 
-                yield name, partition_index, i, len(rows)
+    :return: Name of the created partition or None if it already existed
+    :raises LockNotAvailable, DeadLockDetected: When the last attempt failed
+    """
+    for attempt in range(1, max_attempts + 1):
+        try:
+            name = create_partition_for_trend_store_part(
+                conn, trend_store_part_id, partition_index
+            )
 
-                retry = False
-            except LockNotAvailable as partition_lock:
-                conn.rollback()
-                print(
-                    f"Could not create partition for part {trend_store_part_id} - {partition_index}: {partition_lock}\n"
-                )
-            except DeadLockDetected as deadlock:
-                conn.rollback()
+            conn.commit()
+
+            return name
+        except PartitionExistsError:
+            conn.rollback()
+
+            return None
+        except LOCK_CONFLICT_ERRORS:
+            conn.rollback()
+
+            if attempt == max_attempts:
+                raise
+
+            backoff = min(initial_backoff * 2 ** (attempt - 1), MAX_BACKOFF)
+
+            sleep(uniform(backoff / 2, backoff))
+
+
+def create_partitions_parallel(
+    connection: Callable[[], ContextManager],
+    work_items: List[Tuple[int, int]],
+    jobs: int,
+) -> Generator[Tuple[str, int, int, int], None, None]:
+    """
+    Create partitions using `jobs` connections in parallel.
+
+    :param connection: Function returning a context manager providing a
+    database connection, e.g. pooled_connection
+    :param work_items: (trend_store_part_id, partition_index) tuples as
+    returned by get_missing_partitions
+    :return: Generator of (name, partition_index, i, num) for each created
+    partition, in order of completion
+    :raises Exception: The first error other than a lock conflict, after
+    cancelling the partitions that were not started yet
+    """
+    def create(work_item):
+        trend_store_part_id, partition_index = work_item
+
+        with connection() as conn:
+            return create_partition_with_retry(
+                conn, trend_store_part_id, partition_index
+            )
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(create, item): item for item in work_items}
+
+        for i, future in enumerate(as_completed(futures)):
+            trend_store_part_id, partition_index = futures[future]
+
+            try:
+                name = future.result()
+            except LOCK_CONFLICT_ERRORS as exc:
                 print(
-                    f"Could not create partition for part {trend_store_part_id} - {partition_index}: {deadlock}\n"
+                    f"Could not create partition for part {trend_store_part_id} - {partition_index}: {exc}\n"
                 )
+            except Exception:
+                # Abort like the serial path instead of first creating all
+                # remaining partitions
+                for pending in futures:
+                    pending.cancel()
+
+                raise
+            else:
+                if name is not None:
+                    yield name, partition_index, i + 1, len(work_items)
 
 
 class PartitionExistsError(Exception):
@@ -144,7 +232,135 @@ def create_partition_for_trend_store_part(conn, trend_store_part_id, partition_i
             raise PartitionExistsError(trend_store_part_id, partition_index)
         except psycopg2.errors.LockNotAvailable as exc:
             raise LockNotAvailable(exc)
+        except psycopg2.errors.DeadlockDetected as exc:
+            raise DeadLockDetected(exc)
 
         name, _ = cursor.fetchone()
 
         return name
+
+
+def get_old_partitions(conn) -> List[Tuple[int, int, str, datetime, datetime]]:
+    """
+    Return (id, trend_store_part_id, name, from, to) of the partitions that
+    are beyond the retention period of their trend store, ordered by name.
+    """
+    query = (
+        "select p.id, p.trend_store_part_id, p.name, p.from, p.to "
+        "from trend_directory.partition p "
+        "join trend_directory.trend_store_part tsp on tsp.id = p.trend_store_part_id "
+        "join trend_directory.trend_store ts on ts.id = tsp.trend_store_id "
+        "where p.from < (now() - retention_period - partition_size - partition_size) "
+        "order by p.name"
+    )
+
+    with closing(conn.cursor()) as cursor:
+        cursor.execute(query)
+
+        return cursor.fetchall()
+
+
+def batch_partitions_by_part(partitions: List[tuple], batch_size: int) -> List[List[list]]:
+    """
+    Return per trend store part the batches of at most batch_size partitions
+    to remove.
+
+    All partitions of a part share a parent table that is locked when a
+    partition is dropped, so the batches of one part are kept together to be
+    removed one after the other. Parts and partitions are ordered by name, so
+    that locks are always taken in the same order.
+    """
+    by_part = {}
+
+    for partition in partitions:
+        by_part.setdefault(partition[1], []).append(partition)
+
+    return [
+        [
+            part_partitions[i:i + batch_size]
+            for i in range(0, len(part_partitions), batch_size)
+        ]
+        for part_partitions in sorted(
+            (sorted(p, key=itemgetter(2)) for p in by_part.values()),
+            key=lambda p: p[0][2]
+        )
+    ]
+
+
+def remove_partitions(conn, partitions: List[tuple]):
+    """
+    Drop the partition tables and remove their partition records in one
+    transaction.
+    """
+    drop_query = sql.SQL("DROP TABLE {}").format(
+        sql.SQL(", ").join(
+            sql.Identifier("trend_partition", name) for _, _, name, _, _ in partitions
+        )
+    )
+
+    with closing(conn.cursor()) as cursor:
+        try:
+            cursor.execute(drop_query)
+            cursor.execute(
+                "DELETE FROM trend_directory.partition WHERE id = ANY(%s)",
+                ([partition_id for partition_id, _, _, _, _ in partitions],),
+            )
+        except psycopg2.errors.LockNotAvailable as exc:
+            conn.rollback()
+            raise LockNotAvailable(exc)
+        except psycopg2.errors.DeadlockDetected as exc:
+            conn.rollback()
+            raise DeadLockDetected(exc)
+
+    conn.commit()
+
+
+def remove_partitions_parallel(
+    connection: Callable[[], ContextManager],
+    partitions: List[tuple],
+    jobs: int,
+    batch_size: int,
+) -> Generator[Tuple[List[tuple], Optional[Exception]], None, None]:
+    """
+    Remove partitions in batches using `jobs` connections in parallel, each
+    connection working on a different trend store part.
+
+    :param connection: Function returning a context manager providing a
+    database connection, e.g. pooled_connection
+    :param partitions: Partitions as returned by get_old_partitions
+    :return: Generator of (batch, error) tuples in order of completion, with
+    error None when the batch was removed
+    """
+    results = queue.Queue()
+
+    def remove_part_batches(batches):
+        remaining = list(batches)
+
+        try:
+            with connection() as conn:
+                while remaining:
+                    try:
+                        remove_partitions(conn, remaining[0])
+                    except LOCK_CONFLICT_ERRORS as exc:
+                        results.put((remaining.pop(0), exc))
+                    else:
+                        results.put((remaining.pop(0), None))
+        except Exception as exc:
+            # Report the batches of this part that could not be attempted
+            for batch in remaining:
+                results.put((batch, exc))
+
+    part_batches = batch_partitions_by_part(partitions, batch_size)
+    batch_count = sum(len(batches) for batches in part_batches)
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [
+            executor.submit(remove_part_batches, batches)
+            for batches in part_batches
+        ]
+
+        for _ in range(batch_count):
+            yield results.get()
+
+        for future in futures:
+            future.result()
@@ -2,11 +2,13 @@
 
 Reporting is done on metrics of trend stores, attribute stores, etc.
 """
+from operator import attrgetter
 from typing import Generator, List, Tuple
 
 from psycopg2 import sql
 
 from minerva.db import connect
+from minerva.storage.trend.trendstore import TrendStore
 from minerva.util.tabulate import render_table, render_rst_table
 
 
@@ -139,69 +141,46 @@ def generate_entity_report(conn, formatter: Formatter) -> Generator[str, None, N
 
 
 def generate_trend_report(conn, formatter: Formatter) -> Generator[str, None, None]:
-    query = (
-        'SELECT '
-        'ds.name AS data_source_name, '
-        'et.name AS entity_type_name, '
-        'tsp.name '
-        'FROM trend_directory.trend_store ts '
-        'JOIN trend_directory.trend_store_part tsp '
-        'ON ts.id = tsp.trend_store_id '
-        'JOIN directory.data_source ds ON ds.id = ts.data_source_id '
-        'JOIn directory.entity_type et ON et.id = ts.entity_type_id '
-        'ORDER BY ts.id, tsp.name'
-    )
-
     with conn.cursor() as cursor:
-        cursor.execute(query)
-
-        rows = cursor.fetchall()
+        trend_stores = TrendStore.get_all()(cursor)
 
-        table_rows = [
-            (
-                data_source,
-                entity_type,
-                name,
-            ) + get_trend_store_part_statistics(conn, name)
-            for data_source, entity_type, name in rows
-        ]
+    table_rows = [
+        (
+            trend_store.data_source.name,
+            trend_store.entity_type.name,
+            part.name,
+            get_trend_store_part_row_count(conn, part.name),
+            len(part.trends),
+        )
+        for trend_store in trend_stores
+        for part in sorted(trend_store.parts, key=attrgetter('name'))
+    ]
 
-        column_names = [
-            'Data Source', 'Entity Type', 'Part Name', 'Record Count', 'Trend Count'
-        ]
+    column_names = [
+        'Data Source', 'Entity Type', 'Part Name', 'Record Count', 'Trend Count'
+    ]
 
-        column_align = ['<', '<', '<', '>', '>']
-        column_sizes = ["max"] * len(column_names)
+    column_align = ['<', '<', '<', '>', '>']
+    column_sizes = ["max"] * len(column_names)
 
-        yield from formatter.format_table(
-            column_names, column_align, column_sizes, table_rows
-        )
+    yield from formatter.format_table(
+        column_names, column_align, column_sizes, table_rows
+    )
 
 
-def get_trend_store_part_statistics(conn, trend_store_part_name: str):
+def get_trend_store_part_row_count(conn, trend_store_part_name: str) -> int:
     query = sql.SQL(
         'SELECT count(*) FROM {}'
     ).format(
         sql.Identifier('trend', trend_store_part_name)
     )
 
-    trends_query = sql.SQL(
-        "select count(*) "
-        "from trend_directory.trend_store_part tsp "
-        "join trend_directory.table_trend tt on tt.trend_store_part_id = tsp.id "
-        "where tsp.name = %s;"
-    )
-
     with conn.cursor() as cursor:
         cursor.execute(query)
 
         row_count, = cursor.fetchone()
 
-        cursor.execute(trends_query, (trend_store_part_name,))
-
-        trend_count, = cursor.fetchone()
-
-        return row_count, trend_count
+        return row_count
 
 
 def generate_attribute_report(conn, formatter: Formatter) -> Generator[str, None, None]:
@@ -1,6 +1,8 @@
 """Provides the trend-store sub-command."""
 from contextlib import closing
+import argparse
 import sys
+import time
 import datetime
 from typing import Optional, List
 from pathlib import Path
@@ -9,12 +11,31 @@ import psycopg2.errors
 from psycopg2 import sql
 
 from minerva.db import connect
+from minerva.db.pool import pooled_connection, configure_pool
+from minerva.commands import positive_int
 from minerva.db.error import LockNotAvailable
 from minerva.commands.partition import (
     create_partitions_for_trend_store,
     create_specific_partitions_for_trend_store,
+    create_partitions_parallel,
+    get_missing_partitions,
+    get_old_partitions,
+    remove_partitions_parallel,
 )
 from minerva.instance import TrendStore, MinervaInstance
+from minerva.storage.trend.materializationstats import (
+    ChunkStats,
+    MaterializationStats,
+    OUTCOME_ERROR,
+)
+from minerva.storage.trend.scheduling import (
+    MaterializationScheduler,
+    RunHistory,
+    ancestors,
+    dependency_levels,
+    group_by_level,
+    load_materialization_dependencies,
+)
 from minerva.commands.trend_store.create import setup_create_parser
 from minerva.commands.trend_store.add_trends import setup_add_trends_parser
 from minerva.commands.trend_store.add_parts import setup_add_parts_parser
@@ -275,6 +296,13 @@ def setup_partition_parser(subparsers):
         "--ahead-interval", help="period for which to create partitions"
     )
 
+    create_parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of partitions to create in parallel",
+    )
+
     create_parser.set_defaults(cmd=create_partition_cmd)
 
     create_for_timestamp_parser = cmd_subparsers.add_parser(
@@ -304,79 +332,102 @@ def setup_partition_parser(subparsers):
         help="do not actually delete partitions",
     )
 
+    remove_old_parser.add_argument(
+        "--jobs",
+        type=positive_int,
+        default=1,
+        help="number of connections removing partitions in parallel",
+    )
+
+    remove_old_parser.add_argument(
+        "--batch-size",
+        type=positive_int,
+        default=1,
+        help="number of partitions to remove per transaction",
+    )
+
     remove_old_parser.set_defaults(cmd=remove_old_partitions_cmd)
 
 
 def remove_old_partitions_cmd(args):
     partition_count_query = "select count(*) from trend_directory.partition"
 
-    old_partitions_query = (
-        "select p.id, p.name, p.from, p.to "
-        "from trend_directory.partition p "
-        "join trend_directory.trend_store_part tsp on tsp.id = p.trend_store_part_id "
-        "join trend_directory.trend_store ts on ts.id = tsp.trend_store_id "
-        "where p.from < (now() - retention_period - partition_size - partition_size) "
-        "order by p.name"
-    )
+    with pooled_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(partition_count_query)
+            (total_partitions,) = cursor.fetchone()
 
-    removed_partitions = 0
+        rows = get_old_partitions(conn)
 
-    with connect() as conn:
-        set_lock_timeout(conn, "1s")
         conn.commit()
 
-        with conn.cursor() as cursor:
-            cursor.execute(partition_count_query)
-            (total_partitions,) = cursor.fetchone()
+    print(f"Found {len(rows)} of {total_partitions} partitions to be removed")
 
-            cursor.execute(old_partitions_query)
+    if len(rows) == 0:
+        return
 
-            rows = cursor.fetchall()
+    print()
 
-            print(f"Found {len(rows)} of {total_partitions} partitions to be removed")
+    if args.pretend:
+        for _, _, partition_name, data_from, data_to in rows:
+            print(f"Would remove partition {partition_name} ({data_from} - {data_to})")
 
-            conn.commit()
+        print(
+            f"\nWould have removed {len(rows)} of {total_partitions} partitions"  # pylint: disable=C0301
+        )
 
-            if len(rows) > 0:
-                print()
-                for partition_id, partition_name, data_from, data_to in rows:
-                    if not args.pretend:
-                        try:
-                            cursor.execute(
-                                sql.SQL("DROP TABLE {}").format(
-                                    sql.Identifier("trend_partition", partition_name)
-                                )
-                            )
-                            cursor.execute(
-                                "DELETE FROM trend_directory.partition WHERE id = %s",
-                                (partition_id,),
-                            )
-                            conn.commit()
-                            removed_partitions += 1
-                            print(
-                                f"Removed partition {partition_name} ({data_from} - {data_to})"
-                            )
-                        except psycopg2.errors.LockNotAvailable as partition_lock:
-                            conn.rollback()
-                            print(
-                                f"Could not remove partition {partition_name} ({data_from} - {data_to}): {partition_lock}"  # pylint: disable=C0301
-                            )
-
-                if args.pretend:
-                    print(
-                        f"\nWould have removed {removed_partitions} of {total_partitions} partitions"  # pylint: disable=C0301
-                    )
-                else:
-                    print(
-                        f"\nRemoved {removed_partitions} of {total_partitions} partitions"
-                    )
+        return
+
+    configure_pool(
+        max_size=args.jobs, session_settings={"lock_timeout": "1s"}
+    )
+
+    removed_partitions = 0
+    started = time.monotonic()
+
+    for batch, error in remove_partitions_parallel(
+        pooled_connection, rows, args.jobs, args.batch_size
+    ):
+        for _, _, partition_name, data_from, data_to in batch:
+            if error is None:
+                print(f"Removed partition {partition_name} ({data_from} - {data_to})")
+            else:
+                print(
+                    f"Could not remove partition {partition_name} ({data_from} - {data_to}): {error}"  # pylint: disable=C0301
+                )
+
+        if error is None:
+            removed_partitions += len(batch)
+
+    duration = time.monotonic() - started
+
+    print(f"\nRemoved {removed_partitions} of {total_partitions} partitions")
+    print(
+        f"{duration:.1f}s, {removed_partitions / duration if duration else 0:.1f} "
+        f"partitions/s using {args.jobs} jobs with batches of {args.batch_size}"
+    )
 
 
 def create_partition_cmd(args):
     ahead_interval = args.ahead_interval or "1 day"
 
+    if args.jobs > 1:
+        configure_pool(max_size=args.jobs, session_settings={"lock_timeout": "1s"})
+
+        with pooled_connection() as conn:
+            work_items = get_missing_partitions(
+                conn, args.trend_store, ahead_interval
+            )
+
+        for name, partition_index, i, num in create_partitions_parallel(
+            pooled_connection, work_items, args.jobs
+        ):
+            print(f"{name} - {partition_index} ({i}/{num})")
+
+        return
+
     try:
-        with closing(connect()) as conn:
+        with pooled_connection() as conn:
             set_lock_timeout(conn, "1s")
             conn.commit()
 
@@ -414,7 +465,7 @@ def create_partition_for_timestamp_cmd(args):
 
     query = "SELECT id FROM trend_directory.trend_store"
 
-    with closing(connect()) as conn:
+    with pooled_connection() as conn:
         if args.trend_store is None:
             with closing(conn.cursor()) as cursor:
                 cursor.execute(query)
@@ -469,7 +520,7 @@ def process_modified_log(reset):
 
     query = "SELECT * FROM trend_directory.process_modified_log()"
 
-    with closing(connect()) as conn:
+    with pooled_connection() as conn:
         with closing(conn.cursor()) as cursor:
             if reset:
                 cursor.execute(reset_query, (0,))
@@ -515,6 +566,30 @@ def setup_materialize_parser(subparsers):
         help="materialize newest data first",
     )
 
+    cmd.add_argument(
+        "--jobs",
+        type=positive_int,
+        default=1,
+        help="number of materializations to run in parallel",
+    )
+
+    cmd.add_argument(
+        "--stats",
+        action="store_true",
+        default=False,
+        help=(
+            "report duration percentiles per materialization of the chunks "
+            "run by this command only; use --stats-log to collect statistics "
+            "across runs and processes"
+        ),
+    )
+
+    cmd.add_argument(
+        "--stats-log",
+        type=argparse.FileType("a"),
+        help="file to append the statistics of each chunk to as JSON lines",
+    )
+
     cmd.add_argument("materialization", nargs="*", help="materialization Id or name")
 
     cmd.set_defaults(cmd=materialize_cmd)
@@ -522,9 +597,14 @@ def setup_materialize_parser(subparsers):
 
 def materialize_cmd(args):
     """Execute materializations specified by `args`."""
+    materialization_stats.log_file = args.stats_log
+
     try:
         if not args.materialization:
-            materialize_all(args.reset, args.max_num, args.newest_first)
+            if args.jobs > 1:
+                configure_pool(max_size=args.jobs)
+
+            materialize_all(args.reset, args.max_num, args.newest_first, args.jobs)
         else:
             materialize_selection(
                 args.materialization, args.reset, args.max_num, args.newest_first
@@ -532,6 +612,20 @@ def materialize_cmd(args):
     except Exception as exc:
         sys.stdout.write(f"Error:\n{exc}")
         raise exc
+    finally:
+        if args.stats_log is not None:
+            materialization_stats.log_file = None
+            args.stats_log.close()
+
+    if args.stats:
+        print(materialization_stats.report())
+
+
+# Materialization runs of this process, used to report wasted re-runs
+run_history = RunHistory()
+
+# Runtime statistics of the materialization chunks run by this process
+materialization_stats = MaterializationStats()
 
 
 class MaterializationChunk:
@@ -540,25 +634,55 @@ class MaterializationChunk:
     materialization_id: int
     name: str
     timestamp: datetime.datetime
+    dst_trend_store_part_id: Optional[int]
 
     def __init__(
-        self, materialization_id: int, name: str, timestamp: datetime.datetime
+        self, materialization_id: int, name: str, timestamp: datetime.datetime,
+        dst_trend_store_part_id: Optional[int] = None
     ):
         self.materialization_id = materialization_id
         self.name = name
         self.timestamp = timestamp
+        self.dst_trend_store_part_id = dst_trend_store_part_id
 
     def __str__(self):
         return f"{self.name} - {self.timestamp}"
 
-    def materialize(self, conn):
-        try:
-            materialize_query = (
-                "SELECT (trend_directory.materialize(m, %s)).row_count "
-                "FROM trend_directory.materialization m WHERE id = %s"
-            )
+    def materialize(self, conn) -> ChunkStats:
+        """
+        Materialize the chunk and record its runtime statistics in
+        materialization_stats.
+
+        Errors are reported and recorded, not raised, so that one failing
+        materialization does not stop the others.
+        """
+        lock_query = sql.SQL(
+            "DO $$BEGIN EXECUTE format("
+            "'LOCK TABLE trend.%I IN ROW EXCLUSIVE MODE', ("
+            "SELECT tsp.name FROM trend_directory.materialization m "
+            "JOIN trend_directory.trend_store_part tsp "
+            "ON tsp.id = m.dst_trend_store_part_id "
+            "WHERE m.id = {}"
+            ")); END$$"
+        ).format(sql.Literal(self.materialization_id))
+
+        materialize_query = (
+            "SELECT (trend_directory.materialize(m, %s)).row_count "
+            "FROM trend_directory.materialization m WHERE id = %s"
+        )
+
+        started = time.monotonic()
+        lock_wait = 0.0
+        row_count = None
 
+        try:
             with conn.cursor() as cursor:
+                # Take the lock on the target table up front, so that the
+                # time spent waiting for it can be measured separately
+                cursor.execute(lock_query)
+
+                lock_wait = time.monotonic() - started
+
                 cursor.execute(
                     materialize_query, (self.timestamp, self.materialization_id)
                 )
@@ -567,11 +691,26 @@ class MaterializationChunk:
             conn.commit()
 
             print(f"{self}: {row_count} records")
+
+            stats = ChunkStats(
+                self.materialization_id, self.name, self.timestamp,
+                time.monotonic() - started, lock_wait, row_count
+            )
         except Exception as e:
             conn.rollback()
             print(f"Error materializing {self.name} ({self.materialization_id})")
             print(str(e))
 
+            stats = ChunkStats(
+                self.materialization_id, self.name, self.timestamp,
+                time.monotonic() - started, lock_wait, row_count,
+                OUTCOME_ERROR, str(e)
+            )
+
+        materialization_stats.add(stats)
+
+        return stats
+
 
 def get_materialization_chunks_to_run(
     conn, materialization, reset: bool, max_num: Optional[int], newest_first: bool
@@ -587,7 +726,7 @@ def get_materialization_chunks_to_run(
         args.append(materialization)
 
     query = (
-        "SELECT m.id, m::text, ms.timestamp "
+        "SELECT m.id, m::text, ms.timestamp, m.dst_trend_store_part_id "
         "FROM trend_directory.materialization_state ms "
         "JOIN trend_directory.materialization m "
         "ON m.id = ms.materialization_id "
@@ -641,7 +780,7 @@ def get_materialization_chunks_to_run(
 def materialize_selection(
     materializations, reset: bool, max_num: Optional[int], newest_first: bool
 ):
-    with closing(connect()) as conn:
+    with pooled_connection() as conn:
         for materialization in materializations:
             chunks = get_materialization_chunks_to_run(
                 conn, materialization, reset, max_num, newest_first
@@ -674,9 +813,20 @@ def is_max_modified_supported(conn) -> bool:
         return len(cursor.fetchall()) > 0
 
 
-def materialize_all(reset: bool, max_num: Optional[int], newest_first: bool):
+def materialize_all(
+    reset: bool, max_num: Optional[int], newest_first: bool, jobs: int = 1
+) -> int:
+    """
+    Run all materialization chunks that are due and return the number of
+    chunks run.
+
+    The chunks are run one dependency level at a time, so that upstream
+    materializations are run before the materializations using their data.
+    With jobs > 1, the chunks are run in parallel by the materialization
+    scheduler, respecting the same dependencies.
+    """
     query = (
-        "SELECT m.id, m::text, ms.timestamp "
+        "SELECT m.id, m::text, ms.timestamp, m.dst_trend_store_part_id "
         "FROM trend_directory.materialization_state ms "
         "JOIN trend_directory.materialization m "
         "ON m.id = ms.materialization_id "
@@ -687,7 +837,9 @@ def materialize_all(reset: bool, max_num: Optional[int], newest_first: bool):
     )
     args = []
 
-    with closing(connect()) as conn:
+    wasted_before = sum(run_history.wasted_count.values())
+
+    with pooled_connection() as conn:
         max_modified_supported = is_max_modified_supported(conn)
 
         if reset:
@@ -728,11 +880,76 @@ def materialize_all(reset: bool, max_num: Optional[int], newest_first: bool):
 
         conn.commit()
 
-        for chunk in chunks:
-            chunk.materialize(conn)
+        dependencies = load_materialization_dependencies(conn)
+
+        if jobs <= 1:
+            upstream = ancestors(dependencies)
+            levels = dependency_levels(dependencies)
 
+            for level_chunks in group_by_level(chunks, levels):
+                for chunk in level_chunks:
+                    run_history.record(
+                        chunk, upstream.get(chunk.materialization_id, ())
+                    )
+                    chunk.materialize(conn)
+
+                    conn.commit()
+
+    if jobs > 1:
+        MaterializationScheduler(
+            dependencies, pooled_connection, jobs, history=run_history
+        ).run(chunks)
+
+    if sum(run_history.wasted_count.values()) > wasted_before:
+        timestamp_str = datetime.datetime.now()
+
+        print(f"{timestamp_str} Materialization {run_history.report()}")
+
+    return len(chunks)
+
+
+def seconds_until_next_chunk_due() -> Optional[float]:
+    """
+    Return the number of seconds until the next modified materialization
+    chunk becomes due, because its timestamp or its processing delay after
+    the last modification passes, or None when no chunk is waiting for that.
+
+    Such chunks become due without a new modification, so no notification
+    is sent for them.
+    """
+    query = (
+        "SELECT extract(epoch FROM min(due) - now()) FROM ("
+        "SELECT greatest("
+        "ms.timestamp, ms.max_modified + m.processing_delay"
+        ") AS due "
+        "FROM trend_directory.materialization_state ms "
+        "JOIN trend_directory.materialization m "
+        "ON m.id = ms.materialization_id "
+        "WHERE m.enabled AND ("
+        "source_fingerprint != processed_fingerprint OR "
+        "processed_fingerprint IS NULL"
+        ")"
+        ") chunk WHERE due > now()"
+    )
+
+    with pooled_connection() as conn:
+        if not is_max_modified_supported(conn):
             conn.commit()
 
+            return None
+
+        with closing(conn.cursor()) as cursor:
+            cursor.execute(query)
+
+            (seconds,) = cursor.fetchone()
+
+        conn.commit()
+
+    if seconds is None:
+        return None
+
+    return float(seconds)
+
 
 def set_lock_timeout(conn, duration: str):
     query = "SET lock_timeout = %s"
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Provides running database actions from asyncio code.
+
+The storage layer is built from synchronous psycopg2 actions (`ConnDbAction`
+and `CursorDbAction`). An `AsyncDbRunner` runs these actions on connections
+from a connection pool using a fixed number of worker threads, one per pool
+connection, so that any number of coroutines can have actions queued while
+at most `max_size` statements are in flight.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from typing import Optional, Any, Callable
+
+from minerva.db import ConnDbAction, CursorDbAction
+from minerva.db.pool import ConnectionPool, get_pool
+
+
+class AsyncDbRunner:
+    """
+    Run database actions on pooled connections without blocking the event
+    loop.
+
+    Every action runs in its own transaction: the transaction is committed
+    when the action returns and rolled back when it raises. A coroutine that
+    is cancelled while its action runs does not stop the action; the result
+    is discarded.
+    """
+
+    pool: ConnectionPool
+    max_workers: int
+
+    def __init__(
+            self, pool: Optional[ConnectionPool] = None,
+            max_workers: Optional[int] = None,
+            timeout: Optional[float] = None):
+        """
+        :param pool: Connection pool to use, the process-wide pool if None
+        :param max_workers: Number of actions to run at the same time, the
+        maximum size of the pool if None
+        :param timeout: Seconds to wait for a connection from the pool, the
+        pool default if None
+        """
+        self.pool = pool if pool is not None else get_pool()
+        self.max_workers = max_workers or self.pool.max_size
+        self.timeout = timeout
+
+        self._executor = ThreadPoolExecutor(
+            self.max_workers, thread_name_prefix="minerva-db"
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        self.close()
+
+    async def run(self, action: ConnDbAction) -> Any:
+        """Run action with a pooled connection and return its result."""
+        return await self._submit(self._run_conn, action)
+
+    async def run_cursor(self, action: CursorDbAction) -> Any:
+        """Run action with a cursor of a pooled connection."""
+        return await self._submit(self._run_cursor, action)
+
+    def close(self, wait: bool = True):
+        """
+        Stop the worker threads. Queued actions are still run when `wait` is
+        True.
+        """
+        self._executor.shutdown(wait=wait)
+
+    async def _submit(self, fn: Callable[[Any], Any], action) -> Any:
+        loop = asyncio.get_running_loop()
+
+        return await loop.run_in_executor(self._executor, fn, action)
+
+    def _run_conn(self, action: ConnDbAction) -> Any:
+        with self.pool.connection(self.timeout) as conn:
+            try:
+                result = action(conn)
+            except Exception:
+                conn.rollback()
+                raise
+
+            conn.commit()
+
+            return result
+
+    def _run_cursor(self, action: CursorDbAction) -> Any:
+        def f(conn):
+            with closing(conn.cursor()) as cursor:
+                return action(cursor)
+
+        return self._run_conn(f)
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Provides waiting for PostgreSQL notifications (LISTEN/NOTIFY).
+"""
+import time
+import select
+import logging
+from typing import Callable, List, Optional
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2 import sql
+
+from minerva.db import connect
+from minerva.error import ConfigurationError
+
+# Channel on which a notification is sent when trend data is marked as
+# modified. The payload is the Id of the trend store part.
+MODIFIED_CHANNEL = "minerva_trend_modified"
+
+
+class NotificationListener:
+    """
+    Wait for notifications on a channel using a dedicated connection.
+
+    The connection is not taken from the connection pool, because LISTEN is
+    session state that has to survive between waits. When the connection is
+    lost, `wait` degrades to sleeping for the timeout and a new connection is
+    attempted on the next call.
+    """
+
+    def __init__(
+            self, channel: str,
+            connect_fn: Callable[[], psycopg2.extensions.connection] = connect):
+        self.channel = channel
+        self.connect_fn = connect_fn
+
+        self._conn: Optional[psycopg2.extensions.connection] = None
+
+    def wait(self, timeout: float) -> List[str]:
+        """
+        Return the payloads of the notifications received, waiting up to
+        `timeout` seconds when there are none yet.
+        """
+        deadline = time.monotonic() + timeout
+
+        try:
+            conn = self._connection()
+
+            payloads = self._drain(conn)
+
+            if payloads:
+                return payloads
+
+            remaining = deadline - time.monotonic()
+
+            if remaining > 0:
+                readable, _, _ = select.select([conn], [], [], remaining)
+
+                if readable:
+                    return self._drain(conn)
+        except (psycopg2.Error, ConfigurationError, OSError) as exc:
+            logging.warning(f"Listening on '{self.channel}' failed: {exc}")
+
+            self.close()
+
+            time.sleep(max(0.0, deadline - time.monotonic()))
+
+        return []
+
+    def close(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except psycopg2.Error:
+                pass
+
+            self._conn = None
+
+    def _connection(self) -> psycopg2.extensions.connection:
+        if self._conn is None:
+            conn = self.connect_fn()
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    sql.SQL("LISTEN {}").format(sql.Identifier(self.channel))
+                )
+
+            self._conn = conn
+
+        return self._conn
+
+    @staticmethod
+    def _drain(conn) -> List[str]:
+        conn.poll()
+
+        payloads = [notify.payload for notify in conn.notifies]
+
+        conn.notifies.clear()
+
+        return payloads
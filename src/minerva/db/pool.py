@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+"""
+Provides a pool of reusable database connections.
+
+A process-wide pool is available through `get_pool` and `pooled_connection`,
+so that commands and the loader do not have to set up a new connection for
+every operation. The size of the process-wide pool can be configured using
+the environment variables MINERVA_POOL_MIN_SIZE and MINERVA_POOL_MAX_SIZE,
+or explicitly using `configure_pool`.
+"""
+import os
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable, Optional, Dict, List, Tuple
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2 import sql
+
+from minerva.db import connect
+
+DEFAULT_MIN_SIZE = 1
+DEFAULT_MAX_SIZE = 10
+
+# Idle connections that have not been used for this number of seconds are
+# checked before they are handed out again
+DEFAULT_CHECK_INTERVAL = 30.0
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the timeout."""
+
+
+class PoolClosed(Exception):
+    """Raised when a connection is requested from a closed pool."""
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of database connections.
+
+    Connections are returned to the pool in a clean state: any open
+    transaction is rolled back and session settings changed by the user of
+    the connection are reset to the configured session settings.
+    """
+
+    min_size: int
+    max_size: int
+    session_settings: Dict[str, str]
+    check_interval: float
+    timeout: Optional[float]
+
+    def __init__(
+            self, connect_fn: Callable[[], psycopg2.extensions.connection] = connect,
+            min_size: int = DEFAULT_MIN_SIZE, max_size: int = DEFAULT_MAX_SIZE,
+            session_settings: Optional[Dict[str, str]] = None,
+            check_interval: float = DEFAULT_CHECK_INTERVAL,
+            timeout: Optional[float] = None):
+        """
+        :param connect_fn: Function returning a new connection
+        :param min_size: Number of connections opened up front and kept open
+        :param max_size: Maximum number of connections
+        :param session_settings: Settings (name -> value) applied to every
+        connection, e.g. {"lock_timeout": "1s"}
+        :param check_interval: Seconds of idle time after which a connection
+        is checked before it is handed out
+        :param timeout: Default seconds to wait for a connection, None to wait
+        indefinitely
+        """
+        if max_size < 1 or min_size > max_size:
+            raise ValueError(
+                f"Invalid pool size: min {min_size}, max {max_size}"
+            )
+
+        self.connect_fn = connect_fn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.session_settings = session_settings or {}
+        self.check_interval = check_interval
+        self.timeout = timeout
+        self.pid = os.getpid()
+
+        self._idle: List[Tuple[psycopg2.extensions.connection, float]] = []
+        self._size = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+        for _ in range(min_size):
+            self._idle.append((self._create(), time.monotonic()))
+            self._size += 1
+
+    @property
+    def size(self) -> int:
+        """Number of open connections, idle and in use."""
+        return self._size
+
+    @property
+    def idle_count(self) -> int:
+        return len(self._idle)
+
+    def getconn(self, timeout: Optional[float] = None) -> psycopg2.extensions.connection:
+        """
+        Return a connection from the pool, opening a new one if none is idle
+        and the maximum size is not reached yet.
+
+        :param timeout: Seconds to wait for a connection, the pool default if
+        None
+        """
+        if timeout is None:
+            timeout = self.timeout
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            conn, last_used = self._acquire(deadline)
+
+            if conn is None:
+                try:
+                    return self._create()
+                except Exception:
+                    self._release_slot()
+                    raise
+
+            if self._is_healthy(conn, last_used):
+                return conn
+
+            self._discard(conn)
+
+    def putconn(self, conn: psycopg2.extensions.connection, discard: bool = False):
+        """
+        Return a connection to the pool.
+
+        :param conn: Connection obtained using getconn
+        :param discard: Close the connection instead of keeping it
+        """
+        if not discard and not conn.closed:
+            try:
+                self._reset(conn)
+            except psycopg2.Error:
+                discard = True
+
+        with self._condition:
+            keep = not (discard or conn.closed or self._closed)
+
+            if keep:
+                self._idle.append((conn, time.monotonic()))
+                self._condition.notify()
+
+        if not keep:
+            self._discard(conn)
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """Context manager providing a connection from the pool."""
+        conn = self.getconn(timeout)
+
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def closeall(self):
+        """Close all idle connections and refuse new requests."""
+        with self._condition:
+            self._closed = True
+            idle = self._idle
+            self._idle = []
+            self._size -= len(idle)
+            self._condition.notify_all()
+
+        for conn, _ in idle:
+            conn.close()
+
+    def _acquire(self, deadline: Optional[float]):
+        """
+        Return (conn, last_used) of an idle connection, or (None, None) when a
+        new connection may be opened.
+        """
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise PoolClosed("connection pool is closed")
+
+                if self._idle:
+                    return self._idle.pop()
+
+                if self._size < self.max_size:
+                    self._size += 1
+
+                    return None, None
+
+                if deadline is None:
+                    self._condition.wait()
+                else:
+                    remaining = deadline - time.monotonic()
+
+                    if remaining <= 0 or not self._condition.wait(remaining):
+                        raise PoolTimeout(
+                            f"no connection available within timeout "
+                            f"(max size {self.max_size})"
+                        )
+
+    def _release_slot(self):
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+    def _discard(self, conn):
+        self._release_slot()
+
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def _create(self) -> psycopg2.extensions.connection:
+        conn = self.connect_fn()
+
+        if self.session_settings:
+            with conn.cursor() as cursor:
+                cursor.execute(self._session_settings_query())
+
+            conn.commit()
+
+        return conn
+
+    def _session_settings_query(self) -> sql.Composed:
+        return sql.SQL("; ").join(
+            sql.SQL("SET SESSION {} = {}").format(
+                sql.Identifier(name), sql.Literal(value)
+            )
+            for name, value in self.session_settings.items()
+        )
+
+    def _reset(self, conn):
+        """Bring a returned connection back into its initial state."""
+        conn.rollback()
+        conn.autocommit = False
+
+        with conn.cursor() as cursor:
+            cursor.execute("RESET ALL")
+
+            if self.session_settings:
+                cursor.execute(self._session_settings_query())
+
+        conn.commit()
+
+    def _is_healthy(self, conn, last_used: float) -> bool:
+        if conn.closed:
+            return False
+
+        if time.monotonic() - last_used < self.check_interval:
+            return True
+
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+
+            conn.rollback()
+        except psycopg2.Error:
+            return False
+
+        return True
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+# Pools inherited from a parent process through fork. Their connections share
+# sockets with the parent, so they must not be used or closed by the child.
+_inherited_pools: List[ConnectionPool] = []
+
+
+def configure_pool(**kwargs) -> ConnectionPool:
+    """
+    Replace the process-wide pool by a new pool created with the provided
+    keyword arguments (see ConnectionPool) and return it.
+    """
+    global _pool
+
+    with _pool_lock:
+        old_pool = _pool
+
+        _pool = ConnectionPool(**kwargs)
+
+    if old_pool is not None and old_pool.pid == os.getpid():
+        old_pool.closeall()
+
+    return _pool
+
+
+def get_pool() -> ConnectionPool:
+    """Return the process-wide pool, creating it on first use."""
+    global _pool
+
+    with _pool_lock:
+        if _pool is not None and _pool.pid != os.getpid():
+            _inherited_pools.append(_pool)
+            _pool = None
+
+        if _pool is None:
+            _pool = ConnectionPool(
+                min_size=int(os.environ.get("MINERVA_POOL_MIN_SIZE", DEFAULT_MIN_SIZE)),
+                max_size=int(os.environ.get("MINERVA_POOL_MAX_SIZE", DEFAULT_MAX_SIZE)),
+            )
+
+        return _pool
+
+
+def pooled_connection(timeout: Optional[float] = None):
+    """Context manager providing a connection from the process-wide pool."""
+    return get_pool().connection(timeout)
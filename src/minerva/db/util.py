@@ -1,11 +1,13 @@
 # -*- coding: utf-8 -*-
 from functools import partial
 from contextlib import closing
-from io import StringIO
-from typing import Iterable
+from typing import Iterable, Union, Optional
+
+import psycopg2
 
 from minerva.util.tabulate import render_table
 from minerva.db.query import Table
+from minerva.db.error import translate_postgresql_exception
 from minerva.util import zip_apply, compose
 
 
@@ -40,19 +42,82 @@ def create_copy_from_lines(tuples, formats):
     )
 
 
-def create_file(lines: Iterable[str]):
-    copy_from_file = StringIO()
+# Number of characters/bytes read from a copy-from file per request
+COPY_CHUNK_SIZE = 65536
+
+
+class IteratorFile:
+    """
+    Read-only file-like object that lazily pulls its content from an
+    iterable of strings or bytes (e.g. a generator of lines).
+
+    Only the data for one read request is rendered at any time, so the memory
+    used by a COPY FROM command does not depend on the number of rows. An
+    exception raised while rendering is kept in `error`, because psycopg2
+    replaces it by QueryCanceled (see `copy_from`).
+    """
+
+    error: Optional[Exception]
+
+    def __init__(self, chunks: Iterable[Union[str, bytes]], empty: Union[str, bytes] = ""):
+        self._chunks = iter(chunks)
+        self._empty = empty
+        self._buffer = empty
+        self.error = None
+
+    def read(self, size: int = -1) -> Union[str, bytes]:
+        parts = [self._buffer]
+        length = len(self._buffer)
+
+        while size < 0 or length < size:
+            try:
+                chunk = next(self._chunks)
+            except StopIteration:
+                break
+            except Exception as exc:
+                self.error = exc
+                raise
 
-    copy_from_file.writelines(lines)
+            parts.append(chunk)
+            length += len(chunk)
 
-    copy_from_file.seek(0)
+        data = self._empty.join(parts)
 
-    return copy_from_file
+        if size < 0:
+            self._buffer = self._empty
+
+            return data
+        else:
+            self._buffer = data[size:]
+
+            return data[:size]
+
+
+def create_file(lines: Iterable[str]) -> IteratorFile:
+    """Return file-like object that lazily reads the provided lines."""
+    return IteratorFile(lines)
 
 
 create_copy_from_file = compose(create_file, create_copy_from_lines)
 
 
+def copy_from(cursor, query, copy_from_file: IteratorFile, size: int = COPY_CHUNK_SIZE):
+    """
+    Execute a COPY FROM query with the data of `copy_from_file`.
+
+    When rendering the data fails, the original exception is raised instead
+    of the QueryCanceled error psycopg2 raises for it. Database errors are
+    translated using translate_postgresql_exception.
+    """
+    try:
+        cursor.copy_expert(query, copy_from_file, size)
+    except psycopg2.Error as exc:
+        if copy_from_file.error is not None:
+            raise copy_from_file.error from exc
+
+        raise translate_postgresql_exception(exc)
+
+
 def render_result(cursor):
     column_names = [c.name for c in cursor.description]
     column_align = ">" * len(column_names)
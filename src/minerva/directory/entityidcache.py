@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""Provides an in-process cache for mapping entity references to Ids."""
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Hashable, List, Any, Optional
+
+DEFAULT_MAX_SIZE = 1000000
+
+
+class EntityIdCache:
+    """
+    Size bounded LRU cache of entity Ids by (namespace, reference).
+
+    The namespace identifies the kind of reference and the entity type, e.g.
+    ("name", "cell") or ("alias", "dn", "cell"), so that the same reference
+    string of different entity types or alias types is cached separately.
+    """
+
+    max_size: int
+    hits: int
+    misses: int
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        """Remove all entries and reset the hit/miss counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def map_to_entity_ids(
+        self,
+        namespace: Hashable,
+        refs: List[Any],
+        lookup: Callable[[List[Any]], List[Optional[int]]],
+        get_or_create: Callable[[List[Any]], List[int]],
+    ) -> List[int]:
+        """
+        Return the entity Ids for `refs` in the same order.
+
+        References that are not in the cache are passed to `lookup` once per
+        distinct reference, and the Ids it finds are added to the cache. Any
+        references still unknown are passed to `get_or_create`. Those Ids are
+        not cached, because newly created entities disappear again if the
+        transaction is rolled back.
+
+        :param namespace: Identifies the reference type and entity type
+        :param refs: List of entity references (names, aliases, etc.)
+        :param lookup: Function returning the Ids of existing entities, or
+        None for unknown references
+        :param get_or_create: Function returning the Ids of the references,
+        creating entities where required
+        """
+        entity_ids = []
+        missing = {}
+
+        with self._lock:
+            for ref in refs:
+                key = (namespace, ref)
+
+                entity_id = self._entries.get(key)
+
+                if entity_id is None:
+                    self.misses += 1
+                    missing[ref] = None
+                else:
+                    self.hits += 1
+                    self._entries.move_to_end(key)
+
+                entity_ids.append(entity_id)
+
+        if not missing:
+            return entity_ids
+
+        missing_refs = list(missing)
+
+        fetched = dict(zip(missing_refs, lookup(missing_refs)))
+
+        with self._lock:
+            for ref, entity_id in fetched.items():
+                if entity_id is not None:
+                    self._put((namespace, ref), entity_id)
+
+        unknown_refs = [
+            ref for ref, entity_id in fetched.items() if entity_id is None
+        ]
+
+        if unknown_refs:
+            fetched.update(zip(unknown_refs, get_or_create(unknown_refs)))
+
+        return [
+            fetched[ref] if entity_id is None else entity_id
+            for ref, entity_id in zip(refs, entity_ids)
+        ]
+
+    def _put(self, key, entity_id: int):
+        if self.max_size <= 0:
+            return
+
+        self._entries[key] = entity_id
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def report(self) -> List[str]:
+        """Return list of report lines with the cache statistics."""
+        return [
+            f"entity id cache size: {len(self._entries)}/{self.max_size}",
+            f"entity id cache hits: {self.hits}",
+            f"entity id cache misses: {self.misses}",
+        ]
+
+
+# Process-wide cache used by the entity reference classes
+entity_id_cache = EntityIdCache()
@@ -3,7 +3,8 @@
 from typing import Tuple, NewType, List, Callable, Any
 
 from minerva.directory.helpers import aliases_to_entity_ids, \
-    names_to_entity_ids
+    names_to_entity_ids, lookup_entity_ids_by_alias, lookup_entity_ids_by_name
+from minerva.directory.entityidcache import entity_id_cache
 from minerva.directory import EntityType
 
 
@@ -74,8 +75,19 @@ def _create_alias_ref_class(alias_type: str, entity_type: str):
         @classmethod
         def map_to_entity_ids(cls, entity_refs):
             def f(cursor):
-                return aliases_to_entity_ids(
-                    cursor, alias_type, entity_refs, entity_type
+                def lookup(aliases):
+                    return lookup_entity_ids_by_alias(
+                        cursor, alias_type, aliases
+                    )
+
+                def get_or_create(aliases):
+                    return aliases_to_entity_ids(
+                        cursor, alias_type, aliases, entity_type
+                    )
+
+                return entity_id_cache.map_to_entity_ids(
+                    ("alias", alias_type, entity_type.lower()),
+                    entity_refs, lookup, get_or_create
                 )
 
             return f
@@ -111,8 +123,15 @@ def _create_name_ref_class(entity_type: str):
         @classmethod
         def map_to_entity_ids(cls, entity_refs):
             def f(cursor):
-                return names_to_entity_ids(
-                    cursor, entity_type, entity_refs
+                def lookup(names):
+                    return lookup_entity_ids_by_name(cursor, entity_type, names)
+
+                def get_or_create(names):
+                    return names_to_entity_ids(cursor, entity_type, names)
+
+                return entity_id_cache.map_to_entity_ids(
+                    ("name", entity_type.lower()),
+                    entity_refs, lookup, get_or_create
                 )
 
             return f
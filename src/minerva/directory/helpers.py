@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 """Helper functions for the directory schema."""
 import re
-from typing import List
+from typing import List, Optional
 
 from psycopg2 import sql
 
@@ -21,18 +21,28 @@ def aliases_to_entity_ids(cursor, namespace: str, aliases: list, entity_type: st
     return list(map(fst, cursor.fetchall()))
 
 
-def names_to_entity_ids(cursor, entity_type: str, names: List[str]) -> List[int]:
+@translate_postgresql_exceptions
+def lookup_entity_ids_by_alias(cursor, namespace: str, aliases: list) -> List[Optional[int]]:
     """
-    Map names to entity ID's, create any missing entities, and return the
-    corresponding entity ID's.
+    Return the ID's of the existing entities with the specified aliases, or
+    None for aliases without entity.
+    """
+    query = (
+        'SELECT (alias_directory.get_entity_by_alias(%s, a.alias)).id '
+        'FROM unnest(%s::text[]) WITH ORDINALITY AS a(alias, i) '
+        'ORDER BY a.i'
+    )
 
-    :param cursor: psycopg2 cursor
-    :param entity_type: case insensitive name of the entity type
-    :param names: names of entities for which to return the ID's
-    :return:
+    cursor.execute(query, (namespace, aliases))
+
+    return list(map(fst, cursor.fetchall()))
+
+
+def get_entity_type_name(cursor, entity_type: str) -> str:
+    """
+    Return the correct casing for the entity type name, because the table
+    name uses that specific casing.
     """
-    # First get the correct casing for the entity type name, because the table
-    # name uses that specific casing.
     query = sql.SQL(
         'SELECT name FROM directory.entity_type WHERE lower(name) = %s'
     )
@@ -41,34 +51,116 @@ def names_to_entity_ids(cursor, entity_type: str, names: List[str]) -> List[int]
 
     entity_type_name, = cursor.fetchone()
 
+    return entity_type_name
+
+
+def lookup_entity_ids_by_name(cursor, entity_type: str, names: List[str]) -> List[Optional[int]]:
+    """
+    Return the ID's of the existing entities with the specified names, or None
+    for names without entity.
+
+    :param cursor: psycopg2 cursor
+    :param entity_type: case insensitive name of the entity type
+    :param names: names of entities for which to return the ID's
+    """
+    entity_type_name = get_entity_type_name(cursor, entity_type)
+
+    return [
+        entity_id
+        for _name, entity_id in _lookup_names(cursor, entity_type_name, names)
+    ]
+
+
+def _lookup_names(cursor, entity_type_name: str, names: List[str]):
     query = sql.SQL(
-        'WITH lookup_list AS (SELECT unnest(ARRAY[%s]::text[]) AS name) '
-        'SELECT l.name, e.id FROM lookup_list l '
+        'SELECT l.name, e.id '
+        'FROM unnest(%s::text[]) WITH ORDINALITY AS l(name, i) '
         'LEFT JOIN entity.{} e ON l.name = e.name '
+        'ORDER BY l.i'
     ).format(sql.Identifier(entity_type_name))
 
-    entity_ids = []
-
     cursor.execute(query, (names,))
 
-    rows = cursor.fetchall()
+    return cursor.fetchall()
 
-    for name, entity_id in rows:
-        if entity_id is None:
-            entity_id = create_entity_from_name(cursor, entity_type_name, name)
 
-        entity_ids.append(entity_id)
+def names_to_entity_ids(cursor, entity_type: str, names: List[str]) -> List[int]:
+    """
+    Map names to entity ID's, create any missing entities, and return the
+    corresponding entity ID's.
 
-    return entity_ids
+    :param cursor: psycopg2 cursor
+    :param entity_type: case insensitive name of the entity type
+    :param names: names of entities for which to return the ID's
+    :return:
+    """
+    entity_type_name = get_entity_type_name(cursor, entity_type)
 
+    rows = _lookup_names(cursor, entity_type_name, names)
+
+    missing_names = list(dict.fromkeys(
+        name for name, entity_id in rows if entity_id is None
+    ))
+
+    if not missing_names:
+        return [entity_id for _name, entity_id in rows]
+
+    created = dict(zip(
+        missing_names,
+        create_entities_from_names(cursor, entity_type_name, missing_names)
+    ))
 
-def create_entities_from_names(cursor, entity_type: str, names: list) -> List[int]:
     return [
-        create_entity_from_name(cursor, entity_type, name)
-        for name in names
+        created[name] if entity_id is None else entity_id
+        for name, entity_id in rows
     ]
 
 
+def create_entities_from_names(cursor, entity_type: str, names: list) -> List[int]:
+    """
+    Create entities for the names in one statement and return the entity ID's
+    in the same order as the names. Names of already existing entities are
+    allowed, and so are entities that are created concurrently by another
+    session.
+
+    :param cursor: psycopg2 cursor
+    :param entity_type: name of the entity type with exact casing
+    :param names: names of entities to create
+    :return: list of entity ID's
+    """
+    table = sql.Identifier("entity", entity_type)
+
+    # Insert in sorted order so that concurrent sessions creating overlapping
+    # sets of entities acquire the unique index locks in the same order and
+    # can not deadlock.
+    insert_query = sql.SQL(
+        'INSERT INTO {}(name) '
+        'SELECT DISTINCT name FROM unnest(%s::text[]) AS name ORDER BY name '
+        'ON CONFLICT DO NOTHING '
+        'RETURNING name, id'
+    ).format(table)
+
+    cursor.execute(insert_query, (names,))
+
+    entity_ids = dict(cursor.fetchall())
+
+    existing_names = [name for name in names if name not in entity_ids]
+
+    if existing_names:
+        # Entities that already existed, or that were committed by another
+        # session while this one was waiting on the conflict. A new statement
+        # sees those in read committed mode.
+        select_query = sql.SQL(
+            'SELECT name, id FROM {} WHERE name = ANY(%s)'
+        ).format(table)
+
+        cursor.execute(select_query, (existing_names,))
+
+        entity_ids.update(cursor.fetchall())
+
+    return [entity_ids[name] for name in names]
+
+
 def create_entity_from_name(cursor, entity_type: str, name: str) -> int:
     insert_query = sql.SQL(
         'INSERT INTO {}(name) '
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Provides an in-process cache for directory metadata such as entity types,
+data sources and trend stores.
+"""
+import time
+from threading import Lock
+from typing import Callable, Hashable, Any, Optional, Dict, Tuple, List
+
+from minerva.directory.entitytype import EntityType
+from minerva.directory.datasource import DataSource
+
+# Seconds after which cached metadata is loaded from the database again, so
+# that changes made by other processes are picked up
+DEFAULT_TTL = 300.0
+
+
+class MetadataCache:
+    """
+    Cache of directory metadata by (namespace, key) with a time to live.
+
+    The namespace identifies the kind of object, e.g. "entity_type" or
+    "trend_store". Only found objects are cached; a lookup that finds nothing
+    is done again the next time, so that newly defined objects are used as
+    soon as they exist.
+    """
+
+    ttl: Optional[float]
+    hits: int
+    misses: int
+
+    def __init__(
+            self, ttl: Optional[float] = DEFAULT_TTL,
+            clock: Callable[[], float] = time.monotonic):
+        """
+        :param ttl: Seconds to keep entries, None to keep them until
+        invalidated
+        :param clock: Function returning the current time in seconds
+        """
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[Tuple[Hashable, Hashable], Tuple[Any, float]] = {}
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, namespace: Hashable, key: Hashable, load: Callable[[], Any]) -> Any:
+        """
+        Return the cached object for key in namespace, or the object returned
+        by `load` when it is not cached or expired.
+        """
+        now = self.clock()
+
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+
+            if entry is not None and (self.ttl is None or now - entry[1] < self.ttl):
+                self.hits += 1
+
+                return entry[0]
+
+            self.misses += 1
+
+        value = load()
+
+        if value is not None:
+            with self._lock:
+                self._entries[(namespace, key)] = value, now
+
+        return value
+
+    def put(self, namespace: Hashable, key: Hashable, value: Any):
+        """Add or replace the cached object for key in namespace."""
+        with self._lock:
+            self._entries[(namespace, key)] = value, self.clock()
+
+    def invalidate(self, namespace: Optional[Hashable] = None):
+        """Remove the entries of namespace, or all entries if None."""
+        with self._lock:
+            if namespace is None:
+                self._entries.clear()
+            else:
+                self._entries = {
+                    entry_key: entry
+                    for entry_key, entry in self._entries.items()
+                    if entry_key[0] != namespace
+                }
+
+    def clear(self):
+        """Remove all entries and reset the hit/miss counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def report(self) -> List[str]:
+        """Return list of report lines with the cache statistics."""
+        return [
+            f"metadata cache size: {len(self)}",
+            f"metadata cache hits: {self.hits}",
+            f"metadata cache misses: {self.misses}",
+        ]
+
+
+# Process-wide cache used by the storage engines
+metadata_cache = MetadataCache()
+
+
+def get_entity_type_by_name(name: str) -> Callable[[Any], Optional[EntityType]]:
+    """Return function that returns the entity type using the cache."""
+    def f(cursor):
+        return metadata_cache.get(
+            "entity_type", name.lower(), lambda: EntityType.get_by_name(name)(cursor)
+        )
+
+    return f
+
+
+def get_data_source_by_name(name: str) -> Callable[[Any], Optional[DataSource]]:
+    """Return function that returns the data source using the cache."""
+    def f(cursor):
+        return metadata_cache.get(
+            "data_source", name.lower(), lambda: DataSource.get_by_name(name)(cursor)
+        )
+
+    return f
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+from typing import Iterable, BinaryIO
+
+from minerva.storage.notification.package import Package
+from minerva.storage.notification.engine import NotificationEngine
+
+
+class HarvestParserNotification:
+    @staticmethod
+    def store_command():
+        engine = NotificationEngine()
+
+        return engine.store_cmd
+
+    def load_packages(self, stream: BinaryIO, name: str) -> Iterable[Package]:
+        """
+        Return iterable of notification Package objects.
+
+        :param stream: A file-like object to read the data from
+        :param name: Name of the stream (for files this should be the file path)
+        :return: An iterable of notification packages
+        """
+        raise NotImplementedError()
+
+
+class HarvestPluginNotification:
+    @staticmethod
+    def create_parser(config: dict) -> HarvestParserNotification:
+        """
+        Create and return new parser instance.
+
+        A parser instance is a callable object that returns an iterator of
+        notification packages.
+
+        :returns: A new parser object
+        """
+        raise NotImplementedError()
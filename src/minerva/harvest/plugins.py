@@ -34,15 +34,27 @@ def load_plugins():
     }
 
 
+# Plugin instances loaded through entry points by name, so that long running
+# processes load each plugin only once
+loaded_plugins = {}
+
+
 def get_plugin(name):
     if name in builtin_types:
         return builtin_types[name]
 
+    if name in loaded_plugins:
+        return loaded_plugins[name]
+
     try:
-        return next(
+        plugin = next(
             entry_point.load()()
             for entry_point in iter_entry_points()
             if entry_point.name == name
         )
     except StopIteration:
         return None
+
+    loaded_plugins[name] = plugin
+
+    return plugin
@@ -1,6 +1,8 @@
 from operator import itemgetter
 import csv
 import datetime
+from functools import lru_cache
+from typing import Optional
 from itertools import chain, islice
 
 import dateutil.parser
@@ -9,12 +11,16 @@ from minerva.directory.entityref import entity_name_ref_class
 from minerva.error import ConfigurationError
 from minerva.harvest.plugin_api_trend import HarvestParserTrend
 from minerva.storage.trend.trend import Trend
-from minerva.storage.trend.datapackage import DataPackage, DataPackageType
+from minerva.storage.trend.datapackage import DataPackage, DataPackageType, \
+    ColumnarDataPackage
 from minerva.storage.trend.granularity import create_granularity
 from minerva.storage.datatype import registry
+from minerva.util import identity
 
 DEFAULT_CHUNK_SIZE = 5000
 
+TIMESTAMP_CACHE_SIZE = 1024
+
 DEFAULT_CONFIG = {
     "timestamp": "timestamp",
     "identifier": "entity",
@@ -23,6 +29,8 @@ DEFAULT_CONFIG = {
     "columns": [],
     "entity_type": "node",
     "granularity": "15m",
+    "columnar": False,
+    "timestamp_format": None,
 }
 
 
@@ -38,19 +46,9 @@ class Parser(HarvestParserTrend):
 
         header = next(csv_reader)
 
-        timestamp_provider = is_timestamp_provider(header, self.config["timestamp"])
-
-        identifier_provider = is_identifier_provider(header, self.config["identifier"])
-
-        value_parsers = [
-            (
-                itemgetter(header.index(column["name"])),
-                registry[column["data_type"]].string_parser(
-                    column.get("parser_config", {"null_value": ""})
-                ),
-            )
-            for column in self.config["columns"]
-        ]
+        parse_timestamp = create_timestamp_parser(
+            self.config.get("timestamp_format")
+        )
 
         trend_descriptors = [
             Trend.Descriptor(column["name"], registry["text"], "")
@@ -70,22 +68,140 @@ class Parser(HarvestParserTrend):
             entity_type_name, entity_ref_type, get_entity_type_name
         )
 
-        rows = (
-            (
-                identifier_provider(row),
-                timestamp_provider(row),
-                tuple(
-                    parse_value(value_parser, get_value, row)
-                    for get_value, value_parser in value_parsers
+        chunk_size = self.config.get("chunk_size", DEFAULT_CHUNK_SIZE)
+
+        if self.config.get("columnar", False):
+            column_parsers = [
+                (
+                    header.index(column["name"]),
+                    registry[column["data_type"]].string_parser(
+                        column.get("parser_config", {"null_value": ""})
+                    ),
+                )
+                for column in self.config["columns"]
+            ]
+
+            if self.config["timestamp"] == "current_timestamp":
+                timestamp_index = None
+            else:
+                timestamp_index = column_index(header, self.config["timestamp"])
+
+            chunks = columnar_chunks(
+                csv_reader,
+                chunk_size,
+                column_index(header, self.config["identifier"]),
+                timestamp_column_provider(
+                    header, self.config["timestamp"], parse_timestamp
                 ),
+                column_parsers,
+                timestamp_index,
+            )
+
+            for entity_refs, timestamps, value_columns in chunks:
+                yield ColumnarDataPackage(
+                    data_package_type, granularity, trend_descriptors,
+                    entity_refs, timestamps, value_columns
+                )
+        else:
+            timestamp_provider = is_timestamp_provider(
+                header, self.config["timestamp"], parse_timestamp
+            )
+
+            identifier_provider = is_identifier_provider(
+                header, self.config["identifier"]
+            )
+
+            value_parsers = [
+                (
+                    itemgetter(header.index(column["name"])),
+                    registry[column["data_type"]].string_parser(
+                        column.get("parser_config", {"null_value": ""})
+                    ),
+                )
+                for column in self.config["columns"]
+            ]
+
+            rows = (
+                (
+                    identifier_provider(row),
+                    timestamp_provider(row),
+                    tuple(
+                        parse_value(value_parser, get_value, row)
+                        for get_value, value_parser in value_parsers
+                    ),
+                )
+                for row in csv_reader
             )
-            for row in csv_reader
+
+            for chunk in chunked(rows, chunk_size):
+                yield DataPackage(
+                    data_package_type, granularity, trend_descriptors, chunk
+                )
+
+
+def columnar_chunks(
+        csv_reader, chunk_size: int, identifier_index: int,
+        timestamp_column_parser, column_parsers,
+        timestamp_index: Optional[int] = None):
+    """
+    Read chunks of rows and parse them column by column instead of row by row.
+
+    Each column is converted with a single map over all values of the chunk,
+    which avoids the per-value call overhead of the row oriented path for
+    files with many columns.
+    :param csv_reader: the csv reader providing the rows
+    :param chunk_size: the maximum number of rows per chunk
+    :param identifier_index: the index of the entity identifier column
+    :param timestamp_column_parser: function returning the parsed timestamps
+    from a list of columns
+    :param column_parsers: list of (column index, value parser) tuples
+    :param timestamp_index: the index of the timestamp column, None if the
+    timestamps do not come from the rows
+    :return: generator of (entity refs, timestamps, value columns) tuples
+    """
+    required_length = 1 + max(
+        chain(
+            [identifier_index],
+            [] if timestamp_index is None else [timestamp_index],
+            (index for index, _ in column_parsers)
         )
+    )
 
-        chunk_size = self.config.get("chunk_size", DEFAULT_CHUNK_SIZE)
+    for chunk in chunked(csv_reader, chunk_size):
+        if min(map(len, chunk)) < required_length:
+            raise ParseError(
+                f"Row with less than {required_length} values in chunk"
+            )
 
-        for chunk in chunked(rows, chunk_size):
-            yield DataPackage(data_package_type, granularity, trend_descriptors, chunk)
+        columns = list(zip(*chunk))
+
+        value_columns = [
+            parse_column(value_parser, columns[index])
+            for index, value_parser in column_parsers
+        ]
+
+        yield (
+            columns[identifier_index],
+            timestamp_column_parser(columns),
+            value_columns
+        )
+
+
+def parse_column(value_parser, raw_values) -> list:
+    """
+    Parse all values of a column and provide context if an error occurs.
+    :param value_parser:
+    :param raw_values:
+    :return:
+    """
+    try:
+        return list(map(value_parser, raw_values))
+    except Exception:
+        # Find the offending value to report it
+        return [
+            parse_value(value_parser, identity, raw_value)
+            for raw_value in raw_values
+        ]
 
 
 def chunked(iterable, size: int):
@@ -122,7 +238,27 @@ def parse_value(value_parser, get_value, row):
     return value
 
 
-def is_timestamp_provider(header, name):
+def create_timestamp_parser(timestamp_format: Optional[str] = None):
+    """
+    Return a memoizing timestamp parser. Data files typically contain only a
+    few distinct timestamps, so most values are served from the cache.
+
+    :param timestamp_format: None for generic parsing by dateutil, "iso" for
+    ISO 8601 parsing using datetime.fromisoformat, or a strptime format string
+    :return: a function (str_value) -> datetime
+    """
+    if timestamp_format is None:
+        parse = dateutil.parser.parse
+    elif timestamp_format == "iso":
+        parse = datetime.datetime.fromisoformat
+    else:
+        def parse(value):
+            return datetime.datetime.strptime(value, timestamp_format)
+
+    return lru_cache(maxsize=TIMESTAMP_CACHE_SIZE)(parse)
+
+
+def is_timestamp_provider(header, name, parse_timestamp=dateutil.parser.parse):
     if name == "current_timestamp":
         timestamp = datetime.datetime.now()
 
@@ -139,18 +275,46 @@ def is_timestamp_provider(header, name):
         def f(row):
             value = row[column_index]
 
-            timestamp = dateutil.parser.parse(value)
+            timestamp = parse_timestamp(value)
 
             return timestamp
 
         return f
 
 
-def is_identifier_provider(header, name):
+def timestamp_column_provider(header, name, parse_timestamp=dateutil.parser.parse):
+    """
+    Return a function that returns the parsed timestamps from a list of
+    columns.
+    """
+    if name == "current_timestamp":
+        timestamp = datetime.datetime.now()
+
+        def f(columns):
+            return [timestamp] * len(columns[0])
+
+        return f
+    else:
+        if name not in header:
+            raise ConfigurationError(f"No column named '{name}' specified in header")
+
+        column_index = header.index(name)
+
+        def f(columns):
+            return list(map(parse_timestamp, columns[column_index]))
+
+        return f
+
+
+def column_index(header, name) -> int:
     if name not in header:
         raise ConfigurationError(f"No column named '{name}' specified in header")
     else:
-        return itemgetter(header.index(name))
+        return header.index(name)
+
+
+def is_identifier_provider(header, name):
+    return itemgetter(column_index(header, name))
 
 
 class AliasRef:
@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+"""
+Provides a long-running ingest service that loads files appearing in spool
+directories.
+"""
+import os
+import time
+import shutil
+import struct
+import select
+import logging
+import threading
+import ctypes
+import ctypes.util
+from fnmatch import fnmatch
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from typing import List, Optional, Set, Iterable
+
+from minerva.loading.loader import Loader
+
+DEFAULT_POLL_INTERVAL = 2.0
+
+# Files must not have been modified for this number of seconds before they
+# are picked up by the polling watcher, to skip files that are still being
+# written.
+DEFAULT_SETTLE_TIME = 1.0
+
+DONE_DIR_NAME = "done"
+FAILED_DIR_NAME = "failed"
+
+# inotify event masks from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+
+INOTIFY_EVENT_HEADER = struct.Struct("iIII")
+
+
+class PollingWatcher:
+    """Watch directories for new files by periodically listing them."""
+
+    def __init__(
+            self, directories: List[Path], pattern: str = "*",
+            settle_time: float = DEFAULT_SETTLE_TIME):
+        self.directories = directories
+        self.pattern = pattern
+        self.settle_time = settle_time
+
+    def poll(self, timeout: float) -> List[Path]:
+        """
+        Return the files present in the watched directories, waiting up to
+        `timeout` seconds when there are none.
+        """
+        files = self.scan()
+
+        if not files:
+            time.sleep(timeout)
+
+        return files
+
+    def scan(self) -> List[Path]:
+        """Return the settled files present in the watched directories."""
+        settled_before = time.time() - self.settle_time
+
+        return [
+            path
+            for path in list_files(self.directories, self.pattern)
+            if modified_before(path, settled_before)
+        ]
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """
+    Watch directories for new files using the Linux inotify API. Files are
+    reported when they are closed after writing or moved into a directory.
+    """
+
+    def __init__(self, directories: List[Path], pattern: str = "*"):
+        self.directories = directories
+        self.pattern = pattern
+
+        libc_name = ctypes.util.find_library("c")
+
+        if libc_name is None:
+            raise OSError("C library not found")
+
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self._directory_by_wd = {}
+
+        for directory in directories:
+            wd = self._libc.inotify_add_watch(
+                self._fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO
+            )
+
+            if wd < 0:
+                errno = ctypes.get_errno()
+                os.close(self._fd)
+                raise OSError(errno, f"inotify_add_watch failed for {directory}")
+
+            self._directory_by_wd[wd] = directory
+
+        # Files that were already present before the watch was set up
+        self._pending = list_files(directories, pattern)
+
+    def poll(self, timeout: float) -> List[Path]:
+        """
+        Return the new files in the watched directories, waiting up to
+        `timeout` seconds when there are none.
+        """
+        if self._pending:
+            files, self._pending = self._pending, []
+
+            return files
+
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+
+        if not readable:
+            return []
+
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        files = []
+        offset = 0
+
+        while offset < len(data):
+            wd, mask, _cookie, length = INOTIFY_EVENT_HEADER.unpack_from(data, offset)
+            offset += INOTIFY_EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost, fall back to listing the directories
+                return list_files(self.directories, self.pattern)
+
+            directory = self._directory_by_wd.get(wd)
+
+            if directory is not None and name:
+                name = os.fsdecode(name)
+
+                if fnmatch(name, self.pattern):
+                    files.append(directory / name)
+
+        return files
+
+    def close(self):
+        os.close(self._fd)
+
+
+def modified_before(path: Path, timestamp: float) -> bool:
+    """
+    Return True if the file was last modified before `timestamp`, False if
+    it was modified later or no longer exists, e.g. because it was loaded and
+    moved away in the meantime.
+    """
+    try:
+        return path.stat().st_mtime <= timestamp
+    except FileNotFoundError:
+        return False
+
+
+def list_files(directories: Iterable[Path], pattern: str) -> List[Path]:
+    """Return the regular files directly in `directories` matching `pattern`."""
+    return sorted(
+        path
+        for directory in directories
+        for path in directory.glob(pattern)
+        if path.is_file()
+    )
+
+
+def create_watcher(
+        directories: List[Path], pattern: str = "*", use_inotify: bool = True,
+        settle_time: float = DEFAULT_SETTLE_TIME):
+    """
+    Return an inotify based watcher when available and requested, otherwise
+    a polling watcher.
+    """
+    if use_inotify:
+        try:
+            return InotifyWatcher(directories, pattern)
+        except (OSError, AttributeError) as exc:
+            logging.warning(f"inotify not available, falling back to polling: {exc}")
+
+    return PollingWatcher(directories, pattern, settle_time)
+
+
+class IngestDaemon:
+    """
+    Load files from spool directories using one warmed Loader and a pool of
+    worker threads. Loaded files are moved to the done directory, files that
+    could not be loaded to the failed directory.
+    """
+
+    def __init__(
+            self, loader: Loader, file_type: str, config: Optional[dict],
+            watcher, jobs: int = 1, done_dir: Optional[Path] = None,
+            failed_dir: Optional[Path] = None,
+            poll_interval: float = DEFAULT_POLL_INTERVAL):
+        """
+        :param done_dir: Directory for loaded files, a 'done' directory next
+        to each file by default
+        :param failed_dir: Directory for files that could not be loaded, a
+        'failed' directory next to each file by default
+        """
+        self.loader = loader
+        self.file_type = file_type
+        self.config = config
+        self.watcher = watcher
+        self.jobs = jobs
+        self.done_dir = done_dir
+        self.failed_dir = failed_dir
+        self.poll_interval = poll_interval
+        self.processed_count = 0
+        self.failed_count = 0
+
+        self._in_progress: Set[Path] = set()
+        self._lock = threading.Lock()
+        # Limits the files handed to the executor to the number of workers
+        self._slots = threading.Semaphore(jobs)
+
+    def run(self, stop_event: threading.Event):
+        """
+        Process files until `stop_event` is set.
+
+        At most `jobs` files are submitted to the workers at a time, the other
+        reported files wait here. That way stopping only waits for the files
+        that are being loaded, and the waiting files stay in the spool
+        directory for the next run.
+        """
+        waiting = deque()
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            while not stop_event.is_set():
+                if not waiting:
+                    files = self.watcher.poll(self.poll_interval)
+
+                    with self._lock:
+                        waiting.extend(
+                            path for path in files if path not in self._in_progress
+                        )
+
+                while waiting and not stop_event.is_set():
+                    if not self._slots.acquire(timeout=self.poll_interval):
+                        break
+
+                    if stop_event.is_set():
+                        self._slots.release()
+                        break
+
+                    path = waiting.popleft()
+
+                    with self._lock:
+                        if path in self._in_progress or not path.exists():
+                            self._slots.release()
+                            continue
+
+                        self._in_progress.add(path)
+
+                    executor.submit(self.process, path)
+
+    def process(self, path: Path):
+        """Load one file and move it to the done or failed directory."""
+        try:
+            try:
+                self.loader.load_data(self.file_type, self.config, path)
+            except Exception:
+                logging.exception(f"Error loading file {path}")
+
+                move_file(path, self.failed_dir or path.parent / FAILED_DIR_NAME)
+
+                with self._lock:
+                    self.failed_count += 1
+            else:
+                move_file(path, self.done_dir or path.parent / DONE_DIR_NAME)
+
+                with self._lock:
+                    self.processed_count += 1
+        finally:
+            with self._lock:
+                self._in_progress.discard(path)
+
+            self._slots.release()
+
+
+def move_file(path: Path, directory: Path) -> Path:
+    """
+    Move file into directory without overwriting existing files and return
+    the new path.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+
+    target = directory / path.name
+
+    if target.exists():
+        target = directory / f"{path.name}.{time.time_ns()}"
+
+    shutil.move(str(path), str(target))
+
+    return target
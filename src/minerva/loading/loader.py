@@ -1,23 +1,32 @@
 # -*- coding: utf-8 -*-
 """Logic for loading data into Minerva."""
-from typing import Callable, Optional
+from typing import Callable, Optional, List, Iterable, ContextManager
 import logging
-from contextlib import contextmanager
+import multiprocessing
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager, nullcontext, ExitStack
 from contextlib import closing
 from operator import itemgetter
 from functools import partial
 import re
 from pathlib import Path
 
-from minerva.storage.trend.trendstore import NoSuchTrendStore
+from minerva.storage.trend.trendstore import NoSuchTrendStore, TrendStore
+from minerva.storage.trend.engine import trend_store_for_package
+from minerva.storage.notification.notificationstore import NoSuchNotificationStore
+from minerva.directory.entityidcache import entity_id_cache
+from minerva.directory.metadatacache import metadata_cache, get_data_source_by_name
 from minerva.util import compose, k
 from minerva.directory import DataSource
 import minerva.storage.trend.datapackage
-from minerva.storage.trend.datapackage import DataPackage
+from minerva.storage.trend.datapackage import DataPackage, \
+    DUPLICATES_KEEP_LAST
 from minerva.logging import start_job, end_job
 from minerva.directory.entitytype import NoSuchEntityType, EntityType
 from minerva.harvest.fileprocessor import process_file
-from minerva.db import connect, connect_logging
+from minerva.db import connect_logging
+from minerva.db.pool import pooled_connection
 from minerva.harvest.plugins import get_plugin
 from minerva.error import ConfigurationError
 
@@ -33,6 +42,9 @@ class Loader:
     show_progress: bool
     merge_packages: bool
     stop_on_missing_entity_type: bool
+    binary_copy: bool
+    duplicate_policy: Optional[str]
+    max_batch_files: int
 
     def __init__(self):
         """Initialize new Loader instance."""
@@ -43,6 +55,9 @@ class Loader:
         self.show_progress = False
         self.merge_packages = True
         self.stop_on_missing_entity_type = False
+        self.binary_copy = False
+        self.duplicate_policy = DUPLICATES_KEEP_LAST
+        self.max_batch_files = DEFAULT_MAX_BATCH_FILES
 
     def load_data(self, file_type: str, config: Optional[dict], file_path: Path):
         """
@@ -54,6 +69,25 @@ class Loader:
         :param file_path: The file to process
         :return:
         """
+        self.load_batch(file_type, config, [file_path])
+
+    def load_batch(
+            self, file_type: str, config: Optional[dict],
+            file_paths: List[Path], store_lock=None):
+        """
+        Load the data in all files of `file_paths` of type `file_type`.
+
+        When merge_packages is set, the packages of all files are merged
+        before storing, so that each trend store part is written once for the
+        whole batch.
+        :param file_type: The type of file
+        :param config: The parser configuration
+        :param file_paths: The files to process
+        :param store_lock: Optional function returning a lock (context
+        manager) for a list of keys, that is held while storing a trend
+        package (see trend_store_lock_keys)
+        :return:
+        """
         statistics = Statistics()
 
         plugin = get_plugin(file_type)
@@ -66,12 +100,18 @@ class Loader:
             if self.debug:
                 connect_to_db = partial(connect_logging, logging.getLogger("psycopg2"))
             else:
-                connect_to_db = connect
+                # Use the process-wide connection pool
+                connect_to_db = None
 
             storage_provider = create_store_db_context(
                 self.data_source,
                 parser.store_command(),
                 connect_to_db,
+                trend_store_options={
+                    "binary_copy": self.binary_copy,
+                    "duplicate_policy": self.duplicate_policy,
+                },
+                store_lock=store_lock,
             )
 
         try:
@@ -83,21 +123,25 @@ class Loader:
 
                     store(package, action)
 
-                logging.info(
-                    "Start processing file {0} of type {1}"
-                    " and config {2}".format(file_path, file_type, config)
-                )
+                def process_files():
+                    for file_path in file_paths:
+                        logging.info(
+                            "Start processing file {0} of type {1}"
+                            " and config {2}".format(file_path, file_type, config)
+                        )
+
+                        yield from process_file(file_path, parser, self.show_progress)
 
                 action = {
                     "type": "load-data",
                     "file_type": file_type,
-                    "uri": str(file_path),
+                    "uri": ", ".join(str(file_path) for file_path in file_paths),
                 }
 
-                packages_generator = process_file(file_path, parser, self.show_progress)
+                packages_generator = process_files()
 
                 if self.merge_packages:
-                    packages = DataPackage.merge_packages(packages_generator)
+                    packages = merge_trend_packages(packages_generator)
                 else:
                     packages = packages_generator
 
@@ -126,6 +170,97 @@ class Loader:
             for line in statistics.report():
                 logging.info(line)
 
+    def load_files_parallel(
+            self, file_type: str, config: Optional[dict],
+            file_paths: List[Path], jobs: int):
+        """
+        Load the data in all files of `file_paths` using `jobs` worker
+        processes.
+
+        The files are divided into batches of at most `max_batch_files` files
+        that are each parsed, merged and stored by one worker with its own
+        database connection. Storing packages with the same timestamps in the
+        same trend store part is serialized between the workers, so that
+        concurrent writers do not conflict on existing rows, while packages
+        for other parts or timestamps are stored in parallel.
+        :param file_type: The type of file
+        :param config: The parser configuration
+        :param file_paths: The files to process
+        :param jobs: The number of worker processes
+        :return:
+        """
+        locks = [multiprocessing.Lock() for _ in range(jobs * STORE_LOCKS_PER_JOB)]
+
+        with ProcessPoolExecutor(
+                max_workers=jobs, initializer=_init_worker,
+                initargs=(locks,)) as executor:
+            futures = [
+                executor.submit(_load_batch, self, file_type, config, batch)
+                for batch in split_batches(
+                    file_paths, jobs * BATCHES_PER_JOB, self.max_batch_files
+                )
+            ]
+
+            for future in as_completed(futures):
+                # Re-raise any exception from the worker
+                future.result()
+
+
+# Number of lock stripes per worker for serializing stores of the same
+# trend store part and timestamp
+STORE_LOCKS_PER_JOB = 16
+
+# Number of file batches per worker, for balancing the load over the workers
+BATCHES_PER_JOB = 4
+
+# Maximum number of files per batch, which bounds the memory used for merging
+# the packages of a batch
+DEFAULT_MAX_BATCH_FILES = 50
+
+_store_locks: List = []
+
+
+def _init_worker(locks):
+    global _store_locks
+
+    _store_locks = locks
+
+
+@contextmanager
+def _store_lock(keys: Iterable[str]):
+    """
+    Hold the lock stripes of all keys, acquired in a fixed order so that
+    workers holding several stripes cannot deadlock.
+    """
+    indexes = sorted(
+        set(zlib.crc32(key.encode()) % len(_store_locks) for key in keys)
+    )
+
+    with ExitStack() as stack:
+        for index in indexes:
+            stack.enter_context(_store_locks[index])
+
+        yield
+
+
+def _load_batch(
+        loader: Loader, file_type: str, config: Optional[dict],
+        file_paths: List[Path]):
+    loader.load_batch(file_type, config, file_paths, _store_lock)
+
+
+def split_batches(items: list, count: int, max_size: Optional[int] = None) -> List[list]:
+    """
+    Split `items` into batches of (nearly) equal size: at most `count`
+    batches, unless that would make them larger than `max_size`.
+    """
+    size = max(1, -(-len(items) // count))
+
+    if max_size is not None:
+        size = min(size, max_size)
+
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
 
 def create_regex_filter(expression):
     """Construct a filter function from a regular expression string."""
@@ -155,7 +290,7 @@ class Statistics:
         return [
             f"packages: {self.package_count}",
             f"records: {self.record_count}",
-        ]
+        ] + entity_id_cache.report() + metadata_cache.report()
 
 
 def filter_trend_package(entity_filter, trend_filter, package: DataPackage):
@@ -245,14 +380,34 @@ def tee(fn):
 def create_store_db_context(
     data_source_name: str,
     store_cmd: Callable[[DataPackage, int], Callable[[str], Callable[[any], None]]],
-    connect_to_db,
+    connect_to_db=None,
     stop_on_missing_trend_store=False,
+    trend_store_options: Optional[dict] = None,
+    store_lock: Optional[Callable[[List[str]], ContextManager]] = None,
 ):
+    """
+    Return a context manager providing a function for storing packages.
+
+    :param connect_to_db: Function returning a new connection that is closed
+    afterwards, or None to use a connection from the process-wide pool
+    :param trend_store_options: Keyword arguments passed to the store command
+    for trend packages, e.g. {"binary_copy": True}
+    :param store_lock: Optional function returning a lock for the keys of
+    trend_store_lock_keys, held while storing a trend package
+    """
+    options = trend_store_options or {}
+
+    def connection():
+        if connect_to_db is None:
+            return pooled_connection()
+        else:
+            return closing(connect_to_db())
+
     @contextmanager
     def store_db_context():
-        with closing(connect_to_db()) as conn:
+        with connection() as conn:
             with closing(conn.cursor()) as cursor:
-                data_source = DataSource.get_by_name(data_source_name)(cursor)
+                data_source = get_data_source_by_name(data_source_name)(cursor)
 
             if data_source is None:
                 raise no_such_data_source_error(data_source_name)
@@ -261,7 +416,19 @@ def create_store_db_context(
                 job_id = start_job(conn, action)
 
                 try:
-                    store_cmd(package, job_id)(data_source)(conn)
+                    if isinstance(package, DataPackage):
+                        if store_lock is None:
+                            lock = nullcontext()
+                        else:
+                            lock = store_lock(trend_store_lock_keys(
+                                trend_store_for_package(data_source, package)(conn),
+                                package
+                            ))
+
+                        with lock:
+                            store_cmd(package, job_id, **options)(data_source)(conn)
+                    else:
+                        store_cmd(package, job_id)(data_source)(conn)
                 except NoSuchTrendStore as exc:
                     if stop_on_missing_trend_store:
                         raise no_such_trend_store_error(
@@ -269,6 +436,11 @@ def create_store_db_context(
                         )
                     else:
                         logging.warning(str(exc))
+                except NoSuchNotificationStore as exc:
+                    if stop_on_missing_trend_store:
+                        raise no_such_notification_store_error(exc.data_source)
+                    else:
+                        logging.warning(str(exc))
                 finally:
                     end_job(conn, job_id)
 
@@ -277,6 +449,43 @@ def create_store_db_context(
     return store_db_context
 
 
+def merge_trend_packages(packages: Iterable) -> list:
+    """
+    Return the packages with the trend packages merged per key (see
+    DataPackage.merge_packages). Other packages, like notification packages,
+    are passed on as they are.
+    """
+    trend_packages = []
+    other_packages = []
+
+    for package in packages:
+        if isinstance(package, DataPackage):
+            trend_packages.append(package)
+        else:
+            other_packages.append(package)
+
+    return other_packages + DataPackage.merge_packages(trend_packages)
+
+
+def trend_store_lock_keys(trend_store: TrendStore, package: DataPackage) -> List[str]:
+    """
+    Return a key for each combination of trend store part and timestamp that
+    storing package writes to. Stores with no keys in common cannot conflict
+    on existing rows.
+    """
+    part_ids = sorted(set(
+        trend_store._trend_part_mapping[trend_descriptor.name].id
+        for trend_descriptor in package.trend_descriptors
+        if trend_descriptor.name in trend_store._trend_part_mapping
+    ))
+
+    return [
+        f"{part_id}/{timestamp.isoformat()}"
+        for part_id in part_ids
+        for timestamp in sorted(package.timestamps())
+    ]
+
+
 def no_such_data_source_error(data_source_name: str) -> ConfigurationError:
     return ConfigurationError(
         "No such data source '{data_source}'\n"
@@ -288,6 +497,17 @@ def no_such_data_source_error(data_source_name: str) -> ConfigurationError:
     )
 
 
+def no_such_notification_store_error(data_source: DataSource) -> ConfigurationError:
+    return ConfigurationError(
+        "No notification store found for data source '{data_source}'\n"
+        "Create a notification store using e.g.\n"
+        "\n"
+        "    minerva notification-store create".format(
+            data_source=data_source.name
+        )
+    )
+
+
 def no_such_trend_store_error(
     data_source: DataSource, entity_type: EntityType, granularity: str
 ) -> ConfigurationError:
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Provides asyncio variants of the trend, attribute and notification store
+operations.
+
+Each coroutine runs the corresponding synchronous store action through an
+`AsyncDbRunner`, so that many deliveries can be stored concurrently over the
+runner's connection pool:
+
+    async with AsyncDbRunner() as runner:
+        await asyncio.gather(*(
+            store_trend_package(runner, trend_store, package, job_id)
+            for package in packages
+        ))
+"""
+from typing import Any, Optional
+
+from minerva.db.aio import AsyncDbRunner
+from minerva.directory import DataSource
+from minerva.storage import StoreCmd
+from minerva.storage.trend.trendstore import TrendStore
+from minerva.storage.trend.datapackage import DataPackage, \
+    DUPLICATES_KEEP_LAST
+from minerva.storage.attribute.attributestore import AttributeStore
+from minerva.storage.notification.notificationstore import NotificationStore
+from minerva.storage.notification.package import Package
+from minerva.storage.notification.types import Record
+
+
+async def store_trend_package(
+        runner: AsyncDbRunner, trend_store: TrendStore,
+        data_package: DataPackage, job_id: int, binary_copy: bool = False,
+        duplicate_policy: Optional[str] = DUPLICATES_KEEP_LAST):
+    """Store the package in the trend store (see TrendStore.store)."""
+    await runner.run(trend_store.store(
+        data_package, job_id, binary_copy, duplicate_policy
+    ))
+
+
+async def store_attribute_package(
+        runner: AsyncDbRunner, attribute_store: AttributeStore,
+        data_package):
+    """Store the package in the attribute store (see AttributeStore.store)."""
+    await runner.run(attribute_store.store(data_package))
+
+
+async def store_notification_record(
+        runner: AsyncDbRunner, notification_store: NotificationStore,
+        record: Record):
+    """Store the record in the notification store."""
+    await runner.run_cursor(notification_store.store_record(record))
+
+
+async def store_notification_package(
+        runner: AsyncDbRunner, notification_store: NotificationStore,
+        package: Package):
+    """Store the package in the notification store using COPY."""
+    await runner.run_cursor(notification_store.store_package(package))
+
+
+async def run_store_cmd(
+        runner: AsyncDbRunner, store_cmd: StoreCmd,
+        data_source: DataSource) -> Any:
+    """
+    Run a store command of an engine, e.g. TrendEngine.store_cmd(package,
+    job_id), for data_source. The lookup of the target store and the storage
+    itself run in one transaction.
+    """
+    return await runner.run(store_cmd(data_source))
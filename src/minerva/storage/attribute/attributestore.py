@@ -1,11 +1,9 @@
 # -*- coding: utf-8 -*-
 """Provides AttributeStore class."""
 from contextlib import closing
-from functools import partial
 
 import psycopg2
 
-from minerva.util import expand_args
 from minerva.db.query import Table
 from minerva.directory import EntityType, DataSource
 from minerva.db.error import (
@@ -198,17 +196,59 @@ class AttributeStore:
 
     @staticmethod
     def get_all(cursor):
-        """Load and return all attribute stores."""
+        """
+        Load and return all attribute stores.
+
+        The attribute stores with their data sources and entity types are
+        loaded using one query, and the attributes of all stores using
+        another.
+        """
         query = (
-            "SELECT id, data_source_id, entity_type_id "
-            "FROM attribute_directory.attribute_store"
+            "SELECT ast.id, ds.id, ds.name, ds.description, "
+            "et.id, et.name, et.description "
+            "FROM attribute_directory.attribute_store ast "
+            "JOIN directory.data_source ds ON ds.id = ast.data_source_id "
+            "JOIN directory.entity_type et ON et.id = ast.entity_type_id "
+            "ORDER BY ast.id"
+        )
+
+        attributes_query = (
+            "SELECT id, name, data_type, description, attribute_store_id "
+            "FROM attribute_directory.attribute "
+            "ORDER BY attribute_store_id, id"
         )
 
         cursor.execute(query)
 
-        load = expand_args(partial(AttributeStore.load_attribute_store, cursor))
+        store_rows = cursor.fetchall()
 
-        return map(load, cursor.fetchall())
+        cursor.execute(attributes_query)
+
+        attributes_by_store = {}
+
+        for attribute_id, name, data_type, description, attribute_store_id in cursor.fetchall():
+            attributes_by_store.setdefault(attribute_store_id, []).append(
+                Attribute(
+                    attribute_id,
+                    name,
+                    datatype.registry[data_type],
+                    attribute_store_id,
+                    description,
+                )
+            )
+
+        return [
+            AttributeStore(
+                id_,
+                DataSource(data_source_id, data_source_name, data_source_description),
+                EntityType(entity_type_id, entity_type_name, entity_type_description),
+                attributes_by_store.get(id_, []),
+            )
+            for (
+                id_, data_source_id, data_source_name, data_source_description,
+                entity_type_id, entity_type_name, entity_type_description
+            ) in store_rows
+        ]
 
     @staticmethod
     def load_attribute_store(id_: int, data_source_id: int, entity_type_id: int):
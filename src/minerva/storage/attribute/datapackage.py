@@ -1,9 +1,8 @@
 # -*- coding: utf-8 -*-
 """Provides the DataPackage class."""
-from io import StringIO
 from itertools import chain
 
-from minerva.db.util import quote_ident
+from minerva.db.util import quote_ident, IteratorFile, copy_from
 from minerva.util import zip_apply
 from minerva.storage import datatype
 from minerva.storage.valuedescriptor import ValueDescriptor
@@ -84,7 +83,8 @@ class DataPackage:
                            should be rendered.
         """
         def fn(cursor):
-            cursor.copy_expert(
+            copy_from(
+                cursor,
                 self._create_copy_from_query(table),
                 self._create_copy_from_file(output_descriptors)
             )
@@ -101,20 +101,12 @@ class DataPackage:
 
     def _create_copy_from_file(self, output_descriptors):
         """
-        Return StringIO instance to use with COPY FROM command.
+        Return lazily rendered file-like object to use with COPY FROM command.
 
         :param data_types: A list of datatypes that determine how the values
         should be rendered.
         """
-        copy_from_file = StringIO()
-
-        lines = self._create_copy_from_lines(output_descriptors)
-
-        copy_from_file.writelines(lines)
-
-        copy_from_file.seek(0)
-
-        return copy_from_file
+        return IteratorFile(self._create_copy_from_lines(output_descriptors))
 
     def _create_copy_from_lines(self, output_descriptors):
         value_mappers = [
@@ -122,10 +114,10 @@ class DataPackage:
             for output_descriptor in output_descriptors
         ]
 
-        return [
+        return (
             create_copy_from_line(value_mappers, row)
             for row in self.rows
-        ]
+        )
 
     def to_dict(self):
         """Return dictionary representing this package."""
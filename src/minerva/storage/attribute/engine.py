@@ -1,6 +1,6 @@
 from contextlib import closing
 
-from minerva.directory import EntityType
+from minerva.directory.metadatacache import get_entity_type_by_name
 
 from minerva.storage import Engine
 from minerva.storage.attribute.attributestore import AttributeStore
@@ -14,7 +14,7 @@ class AttributeEngine(Engine):
                 entity_type_name = package.entity_type_name()
 
                 with closing(conn.cursor()) as cursor:
-                    entity_type = EntityType.get_by_name(entity_type_name)(
+                    entity_type = get_entity_type_by_name(entity_type_name)(
                         cursor
                     )
 
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 """Defines the data types recognized by Minerva."""
 import re
+import struct
 from datetime import datetime, tzinfo
 import decimal
 from functools import partial, reduce
@@ -16,9 +17,89 @@ class ParseError(Exception):
     pass
 
 
+# Length field of a NULL value in the PostgreSQL binary COPY format
+NULL_FIELD = struct.pack("!i", -1)
+
+# Timestamps are sent as microseconds since this epoch in the binary format
+POSTGRESQL_EPOCH = datetime(2000, 1, 1)
+
+
+def binary_field_serializer(encode: Callable[[Any], bytes]) -> Callable[[Any], bytes]:
+    """
+    Return function that serializes a value to a length prefixed field of the
+    PostgreSQL binary COPY format, using `encode` for the value itself.
+    """
+    pack_length = struct.Struct("!i").pack
+
+    def serialize(value) -> bytes:
+        if value is None:
+            return NULL_FIELD
+        else:
+            data = encode(value)
+
+            return pack_length(len(data)) + data
+
+    return serialize
+
+
+def fixed_size_binary_serializer(
+    format_char: str, convert: Callable[[Any], Any]
+) -> Callable[[Any], bytes]:
+    """
+    Return function that serializes a value to a fixed size field of the
+    PostgreSQL binary COPY format.
+
+    :param format_char: struct format character of the value
+    :param convert: function that converts a value to the Python type
+    expected by the struct format
+    """
+    field_struct = struct.Struct("!i" + format_char)
+    size = field_struct.size - 4
+    pack = field_struct.pack
+
+    def serialize(value) -> bytes:
+        if value is None:
+            return NULL_FIELD
+        else:
+            return pack(size, convert(value))
+
+    return serialize
+
+
+# Integer literals as accepted by PostgreSQL for the integer types
+INTEGER_LITERAL = re.compile(r"^\s*[+-]?[0-9]+\s*$")
+
+
+def to_integer(value) -> int:
+    """
+    Return value as int for the binary format, accepting the same values as
+    the text format, where str(value) is parsed by the server. So '42' is
+    accepted, but 4.2, '4.2' and True are not.
+    """
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+
+    text = str(value)
+
+    if INTEGER_LITERAL.match(text) is None:
+        raise ValueError(f'invalid input syntax for type integer: "{text}"')
+
+    return int(text)
+
+
+def timestamp_to_microseconds(value: datetime) -> int:
+    """Return the number of microseconds since the PostgreSQL epoch."""
+    delta = value.replace(tzinfo=None) - POSTGRESQL_EPOCH
+
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
 class DataType:
     name: str
 
+    # PostgreSQL type Oid, used for array elements in the binary format
+    oid: Optional[int] = None
+
     def __init__(self, name: str):
         self.name = name
 
@@ -28,6 +109,16 @@ class DataType:
     def string_serializer(self, config: dict = None) -> Callable[[Any], str]:
         raise NotImplementedError()
 
+    def binary_serializer(self, config: Optional[dict] = None) -> Callable[[Any], bytes]:
+        """
+        Return function that serializes a value to a field (length prefixed
+        value) of the PostgreSQL binary COPY format.
+
+        :param config: Type specific settings, e.g. the time zone of naive
+        timestamps
+        """
+        raise NotImplementedError()
+
     def deduce_parser_config(self, value: str) -> Optional[dict]:
         """
         Returns a configuration that can be used to parse the provided value
@@ -56,6 +147,8 @@ class Boolean(DataType):
         "false_value": "false",
     }
 
+    oid = 16
+
     def __init__(self):
         DataType.__init__(self, "boolean")
 
@@ -117,6 +210,9 @@ class Boolean(DataType):
 
         return serialize
 
+    def binary_serializer(self, config: Optional[dict] = None) -> Callable[[Optional[bool]], bytes]:
+        return fixed_size_binary_serializer("?", partial(operator.is_, True))
+
     def deduce_parser_config(self, value: str) -> Optional[dict]:
         if value in self.bool_set:
             return merge_dicts(
@@ -134,6 +230,14 @@ def assure_tzinfo(tz):
         return pytz.timezone(tz)
 
 
+def localize(tz: tzinfo, value: datetime) -> datetime:
+    """Return naive `value` as a timestamp in time zone `tz`."""
+    if hasattr(tz, "localize"):
+        return tz.localize(value)
+    else:
+        return value.replace(tzinfo=tz)
+
+
 class TimestampWithTimeZone(DataType):
     default_parser_config = {
         "null_value": "\\N",
@@ -143,6 +247,10 @@ class TimestampWithTimeZone(DataType):
 
     default_serializer_config = {"null_value": "\\N", "format": "%Y-%m-%dT%H:%M:%S"}
 
+    default_binary_serializer_config = {"timezone": "UTC"}
+
+    oid = 1184
+
     def __init__(self):
         DataType.__init__(self, "timestamp with time zone")
 
@@ -197,6 +305,24 @@ class TimestampWithTimeZone(DataType):
 
         return serialize
 
+    def binary_serializer(self, config: Optional[dict] = None) -> Callable[[datetime], bytes]:
+        """
+        Naive timestamps are interpreted in config["timezone"] (UTC by
+        default), which should be the time zone of the session, like the
+        server does for naive timestamps in the text format.
+        """
+        config = merge_dicts(self.default_binary_serializer_config, config or {})
+
+        naive_tz = assure_tzinfo(config["timezone"])
+
+        def to_microseconds(value: datetime) -> int:
+            if value.tzinfo is None:
+                value = localize(naive_tz, value)
+
+            return timestamp_to_microseconds(value.astimezone(pytz.utc))
+
+        return fixed_size_binary_serializer("q", to_microseconds)
+
     def deduce_parser_config(self, value: str) -> dict:
         if value is None:
             return self.default_parser_config
@@ -224,6 +350,8 @@ class Timestamp(DataType):
         ),
     ]
 
+    oid = 1114
+
     def __init__(self):
         DataType.__init__(self, "timestamp")
 
@@ -260,6 +388,9 @@ class Timestamp(DataType):
 
         return serialize
 
+    def binary_serializer(self, config: Optional[dict] = None) -> Callable[[datetime], bytes]:
+        return fixed_size_binary_serializer("q", timestamp_to_microseconds)
+
     def deduce_parser_config(self, value) -> Optional[dict]:
         if not isinstance(value, str):
             return None
@@ -283,6 +414,8 @@ class SmallInt(DataType):
 
     default_serializer_config = {"null_value": "\\N"}
 
+    oid = 21
+
     def __init__(self):
         DataType.__init__(self, "smallint")
 
@@ -348,6 +481,9 @@ class SmallInt(DataType):
 
         return serialize
 
+    def binary_serializer(self, config: Optional[dict] = None):
+        return fixed_size_binary_serializer("h", to_integer)
+
     def _parse(self, value: str) -> Optional[int]:
         if not value:
             return None
@@ -375,6 +511,8 @@ class Integer(DataType):
 
     default_serializer_config = {"null_value": "\\N"}
 
+    oid = 23
+
     def __init__(self):
         DataType.__init__(self, "integer")
 
@@ -415,6 +553,9 @@ class Integer(DataType):
 
         return serialize
 
+    def binary_serializer(self, config: Optional[dict] = None):
+        return fixed_size_binary_serializer("i", to_integer)
+
     def deduce_parser_config(self, value):
         if not isinstance(value, str):
             return None
@@ -456,6 +597,8 @@ class Bigint(DataType):
 
     default_serializer_config: Dict[str, str] = {"null_value": "\\n"}
 
+    oid = 20
+
     def __init__(self):
         DataType.__init__(self, "bigint")
 
@@ -499,6 +642,9 @@ class Bigint(DataType):
 
         return serialize
 
+    def binary_serializer(self, config: Optional[dict] = None):
+        return fixed_size_binary_serializer("q", to_integer)
+
     def deduce_parser_config(self, value):
         if not isinstance(value, str):
             return None
@@ -534,6 +680,8 @@ class Real(DataType):
 
     default_serializer_config: Dict[str, str] = {"null_value": "\\n"}
 
+    oid = 700
+
     def __init__(self):
         DataType.__init__(self, "real")
 
@@ -582,6 +730,9 @@ class Real(DataType):
 
         return serialize
 
+    def binary_serializer(self, config: Optional[dict] = None):
+        return fixed_size_binary_serializer("f", float)
+
     def deduce_parser_config(self, value):
         if not isinstance(value, str):
             return None
@@ -601,6 +752,8 @@ class DoublePrecision(DataType):
 
     default_serializer_config: Dict[str, str] = {"null_value": "\\n"}
 
+    oid = 701
+
     def __init__(self):
         DataType.__init__(self, "double precision")
 
@@ -657,12 +810,17 @@ class DoublePrecision(DataType):
 
         return serialize
 
+    def binary_serializer(self, config: Optional[dict] = None):
+        return fixed_size_binary_serializer("d", float)
+
 
 class Numeric(DataType):
     default_parser_config: Dict[str, str] = {"null_value": "\\N"}
 
     default_serializer_config: Dict[str, str] = {"null_value": "\\n"}
 
+    oid = 1700
+
     def __init__(self):
         DataType.__init__(self, "numeric")
 
@@ -709,6 +867,15 @@ class Numeric(DataType):
 
         return serialize
 
+    def binary_serializer(self, config: Optional[dict] = None):
+        def encode(value) -> bytes:
+            if not isinstance(value, decimal.Decimal):
+                value = decimal.Decimal(str(value))
+
+            return encode_binary_numeric(value)
+
+        return binary_field_serializer(encode)
+
     def deduce_parser_config(self, value):
         try:
             decimal.Decimal(value)
@@ -727,6 +894,8 @@ class Text(DataType):
 
     default_serializer_config = {"null_value": "\\N", "prefix": "", "postfix": ""}
 
+    oid = 25
+
     def __init__(self):
         DataType.__init__(self, "text")
 
@@ -774,6 +943,12 @@ class Text(DataType):
 
         return serialize
 
+    def binary_serializer(self, config: Optional[dict] = None):
+        def encode(value) -> bytes:
+            return str(value).encode("utf-8")
+
+        return binary_field_serializer(encode)
+
     def deduce_parser_config(self, value) -> dict:
         return self.default_parser_config
 
@@ -858,6 +1033,25 @@ class ArrayType(DataType):
 
         return serialize
 
+    def binary_serializer(self, config: Optional[dict] = None):
+        base_type_serializer = self.base_type.binary_serializer(config)
+        element_oid = self.base_type.oid
+
+        pack_header = struct.Struct("!iiiii").pack
+        empty_array = struct.pack("!iii", 0, 0, element_oid)
+
+        def encode(arr_value) -> bytes:
+            if not arr_value:
+                return empty_array
+
+            has_null = any(part is None for part in arr_value)
+
+            return pack_header(
+                1, has_null, element_oid, len(arr_value), 1
+            ) + b"".join(base_type_serializer(part) for part in arr_value)
+
+        return binary_field_serializer(encode)
+
     def deduce_parser_config(self, value):
         raise NotImplementedError
 
@@ -869,6 +1063,68 @@ def bracket_stripper(lbracket: str, rbracket: str) -> str:
     return strip_brackets
 
 
+NUMERIC_POS = 0x0000
+NUMERIC_NEG = 0x4000
+NUMERIC_NAN = 0xC000
+
+
+def encode_binary_numeric(value: decimal.Decimal) -> bytes:
+    """
+    Return the PostgreSQL binary representation of a numeric value: a header
+    with digit count, weight, sign and display scale, followed by the digits
+    in base 10000.
+    """
+    if value.is_nan():
+        return struct.pack("!hhHH", 0, 0, NUMERIC_NAN, 0)
+
+    if value.is_infinite():
+        raise ParseError("infinite numeric value is not supported: {}".format(value))
+
+    sign, digits, exponent = value.as_tuple()
+
+    digit_str = "".join(map(str, digits))
+
+    if exponent >= 0:
+        int_part = digit_str + "0" * exponent
+        frac_part = ""
+    else:
+        int_part = digit_str[:exponent]
+        frac_part = digit_str[exponent:].rjust(-exponent, "0")
+
+    int_part = int_part.lstrip("0")
+
+    # Align both parts on groups of 4 decimal digits
+    int_part = "0" * (-len(int_part) % 4) + int_part
+    frac_part = frac_part + "0" * (-len(frac_part) % 4)
+
+    groups = [
+        int(part[i:i + 4])
+        for part in (int_part, frac_part)
+        for i in range(0, len(part), 4)
+    ]
+
+    weight = len(int_part) // 4 - 1
+
+    while groups and groups[0] == 0:
+        groups.pop(0)
+        weight -= 1
+
+    while groups and groups[-1] == 0:
+        groups.pop()
+
+    if not groups:
+        weight = 0
+
+    return struct.pack(
+        "!hhHH{}H".format(len(groups)),
+        len(groups),
+        weight,
+        NUMERIC_NEG if sign else NUMERIC_POS,
+        max(0, -exponent),
+        *groups
+    )
+
+
 registry: Dict[str, DataType] = {}
 
 
@@ -991,8 +1247,12 @@ def load_data_format(format_config):
 copy_from_serializer_base_type_config = {
     registry["bigint"]: {"null_value": "\\N"},
     registry["boolean"]: {"null_value": "\\N"},
-    registry["timestamp"]: {"null_value": "\\N"},
-    registry["timestamp with time zone"]: {"null_value": "\\N"},
+    registry["timestamp"]: {"null_value": "\\N", "format": "%Y-%m-%dT%H:%M:%S.%f"},
+    # The offset of aware timestamps is kept, naive timestamps are
+    # interpreted by the server in the time zone of the session
+    registry["timestamp with time zone"]: {
+        "null_value": "\\N", "format": "%Y-%m-%dT%H:%M:%S.%f%z"
+    },
     registry["integer"]: {"null_value": "\\N"},
     registry["smallint"]: {"null_value": "\\N"},
     registry["real"]: {"null_value": "\\N"},
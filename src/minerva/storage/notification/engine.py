@@ -1,7 +1,56 @@
+from contextlib import closing
+from typing import Optional
+
+from minerva.directory.metadatacache import metadata_cache
 from minerva.storage import Engine
+from minerva.storage.notification.notificationstore import NotificationStore, \
+    NoSuchNotificationStore
+from minerva.storage.notification.package import Package
+
+NOTIFICATION_STORE_CACHE_NAMESPACE = "notification_store"
 
 
 class NotificationEngine(Engine):
     @staticmethod
-    def store_cmd(package):
-        raise NotImplementedError()
+    def store_cmd(package: Package, job_id: Optional[int] = None):
+        """
+        Return a function to bind a data source to the store command.
+
+        The notifications are copied into the notification store of the data
+        source in one transaction.
+
+        :param package: Package with the notifications
+        :param job_id: Id of the job that generated the package (not stored
+        with notifications)
+        :rtype: (data_source) -> (conn) -> None
+        """
+        def bind_data_source(data_source):
+            def execute(conn):
+                with closing(conn.cursor()) as cursor:
+                    notification_store = notification_store_for_data_source(
+                        data_source
+                    )(cursor)
+
+                    notification_store.store_package(package)(cursor)
+
+                conn.commit()
+
+            return execute
+
+        return bind_data_source
+
+
+def notification_store_for_data_source(data_source):
+    """Return function that returns the notification store using the cache."""
+    def f(cursor) -> NotificationStore:
+        notification_store = metadata_cache.get(
+            NOTIFICATION_STORE_CACHE_NAMESPACE, data_source.id,
+            lambda: NotificationStore.load(cursor, data_source)
+        )
+
+        if notification_store is None:
+            raise NoSuchNotificationStore(data_source)
+
+        return notification_store
+
+    return f
@@ -1,12 +1,36 @@
 # -*- coding: utf-8 -*-
+from datetime import datetime
+from typing import Callable, Any, List, Iterable
+
 from psycopg2 import sql
 
 from minerva.db.query import Table
+from minerva.db.util import create_file, copy_from
 from minerva.db.error import translate_postgresql_exceptions
 from minerva.directory import DataSource
+from minerva.storage import datatype
 from minerva.storage.notification.attribute import Attribute
+from minerva.storage.notification.package import Package
 from minerva.storage.notification.types import Record
 
+COPY_NULL_VALUE = "\\N"
+
+# Characters with a special meaning in the text format of COPY
+COPY_ESCAPES = str.maketrans({
+    "\\": "\\\\",
+    "\t": "\\t",
+    "\n": "\\n",
+    "\r": "\\r",
+})
+
+
+class NoSuchNotificationStore(Exception):
+    def __init__(self, data_source: DataSource):
+        self.data_source = data_source
+
+    def __str__(self):
+        return f"No notification store for data source '{self.data_source.name}'"
+
 
 class NotificationStoreDescriptor:
     def __init__(self, data_source, attribute_descriptors):
@@ -127,6 +151,112 @@ class NotificationStore:
 
         return f
 
+    def store_package(self, package: Package) -> Callable[[Any], None]:
+        """
+        Return function that stores all notifications of the package using
+        one COPY command.
+        """
+        def f(cursor):
+            if package.is_empty():
+                return
+
+            serializers = self.get_copy_serializers(package.attribute_names)
+
+            copy_from_file = create_file(
+                create_copy_from_lines(package.refined_rows(cursor), serializers)
+            )
+
+            copy_from_query = create_copy_from_query(
+                self.table, package.attribute_names
+            )
+
+            # Values the serializers cannot render, like a string for an
+            # integer attribute, are raised as is instead of QueryCanceled
+            copy_from(cursor, copy_from_query, copy_from_file)
+
+        return f
+
+    def store_records(self, records: Iterable[Record]) -> Callable[[Any], None]:
+        """
+        Return function that stores the records using one COPY command per
+        set of attribute names.
+        """
+        def f(cursor):
+            for package in Package.from_records(records):
+                self.store_package(package)(cursor)
+
+        return f
+
+    def get_copy_serializers(self, attribute_names: List[str]) -> List[Callable[[Any], str]]:
+        """
+        Return a function per attribute that renders a value for the text
+        format of COPY.
+        """
+        attribute_by_name = {
+            attribute.name: attribute for attribute in self.attributes
+        }
+
+        return [
+            copy_serializer(attribute_by_name.get(name))
+            for name in attribute_names
+        ]
+
+
+def copy_serializer(attribute: Attribute) -> Callable[[Any], str]:
+    """
+    Return function that renders values of the attribute for COPY, using the
+    serializer of its data type when it is known.
+    """
+    data_type = None
+
+    if attribute is not None:
+        data_type = attribute.data_type
+
+        if isinstance(data_type, str):
+            data_type = datatype.registry.get(data_type)
+
+    if data_type is None:
+        def to_string(value):
+            return str(prepare_value(value))
+    else:
+        to_string = data_type.string_serializer(
+            datatype.copy_from_serializer_config(data_type)
+        )
+
+    def serialize(value):
+        if value is None:
+            return COPY_NULL_VALUE
+        else:
+            return to_string(value).translate(COPY_ESCAPES)
+
+    return serialize
+
+
+def create_copy_from_query(table: Table, attribute_names: List[str]) -> sql.Composed:
+    column_names = ["entity_id", "timestamp"] + list(attribute_names)
+
+    return sql.SQL("COPY {}({}) FROM STDIN").format(
+        table.identifier(),
+        sql.SQL(",").join(sql.Identifier(name) for name in column_names)
+    )
+
+
+def create_copy_from_lines(rows, serializers: List[Callable[[Any], str]]):
+    """Return a generator with the lines for a copy-from file."""
+    for entity_id, timestamp, values in rows:
+        value_parts = "\t".join(
+            serialize(value) for serialize, value in zip(serializers, values)
+        )
+
+        yield f"{entity_id}\t{format_timestamp(timestamp)}\t{value_parts}\n"
+
+
+def format_timestamp(timestamp) -> str:
+    if isinstance(timestamp, datetime):
+        return timestamp.isoformat()
+    else:
+        return str(timestamp)
+
 
 def prepare_value(value):
     if isinstance(value, dict):
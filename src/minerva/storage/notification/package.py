@@ -1,6 +1,85 @@
+from typing import List, Iterable
+
+from minerva.directory.entityref import EntityIdRef
+from minerva.storage.notification.record import Record
+from minerva.util.tabulate import render_table
 
 
 class Package:
+    """
+    Notifications with the same attributes, one row (entity_ref, timestamp,
+    values) per notification.
+    """
     def __init__(self, attribute_names, rows):
         self.attribute_names = attribute_names
         self.rows = rows
+
+    @staticmethod
+    def from_records(records: Iterable[Record]) -> List['Package']:
+        """
+        Return packages with the records grouped by their attribute names, in
+        order of first occurrence.
+        """
+        packages = {}
+
+        for record in records:
+            key = tuple(record.attribute_names)
+
+            package = packages.get(key)
+
+            if package is None:
+                package = packages[key] = Package(list(record.attribute_names), [])
+
+            package.rows.append(
+                (record.entity_ref, record.timestamp, record.values)
+            )
+
+        return list(packages.values())
+
+    def is_empty(self) -> bool:
+        return len(self.rows) == 0
+
+    def render_table(self) -> str:
+        column_names = ["entity", "timestamp"] + list(self.attribute_names)
+        column_align = [">"] * len(column_names)
+        column_sizes = ["max"] * len(column_names)
+
+        rows = [row[:-1] + tuple(row[-1]) for row in self.rows]
+        table = render_table(column_names, column_align, column_sizes, rows)
+
+        return '\n'.join(table)
+
+    def refined_rows(self, cursor) -> list:
+        """
+        Return the rows with the entity references mapped to entity Ids.
+
+        The references are mapped in one batch per reference type, instead of
+        one lookup per row. Plain integers are taken as entity Ids.
+        """
+        refs_by_type = {}
+
+        entity_ids = [None] * len(self.rows)
+
+        for index, (entity_ref, _, _) in enumerate(self.rows):
+            if isinstance(entity_ref, EntityIdRef):
+                entity_ids[index] = entity_ref.entity_id
+            elif isinstance(entity_ref, int):
+                entity_ids[index] = entity_ref
+            else:
+                # Name and alias references both hold their value in `alias`
+                refs_by_type.setdefault(type(entity_ref), []).append(
+                    (index, entity_ref.alias)
+                )
+
+        for entity_ref_type, indexed_refs in refs_by_type.items():
+            indexes, entity_refs = zip(*indexed_refs)
+
+            mapped_ids = entity_ref_type.map_to_entity_ids(list(entity_refs))(cursor)
+
+            for index, entity_id in zip(indexes, mapped_ids):
+                entity_ids[index] = entity_id
+
+        return [
+            (entity_id, timestamp, values)
+            for entity_id, (_, timestamp, values) in zip(entity_ids, self.rows)
+        ]
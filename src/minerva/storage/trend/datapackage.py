@@ -1,14 +1,14 @@
 # -*- coding: utf-8 -*-
 from datetime import datetime
-from io import StringIO
-from typing import Callable, List, Generator, Tuple, Any, Optional, Dict
+from typing import Callable, List, Generator, Tuple, Any, Optional, Dict, \
+    Sequence, Iterable
 
-from itertools import chain
+from itertools import chain, repeat, groupby
 from operator import itemgetter
 from functools import total_ordering
 
-from minerva.db.util import quote_ident
-from minerva.directory.entityref import EntityRef
+from minerva.db.util import quote_ident, IteratorFile, copy_from
+from minerva.directory.entityref import EntityRef, EntityIdRef
 from minerva.storage.trend import schema
 from minerva.storage.trend.trend import Trend
 from minerva.storage.trend.granularity import Granularity
@@ -36,6 +36,41 @@ class DataPackageType:
 
 DataPackageRow = Tuple[int, datetime, List[Any]]
 
+# Policies for rows with the same entity and timestamp in one package
+DUPLICATES_KEEP_LAST = "last"
+DUPLICATES_KEEP_FIRST = "first"
+
+DUPLICATE_POLICIES = (DUPLICATES_KEEP_LAST, DUPLICATES_KEEP_FIRST)
+
+
+def deduplicate_rows(rows: List[DataPackageRow], policy: Optional[str]) -> List[DataPackageRow]:
+    """
+    Return the rows with only one row per (entity, timestamp) combination.
+
+    :param rows: The rows to deduplicate
+    :param policy: DUPLICATES_KEEP_LAST to keep the last row of duplicates,
+    DUPLICATES_KEEP_FIRST to keep the first row or None to keep all rows
+    :return: The deduplicated rows in order of first occurrence
+    """
+    if policy is None:
+        return rows
+
+    rows_by_key = {}
+
+    if policy == DUPLICATES_KEEP_LAST:
+        for row in rows:
+            rows_by_key[(row[0], row[1])] = row
+    elif policy == DUPLICATES_KEEP_FIRST:
+        for row in rows:
+            rows_by_key.setdefault((row[0], row[1]), row)
+    else:
+        raise ValueError(f"Invalid duplicate policy '{policy}'")
+
+    if len(rows_by_key) == len(rows):
+        return rows
+
+    return list(rows_by_key.values())
+
 
 class DataPackage:
     """
@@ -57,10 +92,19 @@ class DataPackage:
 
     @staticmethod
     def merge_packages(packages: List['DataPackage']) -> List['DataPackage']:
-        return [
-            package_group(key, list(group))
-            for key, group in grouped_by(packages, DataPackage.get_key)
-        ]
+        return list(DataPackage.merge_sorted_packages(
+            sorted(packages, key=DataPackage.get_key)
+        ))
+
+    @staticmethod
+    def merge_sorted_packages(packages: Iterable['DataPackage']) -> Generator['DataPackage', None, None]:
+        """
+        Merge packages that are already ordered by their key. Each merged
+        package is produced as soon as its group is complete, so only one
+        group of packages is held in memory at a time.
+        """
+        for key, group in groupby(packages, DataPackage.get_key):
+            yield package_group(key, list(group))
 
     def render_table(self) -> str:
         column_names = ["entity", "timestamp"] + list(
@@ -158,12 +202,35 @@ class DataPackage:
 
         return list(zip(entity_ids, timestamps, value_rows))
 
+    def refine(self, cursor) -> 'DataPackage':
+        """
+        Return a package with the entity references mapped to entity Ids, so
+        that packages split from it do not need to map them again.
+        """
+        return DataPackage(
+            self.refined_package_type(), self.granularity,
+            self.trend_descriptors, self.refined_rows(cursor)
+        )
+
+    def refined_package_type(self) -> DataPackageType:
+        """
+        Return the package type for this package with entity Ids as
+        references.
+        """
+        entity_type_name = self.entity_type_name()
+
+        return DataPackageType(
+            self.data_package_type.identifier, EntityIdRef,
+            lambda data_package: entity_type_name
+        )
+
     def copy_from(self, table, value_descriptors, modified) -> Callable:
         """
         Return a function that can execute a COPY FROM query on a cursor.
         """
         def fn(cursor):
-            cursor.copy_expert(
+            copy_from(
+                cursor,
                 self._create_copy_from_query(table),
                 self._create_copy_from_file(value_descriptors, modified)
             )
@@ -188,17 +255,11 @@ class DataPackage:
             ",".join(map(quote_ident, column_names))
         )
 
-    def _create_copy_from_file(self, value_descriptors: List[ValueDescriptor], modified: datetime) -> StringIO:
-        copy_from_file = StringIO()
-
-        copy_from_file.writelines(
+    def _create_copy_from_file(self, value_descriptors: List[ValueDescriptor], modified: datetime) -> IteratorFile:
+        return IteratorFile(
             self._create_copy_from_lines(value_descriptors, modified)
         )
 
-        copy_from_file.seek(0)
-
-        return copy_from_file
-
     def _create_copy_from_lines(
             self, value_descriptors: List[ValueDescriptor], modified: datetime
     ) -> Generator[str, None, None]:
@@ -220,40 +281,190 @@ class DataPackage:
         )
 
 
+class ColumnarDataPackage(DataPackage):
+    """
+    A DataPackage that stores its data column oriented: one sequence with the
+    entity references, one with the timestamps and one per trend.
+
+    Selecting trends (filter_trends, split) only selects columns and shares
+    the entity reference and timestamp columns, so no data is copied when a
+    package is split over trend store parts.
+    """
+    entity_refs: Sequence[Any]
+    timestamp_column: Sequence[datetime]
+    value_columns: List[Sequence[Any]]
+
+    def __init__(
+            self, data_package_type: DataPackageType, granularity: Granularity,
+            trend_descriptors: List[Trend.Descriptor], entity_refs: Sequence[Any],
+            timestamp_column: Sequence[datetime],
+            value_columns: List[Sequence[Any]]):
+        self.data_package_type = data_package_type
+        self.granularity = granularity
+        self.trend_descriptors = trend_descriptors
+        self.entity_refs = entity_refs
+        self.timestamp_column = timestamp_column
+        self.value_columns = value_columns
+
+    @staticmethod
+    def from_package(data_package: DataPackage) -> 'ColumnarDataPackage':
+        """Return a columnar package with the data of a row based package."""
+        if data_package.rows:
+            entity_refs, timestamps, value_rows = zip(*data_package.rows)
+        else:
+            entity_refs, timestamps, value_rows = (), (), ()
+
+        value_columns = list(zip(*value_rows))
+
+        if not value_columns:
+            value_columns = [() for _ in data_package.trend_descriptors]
+
+        return ColumnarDataPackage(
+            data_package.data_package_type, data_package.granularity,
+            data_package.trend_descriptors, entity_refs, timestamps,
+            value_columns
+        )
+
+    @property
+    def rows(self) -> List[Tuple[Any, datetime, tuple]]:
+        """Return the data as a list of rows like a row based package."""
+        if self.value_columns:
+            value_rows = zip(*self.value_columns)
+        else:
+            value_rows = repeat(())
+
+        return list(zip(self.entity_refs, self.timestamp_column, value_rows))
+
+    def is_empty(self) -> bool:
+        """Return True if the package has no data rows."""
+        return len(self.entity_refs) == 0
+
+    def select_trends(self, indexes: Sequence[int]) -> 'ColumnarDataPackage':
+        """
+        :param indexes: Indexes of the trends to select
+        :return: A new data package with just the selected trend columns,
+        sharing all columns with this package
+        """
+        return ColumnarDataPackage(
+            self.data_package_type,
+            self.granularity,
+            [self.trend_descriptors[index] for index in indexes],
+            self.entity_refs,
+            self.timestamp_column,
+            [self.value_columns[index] for index in indexes]
+        )
+
+    def filter_trends(self, fn: Callable[[str], bool]) -> 'ColumnarDataPackage':
+        """
+        :param fn: Filter function for trend names
+        :return: A new data package with just the trend data for the trends
+        filtered by provided function
+        """
+        return self.select_trends([
+            index
+            for index, trend_descriptor in enumerate(self.trend_descriptors)
+            if fn(trend_descriptor.name)
+        ])
+
+    def split(self, group_fn: Callable[[str], Optional[str]]) -> Generator[Tuple[str, "ColumnarDataPackage"], None, None]:
+        """
+        Split the trends in this package by passing the trend name through the
+        provided function. The trends with the same resulting key are placed in
+        a new separate package that shares the columns with this package.
+
+        :param group_fn: Function that returns the group key for a trend name
+        :return: A list of data packages with trends grouped by key
+        """
+        keys = (
+            (group_fn(trend_descriptor.name), index)
+            for index, trend_descriptor in enumerate(self.trend_descriptors)
+        )
+
+        grouped_indexes = grouped_by(
+            (k for k in keys if k[0] is not None), key=itemgetter(0)
+        )
+
+        for key, group in grouped_indexes:
+            yield key, self.select_trends([index for _, index in group])
+
+    def refined_rows(self, cursor) -> List[DataPackageRow]:
+        """
+        Map the entity reference to an entity ID in each row and return the
+        newly formed rows with IDs.
+        """
+        entity_ids = self.data_package_type.entity_ref_type.map_to_entity_ids(
+            list(self.entity_refs)
+        )(cursor)
+
+        if self.value_columns:
+            value_rows = zip(*self.value_columns)
+        else:
+            value_rows = repeat(())
+
+        return list(zip(entity_ids, self.timestamp_column, value_rows))
+
+    def refine(self, cursor) -> 'ColumnarDataPackage':
+        """
+        Return a package with the entity references mapped to entity Ids,
+        sharing the timestamp and value columns with this package.
+        """
+        entity_ids = self.data_package_type.entity_ref_type.map_to_entity_ids(
+            list(self.entity_refs)
+        )(cursor)
+
+        return ColumnarDataPackage(
+            self.refined_package_type(), self.granularity,
+            self.trend_descriptors, entity_ids, self.timestamp_column,
+            self.value_columns
+        )
+
+    def timestamps(self) -> List[datetime]:
+        return list(set(self.timestamp_column))
+
+
 def package_group(key: Tuple[DataPackageType, str, Granularity], packages: List[DataPackage]) -> DataPackage:
     data_package_type, _entity_type_name, granularity = key
 
-    all_trend_descriptors = {}
-
-    # Combine all values from all packages using dictionaries
-    dict_rows_by_entity_ref: Dict[Tuple[EntityRef, datetime], dict] = {}
+    # Determine the position of each trend in the merged package, the last
+    # encountered descriptor of a trend is used.
+    trend_positions: Dict[str, int] = {}
+    trend_descriptors: List[Trend.Descriptor] = []
+    package_positions: List[List[int]] = []
 
     for p in packages:
-        for entity_ref, timestamp, values in p.rows:
-            value_dict = dict(zip(
-                (td.name for td in p.trend_descriptors), values
-            ))
+        positions = []
 
-            dict_rows_by_entity_ref.setdefault(
-                (entity_ref, timestamp), {}
-            ).update(value_dict)
+        for td in p.trend_descriptors:
+            position = trend_positions.get(td.name)
 
-        all_trend_descriptors.update(
-            {td.name: td for td in p.trend_descriptors}
-        )
+            if position is None:
+                position = len(trend_descriptors)
+                trend_positions[td.name] = position
+                trend_descriptors.append(td)
+            else:
+                trend_descriptors[position] = td
 
-    # Use the encountered field names to construct new rows with a value for
-    # each field
-    trend_descriptors = list(all_trend_descriptors.values())
+            positions.append(position)
 
+        package_positions.append(positions)
+
+    trend_count = len(trend_descriptors)
+
+    # Combine all values from all packages into preallocated value lists
     rows = []
+    values_by_entity_ref: Dict[Tuple[EntityRef, datetime], list] = {}
 
-    for (entity_ref, timestamp), value_dict in dict_rows_by_entity_ref.items():
-        values = [value_dict.get(td.name) for td in trend_descriptors]
+    for p, positions in zip(packages, package_positions):
+        for entity_ref, timestamp, values in p.rows:
+            merged_values = values_by_entity_ref.get((entity_ref, timestamp))
 
-        row = entity_ref, timestamp, values
+            if merged_values is None:
+                merged_values = [None] * trend_count
+                values_by_entity_ref[(entity_ref, timestamp)] = merged_values
+                rows.append((entity_ref, timestamp, merged_values))
 
-        rows.append(row)
+            for position, value in zip(positions, values):
+                merged_values[position] = value
 
     return DataPackage(data_package_type, granularity, trend_descriptors, rows)
 
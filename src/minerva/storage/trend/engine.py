@@ -1,32 +1,41 @@
 from contextlib import closing
 from operator import contains
 from functools import partial
-from typing import Callable
+from typing import Callable, Optional
 
 from psycopg2.extensions import connection
 
 from minerva.util import k, identity
-from minerva.directory import EntityType, NoSuchEntityType, DataSource
+from minerva.directory import NoSuchEntityType, DataSource
+from minerva.directory.metadatacache import get_entity_type_by_name
 from minerva.storage import Engine
 from minerva.storage.trend.trendstore import TrendStore, \
     NoSuchTrendStore
-from minerva.storage.trend.datapackage import DataPackage
+from minerva.storage.trend.datapackage import DataPackage, \
+    DUPLICATES_KEEP_LAST
 
 
 class TrendEngine(Engine):
     pass_through = k(identity)
 
     @staticmethod
-    def store_cmd(package: DataPackage, job_id: int):
+    def store_cmd(
+            package: DataPackage, job_id: int, binary_copy: bool = False,
+            duplicate_policy: Optional[str] = DUPLICATES_KEEP_LAST):
         """
         Return a function to bind a data source to the store command.
 
         :param package: A DataPackageBase subclass instance
         :param job_id: An Id of the job that generated the data package
+        :param binary_copy: Use the binary COPY format where possible
+        :param duplicate_policy: Which row to keep of rows with the same
+        entity and timestamp, None to keep all
         :return: function that binds a data source to the store command
         :rtype: (data_source) -> (conn) -> None
         """
-        return TrendEngine.make_store_cmd(TrendEngine.pass_through)(package, job_id)
+        return TrendEngine.make_store_cmd(TrendEngine.pass_through)(
+            package, job_id, binary_copy, duplicate_policy
+        )
 
     @staticmethod
     def make_store_cmd(transform_package) -> Callable[[DataPackage, int], Callable[[DataSource], Callable[[connection], None]]]:
@@ -36,7 +45,9 @@ class TrendEngine(Engine):
         :param transform_package: (TrendStore) -> (DataPackage)
         -> DataPackage
         """
-        def cmd(package: DataPackage, job_id: int):
+        def cmd(
+                package: DataPackage, job_id: int, binary_copy: bool = False,
+                duplicate_policy: Optional[str] = DUPLICATES_KEEP_LAST):
             def bind_data_source(data_source: DataSource):
                 def execute(conn):
                     trend_store = trend_store_for_package(
@@ -45,7 +56,7 @@ class TrendEngine(Engine):
 
                     trend_store.store(
                         transform_package(trend_store)(package),
-                        job_id
+                        job_id, binary_copy, duplicate_policy
                     )(conn)
 
                     conn.commit()
@@ -78,20 +89,20 @@ def trend_store_for_package(data_source: DataSource, package: DataPackage):
         entity_type_name = package.entity_type_name()
 
         with closing(conn.cursor()) as cursor:
-            entity_type = EntityType.get_by_name(entity_type_name)(cursor)
+            table_trend_store = TrendStore.get_by_entity_type_name(
+                data_source, entity_type_name, package.granularity
+            )(cursor)
+
+            if table_trend_store is not None:
+                return table_trend_store
+
+            entity_type = get_entity_type_by_name(entity_type_name)(cursor)
 
             if entity_type is None:
                 raise NoSuchEntityType(entity_type_name)
             else:
-                table_trend_store = TrendStore.get(
+                raise NoSuchTrendStore(
                     data_source, entity_type, package.granularity
-                )(cursor)
-
-                if table_trend_store is None:
-                    raise NoSuchTrendStore(
-                        data_source, entity_type, package.granularity
-                    )
-
-                return table_trend_store
+                )
 
     return f
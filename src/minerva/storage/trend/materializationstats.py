@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Provides collection and reporting of materialization runtime statistics.
+"""
+import json
+import math
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional, TextIO, Deque
+
+from minerva.util.tabulate import render_table
+
+OUTCOME_SUCCESS = "success"
+OUTCOME_ERROR = "error"
+
+# Number of chunk runs per materialization kept for the percentiles
+DEFAULT_SAMPLE_SIZE = 1000
+
+REPORTED_PERCENTILES = (50, 95, 99)
+
+
+class ChunkStats:
+    """Runtime statistics of the materialization of one chunk."""
+
+    materialization_id: int
+    name: str
+    timestamp: datetime
+    duration: float
+    lock_wait: float
+    row_count: Optional[int]
+    outcome: str
+    error: Optional[str]
+
+    def __init__(
+            self, materialization_id: int, name: str, timestamp: datetime,
+            duration: float, lock_wait: float, row_count: Optional[int],
+            outcome: str = OUTCOME_SUCCESS, error: Optional[str] = None):
+        self.materialization_id = materialization_id
+        self.name = name
+        self.timestamp = timestamp
+        self.duration = duration
+        self.lock_wait = lock_wait
+        self.row_count = row_count
+        self.outcome = outcome
+        self.error = error
+
+    def to_dict(self) -> dict:
+        return {
+            "materialization_id": self.materialization_id,
+            "name": self.name,
+            "timestamp": self.timestamp.isoformat(),
+            "duration": round(self.duration, 6),
+            "lock_wait": round(self.lock_wait, 6),
+            "row_count": self.row_count,
+            "outcome": self.outcome,
+            "error": self.error,
+        }
+
+
+class MaterializationStats:
+    """
+    Thread-safe collection of chunk statistics per materialization.
+
+    Only the most recent `sample_size` runs of each materialization are kept,
+    so that a long running process does not grow without bounds. The totals
+    cover all runs.
+    """
+
+    def __init__(
+            self, sample_size: int = DEFAULT_SAMPLE_SIZE,
+            log_file: Optional[TextIO] = None):
+        """
+        :param sample_size: Number of runs per materialization to keep
+        :param log_file: Optional file to write each chunk's statistics to as
+        a line of JSON
+        """
+        self.sample_size = sample_size
+        self.log_file = log_file
+
+        self.samples: Dict[int, Deque[ChunkStats]] = {}
+        self.run_count: Dict[int, int] = {}
+        self.error_count: Dict[int, int] = {}
+        self.total_duration: Dict[int, float] = {}
+
+        self._lock = threading.Lock()
+
+    def add(self, stats: ChunkStats):
+        with self._lock:
+            materialization_id = stats.materialization_id
+
+            samples = self.samples.get(materialization_id)
+
+            if samples is None:
+                samples = self.samples[materialization_id] = deque(
+                    maxlen=self.sample_size
+                )
+
+            samples.append(stats)
+
+            self.run_count[materialization_id] = (
+                self.run_count.get(materialization_id, 0) + 1
+            )
+            self.total_duration[materialization_id] = (
+                self.total_duration.get(materialization_id, 0.0) + stats.duration
+            )
+
+            if stats.outcome != OUTCOME_SUCCESS:
+                self.error_count[materialization_id] = (
+                    self.error_count.get(materialization_id, 0) + 1
+                )
+
+            if self.log_file is not None:
+                self.log_file.write(json.dumps(stats.to_dict()) + "\n")
+                self.log_file.flush()
+
+    def clear(self):
+        with self._lock:
+            self.samples.clear()
+            self.run_count.clear()
+            self.error_count.clear()
+            self.total_duration.clear()
+
+    def report(self) -> str:
+        """
+        Return a table with the duration percentiles of each materialization,
+        the materializations with the highest total duration first.
+        """
+        with self._lock:
+            materialization_ids = sorted(
+                self.samples, key=self.total_duration.get, reverse=True
+            )
+
+            column_names = ["materialization", "runs", "errors", "total"] + [
+                f"p{p}" for p in REPORTED_PERCENTILES
+            ] + [f"lock p{REPORTED_PERCENTILES[-1]}", "rows"]
+
+            rows = []
+
+            for materialization_id in materialization_ids:
+                samples = self.samples[materialization_id]
+                durations = sorted(stats.duration for stats in samples)
+                lock_waits = sorted(stats.lock_wait for stats in samples)
+
+                rows.append(
+                    [
+                        samples[-1].name,
+                        str(self.run_count[materialization_id]),
+                        str(self.error_count.get(materialization_id, 0)),
+                        f"{self.total_duration[materialization_id]:.3f}",
+                    ]
+                    + [
+                        f"{percentile(durations, p):.3f}"
+                        for p in REPORTED_PERCENTILES
+                    ]
+                    + [
+                        f"{percentile(lock_waits, REPORTED_PERCENTILES[-1]):.3f}",
+                        str(sum(stats.row_count or 0 for stats in samples)),
+                    ]
+                )
+
+        column_align = ["<"] + [">"] * (len(column_names) - 1)
+        column_sizes = ["max"] * len(column_names)
+
+        table = render_table(column_names, column_align, column_sizes, rows)
+
+        return "\n".join(table)
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """
+    Return the p-th percentile of sorted values using the nearest-rank method.
+    """
+    if not sorted_values:
+        return 0.0
+
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+
+    return sorted_values[rank - 1]
@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+"""
+Provides concurrent scheduling of materialization chunks that respects the
+dependencies between materializations.
+"""
+import logging
+import threading
+from collections import Counter, OrderedDict
+from contextlib import closing
+from typing import Dict, Set, List, Callable, ContextManager, Optional, Iterable
+
+DEFAULT_MAX_PER_TARGET = 1
+
+# Number of (materialization, timestamp) runs remembered to detect re-runs
+DEFAULT_HISTORY_SIZE = 100000
+
+
+def load_materialization_dependencies(conn) -> Dict[int, Set[int]]:
+    """
+    Return the direct upstream materializations of each materialization.
+
+    A materialization depends on another materialization when the target
+    trend store part of the other is one of its sources, as linked through
+    materialization_trend_store_link.
+    """
+    query = (
+        "SELECT m.id, src.id "
+        "FROM trend_directory.materialization m "
+        "LEFT JOIN trend_directory.materialization_trend_store_link mtsl "
+        "ON mtsl.materialization_id = m.id "
+        "LEFT JOIN trend_directory.materialization src "
+        "ON src.dst_trend_store_part_id = mtsl.trend_store_part_id"
+    )
+
+    with closing(conn.cursor()) as cursor:
+        cursor.execute(query)
+
+        rows = cursor.fetchall()
+
+    conn.commit()
+
+    dependencies: Dict[int, Set[int]] = {}
+
+    for materialization_id, upstream_id in rows:
+        upstream = dependencies.setdefault(materialization_id, set())
+
+        if upstream_id is not None and upstream_id != materialization_id:
+            upstream.add(upstream_id)
+
+    return dependencies
+
+
+def ancestors(dependencies: Dict[int, Set[int]]) -> Dict[int, Set[int]]:
+    """Return all direct and indirect upstream materializations of each."""
+    result: Dict[int, Set[int]] = {}
+
+    def visit(materialization_id: int, path: Set[int]) -> Set[int]:
+        if materialization_id in result:
+            return result[materialization_id]
+
+        found: Set[int] = set()
+
+        for upstream_id in dependencies.get(materialization_id, ()):
+            found.add(upstream_id)
+
+            if upstream_id not in path:
+                found |= visit(upstream_id, path | {upstream_id})
+
+        result[materialization_id] = found
+
+        return found
+
+    for materialization_id in dependencies:
+        visit(materialization_id, {materialization_id})
+
+    return result
+
+
+def dependency_levels(dependencies: Dict[int, Set[int]]) -> Dict[int, int]:
+    """
+    Return the level of each materialization in the dependency graph: 0 for
+    materializations without upstream materializations, otherwise one more
+    than the highest level of its upstream materializations. Dependencies
+    that close a cycle are ignored.
+    """
+    levels: Dict[int, int] = {}
+
+    def visit(materialization_id: int, path: Set[int]) -> int:
+        if materialization_id in levels:
+            return levels[materialization_id]
+
+        level = 0
+
+        for upstream_id in dependencies.get(materialization_id, ()):
+            if upstream_id not in path:
+                level = max(level, visit(upstream_id, path | {upstream_id}) + 1)
+
+        levels[materialization_id] = level
+
+        return level
+
+    for materialization_id in dependencies:
+        visit(materialization_id, {materialization_id})
+
+    return levels
+
+
+def group_by_level(chunks: Iterable, levels: Dict[int, int]) -> List[List]:
+    """
+    Return the chunks grouped by the level of their materialization, lowest
+    level first, keeping the order of the chunks within a level.
+    """
+    groups: Dict[int, List] = {}
+
+    for chunk in chunks:
+        groups.setdefault(levels.get(chunk.materialization_id, 0), []).append(chunk)
+
+    return [groups[level] for level in sorted(groups)]
+
+
+class RunHistory:
+    """
+    Remember recent materialization runs to detect re-runs.
+
+    A re-run is a run for a (materialization, timestamp) that was run before.
+    It is counted as wasted when an upstream materialization ran after the
+    previous run, because then the previous run used outdated source data.
+    Upstream runs are considered for any timestamp, so the number of wasted
+    re-runs is an upper bound.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_HISTORY_SIZE):
+        self.max_size = max_size
+        self.rerun_count = Counter()
+        self.wasted_count = Counter()
+        self.names: Dict[int, str] = {}
+
+        self._sequence = 0
+        self._last_run: OrderedDict = OrderedDict()
+        self._last_run_by_materialization: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, chunk, upstream_ids: Iterable[int] = ()) -> bool:
+        """
+        Record the start of a run of chunk and return True if it is a re-run.
+        """
+        key = chunk.materialization_id, chunk.timestamp
+
+        with self._lock:
+            self._sequence += 1
+            self.names[chunk.materialization_id] = getattr(
+                chunk, "name", str(chunk.materialization_id)
+            )
+
+            previous = self._last_run.pop(key, None)
+
+            self._last_run[key] = self._sequence
+            self._last_run_by_materialization[chunk.materialization_id] = self._sequence
+
+            if len(self._last_run) > self.max_size:
+                self._last_run.popitem(last=False)
+
+            if previous is None:
+                return False
+
+            self.rerun_count[chunk.materialization_id] += 1
+
+            if any(
+                self._last_run_by_materialization.get(upstream_id, 0) > previous
+                for upstream_id in upstream_ids
+            ):
+                self.wasted_count[chunk.materialization_id] += 1
+
+            return True
+
+    def report(self) -> str:
+        wasted = ", ".join(
+            f"{self.names[materialization_id]}: {count}"
+            for materialization_id, count in self.wasted_count.most_common()
+        )
+
+        return (
+            f"re-runs: {sum(self.rerun_count.values())}, "
+            f"wasted: {sum(self.wasted_count.values())}"
+        ) + (f" ({wasted})" if wasted else "")
+
+
+def target_key(chunk):
+    """
+    Return the key of the target table of chunk: its target trend store part
+    when known, otherwise its materialization.
+    """
+    dst_trend_store_part_id = getattr(chunk, "dst_trend_store_part_id", None)
+
+    if dst_trend_store_part_id is None:
+        return "materialization", chunk.materialization_id
+    else:
+        return "trend_store_part", dst_trend_store_part_id
+
+
+class MaterializationScheduler:
+    """
+    Run materialization chunks on multiple connections in parallel.
+
+    A chunk is only started when no chunk of any of its upstream
+    materializations is waiting or running, the newest timestamps are started
+    first, and at most `max_per_target` chunks writing to the same target
+    trend store part run at the same time, also when they belong to different
+    materializations.
+    """
+
+    def __init__(
+            self, dependencies: Dict[int, Set[int]],
+            connection: Callable[[], ContextManager], jobs: int,
+            max_per_target: int = DEFAULT_MAX_PER_TARGET,
+            history: Optional[RunHistory] = None):
+        """
+        :param dependencies: Direct upstream materializations by id
+        :param connection: Function returning a context manager providing a
+        database connection, used once per worker
+        :param jobs: Number of chunks to run in parallel
+        :param max_per_target: Maximum number of chunks with the same target
+        trend store part to run in parallel
+        :param history: Run history to record the started chunks in
+        """
+        self.upstream = ancestors(dependencies)
+        self.connection = connection
+        self.jobs = jobs
+        self.max_per_target = max_per_target
+        self.history = history
+
+        self._condition = threading.Condition()
+        self._pending: List = []
+        self._unfinished = Counter()
+        self._running = Counter()
+
+    def run(self, chunks: List):
+        """
+        Run all chunks and return when they are finished.
+
+        :param chunks: Objects with attributes materialization_id and
+        timestamp and a method materialize(conn), optionally with attribute
+        dst_trend_store_part_id
+        """
+        self._pending = sorted(chunks, key=lambda c: c.timestamp, reverse=True)
+        self._unfinished = Counter(c.materialization_id for c in chunks)
+        self._running = Counter()
+
+        workers = [
+            threading.Thread(target=self._work, daemon=True)
+            for _ in range(min(self.jobs, len(chunks)))
+        ]
+
+        for worker in workers:
+            worker.start()
+
+        for worker in workers:
+            worker.join()
+
+    def _work(self):
+        with self.connection() as conn:
+            while True:
+                chunk = self._next_chunk()
+
+                if chunk is None:
+                    return
+
+                try:
+                    chunk.materialize(conn)
+                except Exception:
+                    logging.exception(f"Error materializing {chunk}")
+                    conn.rollback()
+                finally:
+                    self._finish(chunk)
+
+    def _next_chunk(self):
+        """
+        Return the next chunk to run or None when all chunks are started,
+        waiting while chunks are pending but none can start yet.
+        """
+        with self._condition:
+            while self._pending:
+                index = self._ready_index()
+
+                if index is not None:
+                    chunk = self._pending.pop(index)
+                    self._running[target_key(chunk)] += 1
+
+                    if self.history is not None:
+                        self.history.record(
+                            chunk, self.upstream.get(chunk.materialization_id, ())
+                        )
+
+                    return chunk
+
+                self._condition.wait()
+
+            return None
+
+    def _ready_index(self):
+        for index, chunk in enumerate(self._pending):
+            if self._is_ready(chunk):
+                return index
+
+        if not sum(self._running.values()):
+            # Nothing is running but nothing is ready either, so there must
+            # be a dependency cycle. Continue in timestamp order.
+            logging.warning("Dependency cycle between materializations")
+
+            for index, chunk in enumerate(self._pending):
+                if self._running[target_key(chunk)] < self.max_per_target:
+                    return index
+
+        return None
+
+    def _is_ready(self, chunk) -> bool:
+        if self._running[target_key(chunk)] >= self.max_per_target:
+            return False
+
+        return not any(
+            self._unfinished[upstream_id]
+            for upstream_id in self.upstream.get(chunk.materialization_id, ())
+        )
+
+    def _finish(self, chunk):
+        with self._condition:
+            self._running[target_key(chunk)] -= 1
+            self._unfinished[chunk.materialization_id] -= 1
+            self._condition.notify_all()
@@ -5,15 +5,22 @@ from typing import List, Callable, Tuple, Dict, Optional
 
 from psycopg2 import extensions
 
-from minerva.db import ConnDbAction
+from minerva.db import ConnDbAction, CursorDbAction
+from minerva.db.error import DataTypeMismatch, UniqueViolation
 from minerva.db.query import Column, Eq, ands
 from minerva.storage import DataPackage
 
 from minerva.storage.trend import schema
 from minerva.directory import DataSource, EntityType
+from minerva.directory.metadatacache import metadata_cache
+from minerva.storage import datatype
 from minerva.storage.trend.granularity import create_granularity, Granularity
-from minerva.storage.trend.trendstorepart import TrendStorePart, PartitionExistsError
-from minerva.util import string_fns
+from minerva.storage.trend.trend import Trend
+from minerva.storage.trend.datapackage import DUPLICATES_KEEP_LAST
+from minerva.storage.trend.trendstorepart import TrendStorePart, \
+    PartitionExistsError, get_timestamp
+
+TREND_STORE_CACHE_NAMESPACE = "trend_store"
 
 
 class NoSuchTrendStore(Exception):
@@ -35,8 +42,6 @@ class NoSuchTrendStore(Exception):
 
 
 class TrendStore:
-    _trend_store_cache = {}
-
     class Descriptor:
         data_source: DataSource
         entity_type: EntityType
@@ -77,9 +82,24 @@ class TrendStore:
         columns
     ).where_(Eq(Column("id")))
 
+    # Trend stores with their entity type, data source, parts and trends, one
+    # row per trend
+    joined_query = (
+        "SELECT ts.id, ts.granularity, ts.partition_size, ts.retention_period, "
+        "et.id, et.name, et.description, ds.id, ds.name, ds.description, "
+        "tsp.id, tsp.name, t.id, t.name, t.data_type, t.description "
+        "FROM trend_directory.trend_store ts "
+        "JOIN directory.entity_type et ON et.id = ts.entity_type_id "
+        "JOIN directory.data_source ds ON ds.id = ts.data_source_id "
+        "LEFT JOIN trend_directory.trend_store_part tsp "
+        "ON tsp.trend_store_id = ts.id "
+        "LEFT JOIN trend_directory.table_trend t "
+        "ON t.trend_store_part_id = tsp.id "
+    )
+
     @classmethod
     def clear_cache(cls):
-        cls._trend_store_cache = {}
+        metadata_cache.invalidate(TREND_STORE_CACHE_NAMESPACE)
 
     def __init__(
             self, id_: int, data_source: DataSource, entity_type: EntityType,
@@ -133,6 +153,10 @@ class TrendStore:
             for record in cursor.fetchall()
         ]
 
+        return self.index_parts()
+
+    def index_parts(self) -> 'TrendStore':
+        """Update the part lookups after the parts have been set."""
         self.part_by_name = {
             part.name: part for part in self.parts
         }
@@ -168,50 +192,168 @@ class TrendStore:
 
         return f
 
+    @staticmethod
+    def from_joined_rows(rows) -> List['TrendStore']:
+        """
+        Return the trend stores described by rows of `joined_query`, in order
+        of appearance.
+        """
+        trend_stores: Dict[int, TrendStore] = {}
+        parts: Dict[int, TrendStorePart] = {}
+
+        for (
+            trend_store_id, granularity_str, partition_size, retention_period,
+            entity_type_id, entity_type_name, entity_type_description,
+            data_source_id, data_source_name, data_source_description,
+            part_id, part_name, trend_id, trend_name, data_type,
+            trend_description
+        ) in rows:
+            trend_store = trend_stores.get(trend_store_id)
+
+            if trend_store is None:
+                trend_store = trend_stores[trend_store_id] = TrendStore(
+                    trend_store_id,
+                    DataSource(
+                        data_source_id, data_source_name, data_source_description
+                    ),
+                    EntityType(
+                        entity_type_id, entity_type_name, entity_type_description
+                    ),
+                    create_granularity(granularity_str), partition_size,
+                    retention_period
+                )
+
+            if part_id is None:
+                continue
+
+            part = parts.get(part_id)
+
+            if part is None:
+                part = parts[part_id] = TrendStorePart(
+                    part_id, trend_store, part_name, []
+                )
+                trend_store.parts.append(part)
+
+            if trend_id is not None:
+                part.trends.append(
+                    Trend(
+                        trend_id, trend_name, datatype.registry[data_type],
+                        part_id, trend_description
+                    )
+                )
+
+        for trend_store in trend_stores.values():
+            trend_store.index_parts()
+
+        return list(trend_stores.values())
+
     @classmethod
-    def get(cls, data_source: DataSource, entity_type: EntityType, granularity: Granularity):
-        def query_db(cursor: extensions.cursor):
-            cache_key = (data_source.name, entity_type.name, str(granularity))
+    def get_by_entity_type_name(
+            cls, data_source: DataSource, entity_type_name: str,
+            granularity: Granularity):
+        """
+        Return function that returns the trend store of the data source,
+        entity type and granularity, or None if it does not exist.
 
-            cached_trend_store = TrendStore._trend_store_cache.get(cache_key)
+        Trend stores are cached in the process-wide metadata cache. When not
+        cached, the trend store is loaded together with its entity type,
+        parts and trends using a single query.
+        """
+        query = cls.joined_query + (
+            "WHERE ts.data_source_id = %s "
+            "AND lower(et.name) = lower(%s) "
+            "AND ts.granularity = %s "
+            "ORDER BY tsp.id, t.id"
+        )
 
-            if cached_trend_store is not None:
-                return cached_trend_store
+        def f(cursor: extensions.cursor) -> Optional[TrendStore]:
+            def load() -> Optional[TrendStore]:
+                args = data_source.id, entity_type_name, str(granularity)
 
-            args = data_source.id, entity_type.id, str(granularity)
+                cursor.execute(query, args)
 
-            cls.get_query.execute(cursor, args)
+                trend_stores = cls.from_joined_rows(cursor.fetchall())
 
-            if cursor.rowcount > 1:
-                raise Exception(
-                    "more than 1 ({}) trend store matches".format(
-                        cursor.rowcount
+                if len(trend_stores) > 1:
+                    raise Exception(
+                        "more than 1 ({}) trend store matches".format(
+                            len(trend_stores)
+                        )
                     )
-                )
 
-            if cursor.rowcount < 1:
-                return None
-            else:
-                trend_store = TrendStore.from_record(cursor.fetchone())(cursor)
+                if trend_stores:
+                    return trend_stores[0]
 
-                TrendStore._trend_store_cache[cache_key] = trend_store
+            cache_key = (
+                data_source.id, entity_type_name.lower(), str(granularity)
+            )
 
-                return trend_store
+            return metadata_cache.get(TREND_STORE_CACHE_NAMESPACE, cache_key, load)
 
-        return query_db
+        return f
+
+    @classmethod
+    def get(cls, data_source: DataSource, entity_type: EntityType, granularity: Granularity):
+        return cls.get_by_entity_type_name(
+            data_source, entity_type.name, granularity
+        )
 
     @classmethod
     def get_by_id(cls, trend_store_id: int):
+        query = cls.joined_query + "WHERE ts.id = %s ORDER BY tsp.id, t.id"
+
         def f(cursor):
             args = (trend_store_id,)
 
-            cls.get_by_id_query.execute(cursor, args)
+            cursor.execute(query, args)
+
+            trend_stores = cls.from_joined_rows(cursor.fetchall())
+
+            if trend_stores:
+                return trend_stores[0]
+
+        return f
+
+    @classmethod
+    def get_all(cls) -> Callable[[extensions.cursor], List['TrendStore']]:
+        """
+        Return function that loads all trend stores with their entity types,
+        data sources, parts and trends using a single query.
+        """
+        query = cls.joined_query + "ORDER BY ts.id, tsp.id, t.id"
+
+        def f(cursor):
+            cursor.execute(query)
 
-            if cursor.rowcount == 1:
-                return TrendStore.from_record(cursor.fetchone())(cursor)
+            return cls.from_joined_rows(cursor.fetchall())
 
         return f
 
+    @classmethod
+    def warm_cache(cls) -> Callable[[extensions.cursor], int]:
+        """
+        Return function that loads all trend stores into the process-wide
+        metadata cache and returns the number of trend stores loaded.
+        """
+        def f(cursor):
+            trend_stores = cls.get_all()(cursor)
+
+            for trend_store in trend_stores:
+                metadata_cache.put(
+                    TREND_STORE_CACHE_NAMESPACE, trend_store.cache_key(),
+                    trend_store
+                )
+
+            return len(trend_stores)
+
+        return f
+
+    def cache_key(self) -> Tuple[int, str, str]:
+        return (
+            self.data_source.id, self.entity_type.name.lower(),
+            str(self.granularity)
+        )
+
     def save(self, cursor: extensions.cursor) -> 'TrendStore':
         args = (
             self.data_source.id, self.entity_type.id, self.granularity,
@@ -231,11 +373,82 @@ class TrendStore:
 
         return self
 
-    def store(self, data_package: DataPackage, job_id: int) -> ConnDbAction:
-        return string_fns([
-            part.store(package_part, job_id)
-            for part, package_part in self.split_package_by_parts(data_package)
-        ])
+    def store(
+            self, data_package: DataPackage, job_id: int,
+            binary_copy: bool = False,
+            duplicate_policy: Optional[str] = DUPLICATES_KEEP_LAST) -> ConnDbAction:
+        """
+        Return function that stores the package in all parts in one
+        transaction.
+
+        The entity references are mapped once for all parts, the COPY
+        commands of the parts are sent back-to-back and all parts are marked
+        modified using one statement. If some of the records already exist,
+        the package is stored again through staging tables.
+
+        :param binary_copy: Use the binary COPY format where possible
+        :param duplicate_policy: Which row to keep of rows with the same
+        entity and timestamp, None to keep all
+        """
+        def f(conn):
+            if data_package.is_empty():
+                return
+
+            try:
+                with closing(conn.cursor()) as cursor:
+                    self.store_parts(
+                        data_package, job_id, False, binary_copy,
+                        duplicate_policy
+                    )(cursor)
+            except DataTypeMismatch as exc:
+                conn.rollback()
+
+                raise exc
+            except UniqueViolation:
+                # Entities created by the failed attempt are gone after the
+                # rollback, so the references are mapped again
+                conn.rollback()
+
+                with closing(conn.cursor()) as cursor:
+                    self.store_parts(
+                        data_package, job_id, True, binary_copy,
+                        duplicate_policy
+                    )(cursor)
+
+            conn.commit()
+
+        return f
+
+    def store_parts(
+            self, data_package: DataPackage, job_id: int,
+            via_staging: bool, binary_copy: bool = False,
+            duplicate_policy: Optional[str] = DUPLICATES_KEEP_LAST) -> CursorDbAction:
+        def f(cursor):
+            modified = get_timestamp(cursor)
+
+            refined_package = data_package.refine(cursor)
+
+            parts = []
+
+            for part, package_part in self.split_package_by_parts(refined_package):
+                if via_staging:
+                    part.store_via_staging(
+                        package_part, modified, job_id, binary_copy,
+                        duplicate_policy
+                    )(cursor)
+                else:
+                    part.store_copy_from(
+                        package_part, modified, job_id, binary_copy=binary_copy,
+                        duplicate_policy=duplicate_policy
+                    )(cursor)
+
+                parts.append(part)
+
+            TrendStorePart.mark_parts_modified(
+                parts, data_package.timestamps(), modified
+            )(cursor)
+
+        return f
 
     def split_package_by_parts(self, data_package: DataPackage) -> List[Tuple[TrendStorePart, DataPackage]]:
         def group_fn(trend_name: str) -> Optional[str]:
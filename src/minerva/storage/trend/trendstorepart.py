@@ -1,17 +1,21 @@
 # -*- coding: utf-8 -*-
-from datetime import datetime
+import struct
+from datetime import datetime, tzinfo
 from contextlib import closing
 from itertools import chain
-from typing import List, Callable, Any, Iterable, Generator
+from typing import List, Callable, Any, Iterable, Generator, Optional, Union
 
+import pytz
 import psycopg2
 import psycopg2.extras
 from psycopg2 import sql
 from psycopg2.extensions import adapt, register_adapter, AsIs, QuotedString
 
-from minerva.storage.trend.datapackage import DataPackageRow
+from minerva.storage.trend.datapackage import DataPackageRow, \
+    deduplicate_rows, DUPLICATES_KEEP_LAST
 from minerva.db import CursorDbAction, ConnDbAction
-from minerva.db.util import create_file
+from minerva.db.util import create_file, IteratorFile, copy_from
+from minerva.db.notify import MODIFIED_CHANNEL
 from minerva.db.error import DuplicateTable
 from minerva.storage import datatype, DataPackage
 from minerva.db.query import Table
@@ -27,6 +31,17 @@ from minerva.util import zip_apply, first
 
 LARGE_BATCH_THRESHOLD = 10
 
+# Exceptions raised by the COPY serializers for values that do not match the
+# data type of their trend
+SERIALIZATION_ERRORS = (struct.error, ValueError, TypeError, AttributeError)
+
+notify_modified_query = "SELECT pg_notify(%s, %s)"
+
+# Signature, flags field and header extension length of the binary COPY format
+BINARY_COPY_HEADER = b"PGCOPY\n\377\r\n\0" + struct.pack("!ii", 0, 0)
+
+BINARY_COPY_TRAILER = struct.pack("!h", -1)
+
 
 class PartitionExistsError(Exception):
     def __init__(self, trend_store_part_id, partition_index):
@@ -105,6 +120,20 @@ class TrendStorePart:
     def base_table(self) -> Table:
         return Table("trend", self.base_table_name())
 
+    @staticmethod
+    def refined_rows(
+        data_package: DataPackage, cursor,
+        duplicate_policy: Optional[str] = DUPLICATES_KEEP_LAST
+    ) -> List[DataPackageRow]:
+        """
+        Return the rows of the package with entity Ids, deduplicated according
+        to the duplicate policy, so that the rows can be stored with one COPY.
+
+        :param duplicate_policy: Which row to keep of rows with the same
+        entity and timestamp, None to keep all
+        """
+        return deduplicate_rows(data_package.refined_rows(cursor), duplicate_policy)
+
     def get_copy_serializers(self, trend_names: Iterable[str]):
         trend_by_name = {t.name: t for t in self.trends}
 
@@ -122,6 +151,29 @@ class TrendStorePart:
 
         return [get_serializer_by_trend_name(name) for name in trend_names]
 
+    def get_copy_binary_serializers(
+            self, trend_names: Iterable[str], config: Optional[dict] = None):
+        """
+        Return binary COPY serializers for the trends with names
+        `trend_names`.
+
+        :param config: Settings passed to the serializer of each data type
+
+        Raises NotImplementedError if a trend has a data type without binary
+        serializer.
+        """
+        trend_by_name = {t.name: t for t in self.trends}
+
+        def get_serializer_by_trend_name(name):
+            try:
+                trend = trend_by_name[name]
+            except KeyError:
+                raise NoSuchTrendError(f"no trend with name {name}")
+            else:
+                return trend.data_type.binary_serializer(config)
+
+        return [get_serializer_by_trend_name(name) for name in trend_names]
+
     @classmethod
     def get_by_id(cls, trend_store_part_id: int) -> CursorDbAction:
         def f(cursor):
@@ -166,16 +218,29 @@ class TrendStorePart:
 
         return f
 
-    def store(self, data_package: DataPackage, job_id: int) -> ConnDbAction:
+    def store(
+        self, data_package: DataPackage, job_id: int, binary_copy: bool = False,
+        duplicate_policy: Optional[str] = DUPLICATES_KEEP_LAST
+    ) -> ConnDbAction:
+        """
+        :param binary_copy: Use the binary COPY format when all trend data
+        types support it
+        :param duplicate_policy: Which row to keep of rows with the same
+        entity and timestamp, None to keep all
+        """
         def f(conn):
             try:
                 with closing(conn.cursor()) as cursor:
                     modified = get_timestamp(cursor)
 
-                    self.store_copy_from(data_package, modified, job_id)(cursor)
+                    self.store_copy_from(
+                        data_package, modified, job_id, binary_copy=binary_copy,
+                        duplicate_policy=duplicate_policy
+                    )(cursor)
 
-                    for timestamp in data_package.timestamps():
-                        self.mark_modified(timestamp, modified)(cursor)
+                    self.mark_modified_timestamps(
+                        data_package.timestamps(), modified
+                    )(cursor)
 
             except DataTypeMismatch as exc:
                 conn.rollback()
@@ -183,29 +248,60 @@ class TrendStorePart:
                 raise exc
 
             except UniqueViolation:
-                # Try again through a slower but more reliable method
+                # Some of the records already exist, so try again through a
+                # staging table that updates existing and inserts new records
                 conn.rollback()
 
                 with closing(conn.cursor()) as cursor:
                     modified = get_timestamp(cursor)
 
-                    self.securely_store_copy_from(data_package, modified, job_id)(
-                        cursor
-                    )
+                    self.store_via_staging(
+                        data_package, modified, job_id, binary_copy,
+                        duplicate_policy
+                    )(cursor)
 
-                    for timestamp in data_package.timestamps():
-                        self.mark_modified(timestamp, modified)(cursor)
+                    self.mark_modified_timestamps(
+                        data_package.timestamps(), modified
+                    )(cursor)
 
             conn.commit()
 
         return f
 
     def store_copy_from(
-        self, data_package: DataPackage, modified: datetime, job_id: int
+        self, data_package: DataPackage, modified: datetime, job_id: int,
+        table: Optional[Table] = None, binary_copy: bool = False,
+        duplicate_policy: Optional[str] = DUPLICATES_KEEP_LAST
     ) -> CursorDbAction:
         """
         Store the data using the PostgreSQL specific COPY FROM command
+
+        :param table: Table to copy into, the base table of this part by
+        default
+        :param binary_copy: Use the binary COPY format when all trend data
+        types support it
+        :param duplicate_policy: Which row to keep of rows with the same
+        entity and timestamp, None to keep all
+        """
+        if binary_copy:
+            return self.store_copy_from_binary(
+                data_package, modified, job_id, table, duplicate_policy
+            )
+        else:
+            return self.store_copy_from_text(
+                data_package, modified, job_id, table, duplicate_policy
+            )
+
+    def store_copy_from_text(
+        self, data_package: DataPackage, modified: datetime, job_id: int,
+        table: Optional[Table] = None,
+        duplicate_policy: Optional[str] = DUPLICATES_KEEP_LAST
+    ) -> CursorDbAction:
+        """
+        Store the data using the text format of the COPY FROM command
         """
+        if table is None:
+            table = self.base_table()
 
         def f(cursor):
             trend_names = [
@@ -219,15 +315,16 @@ class TrendStorePart:
             )
 
             copy_from_file = create_copy_from_file(
-                modified, job_id, data_package.refined_rows(cursor), serializers
+                modified, job_id,
+                self.refined_rows(data_package, cursor, duplicate_policy),
+                serializers
             )
 
-            copy_from_query = create_copy_from_query(self.base_table(), trend_names)
-            
-            try:
-                cursor.copy_expert(copy_from_query, copy_from_file)
-            except psycopg2.DatabaseError as exc:
-                raise translate_postgresql_exception(exc)
+            copy_from_query = create_copy_from_query(table, trend_names)
+
+            # Values the serializers cannot format, like a string for a
+            # timestamp trend, surface here while the file is read
+            copy_from_serialized(cursor, copy_from_query, copy_from_file)
 
             # Only valid for psycopg <2.8, so not compatible with the version on Ubuntu 18.04
             # try:
@@ -237,8 +334,63 @@ class TrendStorePart:
 
         return f
 
+    def store_copy_from_binary(
+        self, data_package: DataPackage, modified: datetime, job_id: int,
+        table: Optional[Table] = None,
+        duplicate_policy: Optional[str] = DUPLICATES_KEEP_LAST
+    ) -> CursorDbAction:
+        """
+        Store the data using the binary format of the COPY FROM command
+
+        Values are packed directly into their PostgreSQL binary representation,
+        so no text formatting and server side parsing is required. Naive
+        timestamps are interpreted in the time zone of the session, like in the
+        text format. Falls back to the text format if any of the trends has a
+        data type without binary serializer, or if the time zone of the session
+        is unknown.
+        """
+        trend_names = [
+            trend_descriptor.name
+            for trend_descriptor in data_package.trend_descriptors
+        ]
+
+        if table is None:
+            table = self.base_table()
+
+        try:
+            # Check up front that all data types have a binary serializer
+            self.get_copy_binary_serializers(trend_names)
+        except NotImplementedError:
+            return self.store_copy_from_text(
+                data_package, modified, job_id, table, duplicate_policy
+            )
+
+        def f(cursor):
+            timezone = get_session_timezone(cursor)
+
+            if timezone is None:
+                return self.store_copy_from_text(
+                    data_package, modified, job_id, table, duplicate_policy
+                )(cursor)
+
+            copy_from_file = create_binary_copy_from_file(
+                modified, job_id,
+                self.refined_rows(data_package, cursor, duplicate_policy),
+                self.get_copy_binary_serializers(trend_names, {"timezone": timezone}),
+                timezone
+            )
+
+            copy_from_query = create_binary_copy_from_query(table, trend_names)
+
+            # The rows are encoded while the COPY command reads the file, so
+            # encoding errors surface here as well.
+            copy_from_serialized(cursor, copy_from_query, copy_from_file)
+
+        return f
+
     def securely_store_copy_from(
-        self, data_package: DataPackage, modified: datetime, job_id: int
+        self, data_package: DataPackage, modified: datetime, job_id: int,
+        duplicate_policy: Optional[str] = DUPLICATES_KEEP_LAST
     ) -> CursorDbAction:
         """
         Same function as the previous, but with a slower, but less error-prone
@@ -255,7 +407,9 @@ class TrendStorePart:
 
             values = [
                 create_value_row(modified, job_id, row)
-                for row in data_package.refined_rows(cursor)
+                for row in self.refined_rows(
+                    data_package, cursor, duplicate_policy
+                )
             ]
 
             command = create_insert_query(self.base_table(), column_names)
@@ -267,29 +421,116 @@ class TrendStorePart:
 
         return f
 
+    def store_via_staging(
+        self, data_package: DataPackage, modified: datetime, job_id: int,
+        binary_copy: bool = False,
+        duplicate_policy: Optional[str] = DUPLICATES_KEEP_LAST
+    ) -> CursorDbAction:
+        """
+        Store the data using the COPY FROM command into a temporary staging
+        table, followed by one UPDATE of the existing records and one INSERT
+        of the missing records. Used for data that (partially) already exists,
+        like re-deliveries.
+
+        Without a duplicate policy the staging table can hold several rows for
+        the same entity and timestamp, which the INSERT .. ON CONFLICT DO
+        UPDATE cannot handle, so then only the last of those rows is kept.
+        """
+
+        def f(cursor):
+            trend_names = [
+                trend_descriptor.name
+                for trend_descriptor in data_package.trend_descriptors
+            ]
+
+            tmp_table = self._create_tmp_table()(cursor)
+
+            self.store_copy_from(
+                data_package, modified, job_id, tmp_table, binary_copy,
+                duplicate_policy
+            )(cursor)
+
+            if duplicate_policy is None:
+                self._deduplicate_tmp(tmp_table)(cursor)
+
+            self._update_existing_from_tmp(
+                tmp_table, self.base_table(), trend_names
+            )(cursor)
+
+            self._copy_missing_from_tmp(
+                tmp_table, self.base_table(), trend_names
+            )(cursor)
+
+        return f
+
+    def _create_tmp_table(self) -> CursorDbAction:
+        """
+        Create a temporary table with the same columns as the base table that
+        is dropped at the end of the transaction. The name is based on the
+        part Id, because names based on long part names could exceed the
+        identifier length limit and be truncated to the same name.
+        """
+        tmp_table = Table("pg_temp", "tmp_part_{}".format(self.id))
+
+        def f(cursor):
+            query = sql.SQL(
+                "DROP TABLE IF EXISTS {0}; "
+                "CREATE TEMPORARY TABLE {0} (LIKE {1}) ON COMMIT DROP"
+            ).format(tmp_table.identifier(), self.base_table().identifier())
+
+            try:
+                cursor.execute(query)
+            except psycopg2.DatabaseError as exc:
+                raise translate_postgresql_exception(exc)
+
+            return tmp_table
+
+        return f
+
+    @staticmethod
+    def _deduplicate_tmp(tmp_table: Table) -> CursorDbAction:
+        """
+        Delete all but the last copied row of rows in the temporary table
+        with the same entity_id, timestamp combination.
+        """
+        def f(cursor):
+            delete_query = sql.SQL(
+                "DELETE FROM {0} AS tmp USING {0} AS later "
+                "WHERE tmp.entity_id = later.entity_id "
+                'AND tmp."timestamp" = later."timestamp" '
+                "AND tmp.ctid < later.ctid"
+            ).format(tmp_table.identifier())
+
+            try:
+                cursor.execute(delete_query)
+            except psycopg2.DatabaseError as exc:
+                raise translate_postgresql_exception(exc)
+
+        return f
+
     @staticmethod
     def _update_existing_from_tmp(
-        tmp_table: Table, table: Table, column_names: List[str], modified: datetime
+        tmp_table: Table, table: Table, column_names: List[str]
     ) -> CursorDbAction:
+        """
+        Update the records in the target table that also exist in the
+        temporary table (based on entity_id, timestamp combination).
+        """
         def f(cursor):
             set_columns = sql.SQL(", ").join(
-                sql.SQL("{0}={1}.{0}").format(
-                    sql.Identifier(name), tmp_table.identifier()
-                )
-                for name in column_names
+                sql.SQL("{0}=tmp.{0}").format(sql.Identifier(name))
+                for name in chain(["job_id"], column_names)
             )
 
             update_query = sql.SQL(
-                "UPDATE {0} SET modified=greatest(%s, {0}.modified), {1} "
-                "FROM {2} "
-                "WHERE {0}.entity_id={2}.entity_id "
-                'AND {0}."timestamp"={2}."timestamp"'
+                "UPDATE {0} SET {1} "
+                "FROM {2} AS tmp "
+                "WHERE {0}.entity_id=tmp.entity_id "
+                'AND {0}."timestamp"=tmp."timestamp"'
             ).format(table.identifier(), set_columns, tmp_table.identifier())
 
-            args = (modified,)
-
             try:
-                cursor.execute(update_query, args)
+                cursor.execute(update_query)
             except psycopg2.DatabaseError as exc:
                 raise translate_postgresql_exception(exc)
 
@@ -300,15 +541,22 @@ class TrendStorePart:
         tmp_table: Table, table: Table, column_names: List[str]
     ) -> CursorDbAction:
         """
-        Store the data using the PostgreSQL specific COPY FROM command and a
-        temporary table. The temporary table is joined against the target table
+        Insert the records of the temporary table that are missing in the
+        target table. The temporary table is joined against the target table
         to make sure only missing records (based on entity_id, timestamp
-        combination) are inserted.
+        combination) are inserted. Records inserted by a concurrent loader
+        after the join are updated, like by _update_existing_from_tmp.
         """
 
         def f(cursor):
-            all_column_names = ["entity_id", "timestamp", "modified"]
-            all_column_names.extend(column_names)
+            all_column_names = list(chain(schema.system_columns, column_names))
+
+            update_columns = sql.SQL(", ").join(
+                sql.SQL("{0}={1}").format(
+                    sql.Identifier(name), sql.Identifier("excluded", name)
+                )
+                for name in chain(["job_id"], column_names)
+            )
 
             tmp_column_names = sql.SQL(", ").join(
                 sql.Identifier("tmp", name) for name in all_column_names
@@ -324,12 +572,14 @@ class TrendStorePart:
                 "LEFT JOIN {table} ON "
                 'tmp."timestamp" = {table}."timestamp" '
                 "AND tmp.entity_id = {table}.entity_id "
-                "WHERE {table}.entity_id IS NULL"
+                "WHERE {table}.entity_id IS NULL "
+                'ON CONFLICT (entity_id, "timestamp") DO UPDATE SET {update_columns}'
             ).format(
                 table=table.identifier(),
                 dest_columns=dest_column_names,
                 tmp_columns=tmp_column_names,
                 tmp_table=tmp_table.identifier(),
+                update_columns=update_columns,
             )
 
             try:
@@ -345,6 +595,73 @@ class TrendStorePart:
             args = self.id, timestamp, modified
 
             cursor.callproc("trend_directory.mark_modified", args)
+            cursor.execute(notify_modified_query, (MODIFIED_CHANNEL, str(self.id)))
+
+        return f
+
+    @translate_postgresql_exceptions
+    def mark_modified_timestamps(
+        self, timestamps: List[datetime], modified: datetime
+    ) -> CursorDbAction:
+        """
+        Mark all timestamps as modified for this part in one round trip.
+
+        The timestamps are passed in sorted order, so that concurrent
+        sessions lock the modified records in the same order. A notification
+        is sent on MODIFIED_CHANNEL, which is delivered to listeners when the
+        transaction commits.
+        """
+        query = (
+            "SELECT trend_directory.mark_modified(%s, t.timestamp, %s) "
+            "FROM unnest(%s::timestamptz[]) AS t(timestamp); "
+        ) + notify_modified_query
+
+        def f(cursor):
+            args = (
+                self.id, modified, sorted(timestamps),
+                MODIFIED_CHANNEL, str(self.id)
+            )
+
+            cursor.execute(query, args)
+
+        return f
+
+    @staticmethod
+    @translate_postgresql_exceptions
+    def mark_parts_modified(
+        parts: List['TrendStorePart'], timestamps: List[datetime],
+        modified: datetime
+    ) -> CursorDbAction:
+        """
+        Mark all timestamps as modified for all parts in one round trip.
+
+        The records are marked in order of part Id and timestamp, so that
+        concurrent sessions lock the modified records in the same order.
+        """
+        query = (
+            "SELECT trend_directory.mark_modified(m.part_id, m.timestamp, %s) "
+            "FROM ("
+            "SELECT p.part_id, t.timestamp "
+            "FROM unnest(%s::integer[]) AS p(part_id) "
+            "CROSS JOIN unnest(%s::timestamptz[]) AS t(timestamp) "
+            "ORDER BY p.part_id, t.timestamp"
+            ") m; "
+            "SELECT pg_notify(%s, p.part_id::text) "
+            "FROM unnest(%s::integer[]) AS p(part_id)"
+        )
+
+        def f(cursor):
+            part_ids = sorted(part.id for part in parts)
+
+            if not part_ids:
+                return
+
+            args = (
+                modified, part_ids, sorted(timestamps),
+                MODIFIED_CHANNEL, part_ids
+            )
+
+            cursor.execute(query, args)
 
         return f
 
@@ -415,6 +732,15 @@ def create_copy_from_query(table: Table, trend_names: List[str]) -> str:
     )
 
 
+def create_binary_copy_from_query(table: Table, trend_names: List[str]) -> str:
+    """Return SQL query that can be used in the binary COPY FROM command."""
+    column_names = chain(schema.system_columns, trend_names)
+
+    return sql.SQL("COPY {}({}) FROM STDIN (FORMAT binary)").format(
+        table.identifier(), sql.SQL(",").join([sql.Identifier(column_name) for column_name in column_names])
+    )
+
+
 def create_insert_query(table: Table, column_names: List[str]) -> sql.SQL:
     """Return insertion query to be performed when copy fails."""
     update_parts = [
@@ -454,6 +780,72 @@ def create_copy_from_lines(
     )
 
 
+def create_binary_copy_from_chunks(
+    modified: datetime, job_id: int, rows: List[DataPackageRow], serializers: List,
+    timezone: Union[tzinfo, str] = "UTC"
+) -> Generator[bytes, None, None]:
+    """
+    Return a generator with the header, one chunk per row and the trailer of
+    a binary copy-from file.
+
+    :param timezone: Time zone of naive timestamps
+    """
+    serialize_entity_id = datatype.registry["integer"].binary_serializer()
+    serialize_timestamp = datatype.registry["timestamp with time zone"].binary_serializer(
+        {"timezone": timezone}
+    )
+
+    map_values = zip_apply(serializers)
+
+    field_count = struct.pack("!h", len(schema.system_columns) + len(serializers))
+
+    # The created and job_id columns are the same for all rows
+    common_fields = (
+        serialize_timestamp(modified)
+        + datatype.registry["bigint"].binary_serializer()(job_id)
+    )
+
+    yield BINARY_COPY_HEADER
+
+    for entity_id, timestamp, values in rows:
+        yield b"".join(
+            [
+                field_count,
+                serialize_entity_id(entity_id),
+                serialize_timestamp(timestamp),
+                common_fields,
+            ]
+            + map_values(values)
+        )
+
+    yield BINARY_COPY_TRAILER
+
+
+def copy_from_serialized(cursor, query, copy_from_file: IteratorFile):
+    """
+    Execute the COPY FROM query, raising DataTypeMismatch when a value
+    could not be serialized while reading the file.
+    """
+    try:
+        copy_from(cursor, query, copy_from_file)
+    except SERIALIZATION_ERRORS as exc:
+        if exc is copy_from_file.error:
+            raise DataTypeMismatch(str(exc)) from exc
+
+        raise
+
+
+def create_binary_copy_from_file(
+    modified: datetime, job_id: int, rows: List[DataPackageRow], serializers: List,
+    timezone: Union[tzinfo, str] = "UTC"
+):
+    """Create a lazily encoded binary file to use in copy-from command."""
+    return IteratorFile(
+        create_binary_copy_from_chunks(modified, job_id, rows, serializers, timezone),
+        b""
+    )
+
+
 def create_value_row(modified: datetime, job_id: int, row: DataPackageRow):
     """Create a flat list from the provided data."""
     (entity_id, timestamp, values) = row
@@ -463,10 +855,26 @@ def create_value_row(modified: datetime, job_id: int, row: DataPackageRow):
 def create_copy_from_file(
     modified: datetime, job_id: int, rows: List[DataPackageRow], serializers: List
 ):
-    """Create an in memory file to use in copy-from command."""
+    """Create a lazily rendered file to use in copy-from command."""
     return create_file(create_copy_from_lines(modified, job_id, rows, serializers))
 
 
+def get_session_timezone(cursor) -> Optional[tzinfo]:
+    """
+    Return the time zone of the session of cursor, or None if it is not a
+    time zone known to pytz.
+    """
+    name = cursor.connection.info.parameter_status("TimeZone")
+
+    if name is None:
+        return None
+
+    try:
+        return pytz.timezone(name)
+    except pytz.UnknownTimeZoneError:
+        return None
+
+
 def get_timestamp(cursor) -> datetime:
     """Return the current timestamp from the database."""
     cursor.execute("SELECT NOW()")
@@ -5,7 +5,8 @@ from functools import wraps
 import psycopg2.extras
 from psycopg2 import sql
 
-from minerva.storage.trend.trendstore import TrendStore
+from minerva.directory.entityidcache import entity_id_cache
+from minerva.directory.metadatacache import metadata_cache
 from minerva.util.debug import log_call_basic
 
 
@@ -46,7 +47,8 @@ def with_conn(*setup_functions):
 
 
 def clear_database(conn):
-    TrendStore.clear_cache()
+    metadata_cache.clear()
+    entity_id_cache.clear()
 
     with conn.cursor() as cursor:
         cursor.execute("DELETE FROM trend_directory.table_trend CASCADE")
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+import argparse
+import unittest
+
+from minerva.commands import positive_int
+
+
+class TestPositiveInt(unittest.TestCase):
+    def test_valid(self):
+        self.assertEqual(positive_int("1"), 1)
+        self.assertEqual(positive_int("8"), 8)
+
+    def test_invalid(self):
+        for value in ["0", "-2", "two"]:
+            with self.assertRaises(argparse.ArgumentTypeError):
+                positive_int(value)
+
+    def test_parser_rejects_zero_jobs(self):
+        parser = argparse.ArgumentParser()
+        parser.add_argument("--jobs", type=positive_int, default=1)
+
+        with self.assertRaises(SystemExit):
+            parser.parse_args(["--jobs", "0"])
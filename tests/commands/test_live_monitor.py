@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+import unittest
+from unittest import mock
+
+from minerva.commands.live_monitor import live_monitor
+
+
+class StopMonitor(Exception):
+    pass
+
+
+class TestLiveMonitor(unittest.TestCase):
+    def run_cycles(self, chunk_counts, next_due=None, batch_size=50):
+        """Run the monitor for the given materialization results."""
+        timeouts = []
+
+        def wait(timeout):
+            timeouts.append(timeout)
+
+        results = iter(chunk_counts)
+
+        def materialize_all(reset, max_num, newest_first, jobs):
+            try:
+                return next(results)
+            except StopIteration:
+                raise StopMonitor()
+
+        with mock.patch(
+                'minerva.commands.live_monitor.process_modified_log'), \
+                mock.patch(
+                    'minerva.commands.live_monitor.materialize_all',
+                    materialize_all), \
+                self.assertRaises(StopMonitor):
+            live_monitor(batch_size, 300, 1, wait, next_due)
+
+        return timeouts
+
+    def test_idle_waits_for_fallback(self):
+        self.assertEqual(self.run_cycles([0, 0], lambda: None), [300, 300])
+
+    def test_wake_when_chunk_due(self):
+        self.assertEqual(self.run_cycles([0], lambda: 12.5), [12.5])
+        self.assertEqual(self.run_cycles([0], lambda: -1.0), [0.0])
+
+    def test_full_batch_runs_again(self):
+        self.assertEqual(self.run_cycles([50, 3], lambda: None), [300])
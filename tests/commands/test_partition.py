@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+import threading
+import unittest
+from contextlib import contextmanager
+from unittest import mock
+
+import psycopg2.errors
+
+from minerva.db.error import LockNotAvailable, DeadLockDetected
+from minerva.commands.partition import create_partition_with_retry, \
+    create_partitions_parallel, batch_partitions_by_part, \
+    remove_partitions_parallel, create_specific_partitions_for_trend_store
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.args = None
+
+    def close(self):
+        pass
+
+    def execute(self, query, args=None):
+        self.args = args
+        self.conn.server.create(*args)
+
+    def fetchone(self):
+        partition_index, trend_store_part_id = self.args
+
+        return f"part{trend_store_part_id}_{partition_index}", None
+
+
+class FakeServer:
+    """Creates partitions, failing to lock the first attempts of some."""
+
+    def __init__(self, lock_failures=None, existing=()):
+        self.lock_failures = dict(lock_failures or {})
+        self.existing = set(existing)
+        self.created = []
+        self.lock = threading.Lock()
+
+    def create(self, partition_index, trend_store_part_id):
+        key = trend_store_part_id, partition_index
+
+        with self.lock:
+            if key in self.existing:
+                raise psycopg2.errors.DuplicateTable()
+
+            if self.lock_failures.get(key, 0) > 0:
+                self.lock_failures[key] -= 1
+                raise psycopg2.errors.LockNotAvailable()
+
+            self.existing.add(key)
+            self.created.append(key)
+
+
+class FakeConnection:
+    def __init__(self, server):
+        self.server = server
+        self.commit_count = 0
+        self.rollback_count = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commit_count += 1
+
+    def rollback(self):
+        self.rollback_count += 1
+
+
+@mock.patch("minerva.commands.partition.sleep")
+class TestCreatePartitionWithRetry(unittest.TestCase):
+    def test_retry_with_backoff(self, sleep):
+        conn = FakeConnection(FakeServer({(1, 10): 3}))
+
+        name = create_partition_with_retry(conn, 1, 10, initial_backoff=1.0)
+
+        self.assertEqual(name, "part1_10")
+        self.assertEqual(conn.rollback_count, 3)
+        self.assertEqual(conn.commit_count, 1)
+
+        waits = [call.args[0] for call in sleep.call_args_list]
+
+        self.assertEqual(len(waits), 3)
+        self.assertTrue(0.5 <= waits[0] <= 1.0)
+        self.assertTrue(1.0 <= waits[1] <= 2.0)
+        self.assertTrue(2.0 <= waits[2] <= 4.0)
+
+    def test_give_up(self, sleep):
+        conn = FakeConnection(FakeServer({(1, 10): 5}))
+
+        with self.assertRaises(LockNotAvailable):
+            create_partition_with_retry(conn, 1, 10, max_attempts=3)
+
+        self.assertEqual(sleep.call_count, 2)
+
+    def test_existing(self, sleep):
+        conn = FakeConnection(FakeServer(existing=[(1, 10)]))
+
+        self.assertIsNone(create_partition_with_retry(conn, 1, 10))
+
+
+class PartsCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def execute(self, query, args=None):
+        pass
+
+    def fetchall(self):
+        return self.rows
+
+
+class TestCreateSpecificPartitions(unittest.TestCase):
+    def test_skip_lock_conflicts(self):
+        """Deadlocks are handled like lock timeouts, as in the other paths."""
+        conn = mock.Mock()
+        conn.cursor.return_value = PartsCursor([(1, 10), (2, 10), (3, 10)])
+
+        def create(conn, trend_store_part_id, partition_index):
+            if trend_store_part_id == 1:
+                raise DeadLockDetected()
+            elif trend_store_part_id == 2:
+                raise LockNotAvailable()
+
+            return f"part{trend_store_part_id}_{partition_index}"
+
+        with mock.patch(
+                "minerva.commands.partition.create_partition_with_retry", create):
+            results = list(create_specific_partitions_for_trend_store(
+                conn, 1, None
+            ))
+
+        self.assertEqual(results, [("part3_10", 10, 3, 3)])
+
+
+@mock.patch("minerva.commands.partition.sleep")
+class TestCreatePartitionsParallel(unittest.TestCase):
+    def test_create_all(self, sleep):
+        server = FakeServer({(2, 11): 2}, existing=[(3, 10)])
+
+        @contextmanager
+        def connection():
+            yield FakeConnection(server)
+
+        work_items = [
+            (part_id, index) for index in (10, 11) for part_id in (1, 2, 3)
+        ]
+
+        results = list(create_partitions_parallel(connection, work_items, 3))
+
+        self.assertEqual(len(results), 5)
+        self.assertEqual(
+            sorted(server.created), sorted(set(work_items) - {(3, 10)})
+        )
+        progress = [i for _, _, i, _ in results]
+
+        self.assertEqual(len(set(progress)), 5)
+        self.assertTrue(set(progress) <= set(range(1, 7)))
+        self.assertTrue(all(num == 6 for _, _, _, num in results))
+
+
+    def test_fail_fast(self, sleep):
+        class FailingServer(FakeServer):
+            def create(self, partition_index, trend_store_part_id):
+                if trend_store_part_id == 1:
+                    raise psycopg2.errors.UndefinedTable()
+
+                FakeServer.create(self, partition_index, trend_store_part_id)
+
+        server = FailingServer()
+
+        @contextmanager
+        def connection():
+            yield FakeConnection(server)
+
+        work_items = [(part_id, 10) for part_id in range(1, 21)]
+
+        with self.assertRaises(psycopg2.errors.UndefinedTable):
+            list(create_partitions_parallel(connection, work_items, 1))
+
+        self.assertLess(len(server.created), 5)
+
+
+def old_partition(partition_id, part_id, index):
+    return partition_id, part_id, f"part{part_id}_{index}", None, None
+
+
+class RemoveConnection:
+    def __init__(self, log, fail_names=()):
+        self.log = log
+        self.fail_names = fail_names
+        self.commit_count = 0
+        self.rollback_count = 0
+
+    def cursor(self):
+        return RemoveCursor(self)
+
+    def commit(self):
+        self.commit_count += 1
+
+    def rollback(self):
+        self.rollback_count += 1
+
+
+class RemoveCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def close(self):
+        pass
+
+    def execute(self, query, args=None):
+        if args is None:
+            names = [
+                identifier.strings[1]
+                for identifier in query.seq[1].seq[::2]
+            ]
+
+            if set(names) & set(self.conn.fail_names):
+                raise psycopg2.errors.LockNotAvailable()
+
+            self.conn.log.append(names)
+
+
+class TestRemovePartitions(unittest.TestCase):
+    def test_batch_by_part(self):
+        partitions = [
+            old_partition(1, 2, 1),
+            old_partition(2, 1, 2),
+            old_partition(3, 1, 1),
+            old_partition(4, 2, 2),
+            old_partition(5, 1, 3),
+        ]
+
+        batches = batch_partitions_by_part(partitions, 2)
+
+        self.assertEqual(
+            [[[name for _, _, name, _, _ in batch] for batch in part] for part in batches],
+            [
+                [["part1_1", "part1_2"], ["part1_3"]],
+                [["part2_1", "part2_2"]],
+            ]
+        )
+
+    def test_remove_parallel(self):
+        log = []
+
+        @contextmanager
+        def connection():
+            yield RemoveConnection(log, fail_names=["part2_3"])
+
+        partitions = [
+            old_partition(part_id * 10 + index, part_id, index)
+            for part_id in (1, 2, 3) for index in range(4)
+        ]
+
+        results = list(remove_partitions_parallel(connection, partitions, 3, 3))
+
+        removed = [name for batch in log for name in batch]
+        failed = [
+            name for batch, error in results if error is not None
+            for _, _, name, _, _ in batch
+        ]
+
+        self.assertEqual(len(results), 6)
+        self.assertEqual(failed, ["part2_3"])
+        self.assertEqual(len(removed), 11)
+        self.assertEqual(
+            [name for name in removed if name.startswith("part1")],
+            ["part1_0", "part1_1", "part1_2", "part1_3"]
+        )
+
+    def test_connection_failure(self):
+        @contextmanager
+        def connection():
+            raise psycopg2.OperationalError("could not connect")
+            yield
+
+        partitions = [old_partition(i, 1, i) for i in range(3)]
+
+        results = list(remove_partitions_parallel(connection, partitions, 2, 2))
+
+        self.assertEqual(len(results), 2)
+        self.assertTrue(
+            all(isinstance(error, psycopg2.OperationalError) for _, error in results)
+        )
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import threading
+import unittest
+
+from minerva.db.aio import AsyncDbRunner
+from minerva.db.pool import ConnectionPool
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, query, args=None):
+        self.conn.queries.append(query)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.autocommit = False
+        self.queries = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = 1
+
+
+class TestAsyncDbRunner(unittest.TestCase):
+    def create_runner(self, max_size=2):
+        connections = []
+
+        def connect_fn():
+            conn = FakeConnection()
+            connections.append(conn)
+
+            return conn
+
+        pool = ConnectionPool(connect_fn, min_size=0, max_size=max_size)
+
+        return AsyncDbRunner(pool), connections
+
+    def test_run_commits(self):
+        runner, connections = self.create_runner()
+
+        def action(conn):
+            conn.queries.append("INSERT")
+
+            return 42
+
+        async def main():
+            async with runner:
+                return await runner.run(action)
+
+        self.assertEqual(asyncio.run(main()), 42)
+        self.assertEqual(len(connections), 1)
+        self.assertIn("INSERT", connections[0].queries)
+        self.assertGreaterEqual(connections[0].commits, 1)
+
+    def test_run_cursor(self):
+        runner, connections = self.create_runner()
+
+        async def main():
+            async with runner:
+                await runner.run_cursor(lambda cursor: cursor.execute("SELECT 1"))
+
+        asyncio.run(main())
+
+        self.assertIn("SELECT 1", connections[0].queries)
+
+    def test_error_rolls_back(self):
+        runner, connections = self.create_runner()
+
+        def action(conn):
+            raise ValueError("failed")
+
+        async def main():
+            async with runner:
+                await runner.run(action)
+
+        with self.assertRaises(ValueError):
+            asyncio.run(main())
+
+        self.assertGreaterEqual(connections[0].rollbacks, 1)
+        self.assertEqual(connections[0].commits, 1)  # only by the pool reset
+
+    def test_concurrency_bounded_by_pool(self):
+        runner, connections = self.create_runner(max_size=3)
+
+        lock = threading.Lock()
+        running = [0]
+        max_running = [0]
+
+        def action(conn):
+            with lock:
+                running[0] += 1
+                max_running[0] = max(max_running[0], running[0])
+
+            threading.Event().wait(0.01)
+
+            with lock:
+                running[0] -= 1
+
+        async def main():
+            async with runner:
+                await asyncio.gather(*(runner.run(action) for _ in range(30)))
+
+        asyncio.run(main())
+
+        self.assertLessEqual(max_running[0], 3)
+        self.assertLessEqual(len(connections), 3)
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import unittest
+from collections import namedtuple
+
+import psycopg2
+
+from minerva.db.notify import NotificationListener
+
+Notify = namedtuple("Notify", ["pid", "channel", "payload"])
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, query, args=None):
+        self.conn.queries.append(query)
+
+
+class FakeConnection:
+    """Connection that becomes readable when a notification is sent."""
+
+    def __init__(self):
+        self.queries = []
+        self.notifies = []
+        self.isolation_level = None
+        self.closed = 0
+        self.broken = False
+        self._read_fd, self._write_fd = os.pipe()
+        self._received = []
+
+    def fileno(self):
+        return self._read_fd
+
+    def set_isolation_level(self, level):
+        self.isolation_level = level
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def send(self, payload):
+        self._received.append(Notify(1, "test", payload))
+        os.write(self._write_fd, b"x")
+
+    def poll(self):
+        if self.broken:
+            raise psycopg2.OperationalError("server closed the connection")
+
+        if self._received:
+            os.read(self._read_fd, len(self._received))
+            self.notifies.extend(self._received)
+            self._received = []
+
+    def close(self):
+        if not self.closed:
+            os.close(self._read_fd)
+            os.close(self._write_fd)
+
+        self.closed = 1
+
+
+class TestNotificationListener(unittest.TestCase):
+    def setUp(self):
+        self.connections = []
+
+    def tearDown(self):
+        for conn in self.connections:
+            conn.close()
+
+    def connect(self):
+        conn = FakeConnection()
+        self.connections.append(conn)
+
+        return conn
+
+    def test_listen(self):
+        listener = NotificationListener("test", self.connect)
+
+        self.assertEqual(listener.wait(0), [])
+
+        conn = self.connections[0]
+
+        self.assertEqual(len(conn.queries), 1)
+        self.assertIn("LISTEN", str(conn.queries[0]))
+        self.assertEqual(
+            conn.isolation_level,
+            psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT
+        )
+
+    def test_wait_returns_on_notification(self):
+        listener = NotificationListener("test", self.connect)
+        listener.wait(0)
+
+        self.connections[0].send("42")
+        self.connections[0].send("43")
+
+        started = time.monotonic()
+        payloads = listener.wait(10)
+
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(payloads, ["42", "43"])
+        self.assertEqual(listener.wait(0), [])
+
+    def test_wait_times_out(self):
+        listener = NotificationListener("test", self.connect)
+
+        started = time.monotonic()
+        payloads = listener.wait(0.05)
+
+        self.assertGreaterEqual(time.monotonic() - started, 0.05)
+        self.assertEqual(payloads, [])
+
+    def test_reconnect_after_failure(self):
+        listener = NotificationListener("test", self.connect)
+        listener.wait(0)
+
+        self.connections[0].broken = True
+
+        with self.assertLogs(level="WARNING"):
+            self.assertEqual(listener.wait(0.01), [])
+
+        self.assertTrue(self.connections[0].closed)
+
+        listener.wait(0)
+
+        self.assertEqual(len(self.connections), 2)
+        self.assertIn("LISTEN", str(self.connections[1].queries[0]))
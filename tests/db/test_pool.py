@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+import threading
+import unittest
+
+import psycopg2
+
+from minerva.db.pool import ConnectionPool, PoolTimeout, PoolClosed
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, query, args=None):
+        if self.conn.broken:
+            raise psycopg2.OperationalError("server closed the connection")
+
+        self.conn.queries.append(query)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.broken = False
+        self.autocommit = False
+        self.queries = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+
+class TestConnectionPool(unittest.TestCase):
+    def create_pool(self, **kwargs):
+        connections = []
+
+        def connect_fn():
+            conn = FakeConnection()
+            connections.append(conn)
+
+            return conn
+
+        return ConnectionPool(connect_fn, **kwargs), connections
+
+    def test_reuse(self):
+        pool, connections = self.create_pool(min_size=1, max_size=2)
+
+        with pool.connection() as conn_a:
+            pass
+
+        with pool.connection() as conn_b:
+            pass
+
+        self.assertIs(conn_a, conn_b)
+        self.assertEqual(len(connections), 1)
+        self.assertEqual(pool.size, 1)
+        self.assertIn("RESET ALL", conn_a.queries)
+
+    def test_max_size_timeout(self):
+        pool, _connections = self.create_pool(min_size=0, max_size=1)
+
+        conn = pool.getconn()
+
+        with self.assertRaises(PoolTimeout):
+            pool.getconn(timeout=0.01)
+
+        pool.putconn(conn)
+
+        self.assertIs(pool.getconn(timeout=0.01), conn)
+
+    def test_wait_for_connection(self):
+        pool, _connections = self.create_pool(min_size=0, max_size=1)
+
+        conn = pool.getconn()
+
+        timer = threading.Timer(0.05, pool.putconn, (conn,))
+        timer.start()
+
+        self.assertIs(pool.getconn(timeout=5), conn)
+
+        timer.join()
+
+    def test_session_settings(self):
+        pool, connections = self.create_pool(
+            min_size=1, session_settings={"lock_timeout": "1s"}
+        )
+
+        self.assertEqual(len(connections[0].queries), 1)
+
+        with pool.connection():
+            pass
+
+        self.assertEqual(len(connections[0].queries), 3)
+
+    def test_health_check(self):
+        pool, connections = self.create_pool(min_size=1, check_interval=0)
+
+        connections[0].broken = True
+
+        with pool.connection() as conn:
+            self.assertIs(conn, connections[1])
+
+        self.assertTrue(connections[0].closed)
+        self.assertEqual(pool.size, 1)
+
+    def test_broken_connection_discarded(self):
+        pool, connections = self.create_pool(min_size=0)
+
+        with pool.connection() as conn:
+            conn.broken = True
+
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.size, 0)
+
+    def test_closeall(self):
+        pool, connections = self.create_pool(min_size=2)
+
+        pool.closeall()
+
+        self.assertTrue(all(conn.closed for conn in connections))
+
+        with self.assertRaises(PoolClosed):
+            pool.getconn()
+
+    def test_invalid_size(self):
+        with self.assertRaises(ValueError):
+            ConnectionPool(FakeConnection, min_size=2, max_size=1)
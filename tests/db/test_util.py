@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the database utility functions."""
+import unittest
+
+from minerva.db.util import IteratorFile, create_file
+
+
+class TestIteratorFile(unittest.TestCase):
+    def test_read_all(self):
+        copy_from_file = create_file(["1\ta\n", "2\tb\n", "3\tc\n"])
+
+        self.assertEqual(copy_from_file.read(), "1\ta\n2\tb\n3\tc\n")
+        self.assertEqual(copy_from_file.read(), "")
+
+    def test_read_chunks(self):
+        copy_from_file = create_file(["1\ta\n", "2\tb\n", "3\tc\n"])
+
+        chunks = list(iter(lambda: copy_from_file.read(5), ""))
+
+        self.assertEqual(chunks, ["1\ta\n2", "\tb\n3\t", "c\n"])
+
+    def test_lazy(self):
+        pulled = []
+
+        def lines():
+            for i in range(1000):
+                pulled.append(i)
+
+                yield f"{i}\n"
+
+        copy_from_file = create_file(lines())
+
+        self.assertEqual(copy_from_file.read(4), "0\n1\n")
+        self.assertEqual(len(pulled), 2)
+
+    def test_bytes(self):
+        copy_from_file = IteratorFile([b"PGCOPY", b"\n"], b"")
+
+        self.assertEqual(copy_from_file.read(4), b"PGCO")
+        self.assertEqual(copy_from_file.read(), b"PY\n")
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""Tests for the EntityIdCache class."""
+import unittest
+
+from minerva.directory.entityidcache import EntityIdCache
+
+
+class TestEntityIdCache(unittest.TestCase):
+    def test_map_to_entity_ids(self):
+        """Existing entity Ids are looked up once and then served from cache."""
+        cache = EntityIdCache()
+        lookups = []
+
+        def lookup(refs):
+            lookups.append(refs)
+
+            return [{"a": 1, "b": 2}[ref] for ref in refs]
+
+        def get_or_create(refs):
+            raise AssertionError("no entities should be created")
+
+        ids = cache.map_to_entity_ids(
+            ("name", "cell"), ["a", "b", "a"], lookup, get_or_create
+        )
+
+        self.assertEqual(ids, [1, 2, 1])
+        self.assertEqual(lookups, [["a", "b"]])
+
+        ids = cache.map_to_entity_ids(
+            ("name", "cell"), ["b", "a"], lookup, get_or_create
+        )
+
+        self.assertEqual(ids, [2, 1])
+        self.assertEqual(len(lookups), 1)
+        self.assertEqual((cache.hits, cache.misses), (2, 3))
+
+    def test_created_entities_not_cached(self):
+        """Ids of newly created entities are returned but not cached."""
+        cache = EntityIdCache()
+
+        def lookup(refs):
+            return [None for _ref in refs]
+
+        def get_or_create(refs):
+            return [{"a": 10, "b": 11}[ref] for ref in refs]
+
+        ids = cache.map_to_entity_ids(("name", "cell"), ["b", "a"], lookup, get_or_create)
+
+        self.assertEqual(ids, [11, 10])
+        self.assertEqual(len(cache), 0)
+
+    def test_namespaces_separate(self):
+        cache = EntityIdCache()
+
+        cache.map_to_entity_ids(("name", "cell"), ["a"], lambda refs: [1], None)
+        ids = cache.map_to_entity_ids(("name", "site"), ["a"], lambda refs: [2], None)
+
+        self.assertEqual(ids, [2])
+        self.assertEqual(len(cache), 2)
+
+    def test_max_size(self):
+        """The least recently used entries are evicted."""
+        cache = EntityIdCache(max_size=2)
+
+        def lookup(refs):
+            return [ord(ref) for ref in refs]
+
+        cache.map_to_entity_ids("ns", ["a", "b"], lookup, None)
+        cache.map_to_entity_ids("ns", ["a"], lookup, None)
+        cache.map_to_entity_ids("ns", ["c"], lookup, None)
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.misses, 3)
+
+        cache.map_to_entity_ids("ns", ["a", "c"], lookup, None)
+
+        self.assertEqual(cache.misses, 3)
+
+    def test_clear(self):
+        cache = EntityIdCache()
+
+        cache.map_to_entity_ids("ns", ["a"], lambda refs: [1], None)
+        cache.clear()
+
+        self.assertEqual(len(cache), 0)
+        self.assertEqual((cache.hits, cache.misses), (0, 0))
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from minerva.directory.metadatacache import MetadataCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestMetadataCache(unittest.TestCase):
+    def setUp(self):
+        self.loads = []
+
+    def loader(self, value):
+        def load():
+            self.loads.append(value)
+
+            return value
+
+        return load
+
+    def test_hit(self):
+        cache = MetadataCache()
+
+        self.assertEqual(cache.get("entity_type", "cell", self.loader(1)), 1)
+        self.assertEqual(cache.get("entity_type", "cell", self.loader(2)), 1)
+
+        self.assertEqual(self.loads, [1])
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_namespaces(self):
+        cache = MetadataCache()
+
+        cache.get("entity_type", "cell", self.loader(1))
+        cache.get("data_source", "cell", self.loader(2))
+
+        self.assertEqual(cache.get("data_source", "cell", self.loader(3)), 2)
+        self.assertEqual(len(cache), 2)
+
+    def test_none_not_cached(self):
+        cache = MetadataCache()
+
+        self.assertIsNone(cache.get("entity_type", "cell", self.loader(None)))
+        self.assertEqual(cache.get("entity_type", "cell", self.loader(1)), 1)
+
+        self.assertEqual(self.loads, [None, 1])
+
+    def test_ttl(self):
+        clock = Clock()
+        cache = MetadataCache(ttl=10, clock=clock)
+
+        cache.get("entity_type", "cell", self.loader(1))
+
+        clock.now = 9.9
+        self.assertEqual(cache.get("entity_type", "cell", self.loader(2)), 1)
+
+        clock.now = 10.0
+        self.assertEqual(cache.get("entity_type", "cell", self.loader(2)), 2)
+
+        clock.now = 15.0
+        self.assertEqual(cache.get("entity_type", "cell", self.loader(3)), 2)
+
+    def test_no_ttl(self):
+        clock = Clock()
+        cache = MetadataCache(ttl=None, clock=clock)
+
+        cache.get("entity_type", "cell", self.loader(1))
+
+        clock.now = 1e9
+        self.assertEqual(cache.get("entity_type", "cell", self.loader(2)), 1)
+
+    def test_invalidate(self):
+        cache = MetadataCache()
+
+        cache.get("entity_type", "cell", self.loader(1))
+        cache.get("trend_store", (1, "cell", "15m"), self.loader(2))
+
+        cache.invalidate("trend_store")
+
+        self.assertEqual(cache.get("entity_type", "cell", self.loader(3)), 1)
+        self.assertEqual(cache.get("trend_store", (1, "cell", "15m"), self.loader(4)), 4)
+
+        cache.invalidate()
+
+        self.assertEqual(len(cache), 0)
+
+    def test_clear(self):
+        cache = MetadataCache()
+
+        cache.get("entity_type", "cell", self.loader(1))
+        cache.clear()
+
+        self.assertEqual((len(cache), cache.hits, cache.misses), (0, 0, 0))
+        self.assertEqual(len(cache.report()), 3)
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+import datetime
+import io
+import unittest
+
+from minerva.loading.csv.parser import Parser, ParseError, DEFAULT_CONFIG, \
+    create_timestamp_parser
+
+CSV_DATA = (
+    "entity,timestamp,a,b,c\n"
+    "node_1,2022-03-11T00:00:00+00:00,1,2.5,x\n"
+    "node_2,2022-03-11T00:00:00+00:00,3,,y\n"
+    "node_3,2022-03-11T00:15:00+00:00,5,7.25,z\n"
+)
+
+
+def create_config(**kwargs) -> dict:
+    config = dict(DEFAULT_CONFIG)
+    config["columns"] = [
+        {"name": "a", "data_type": "integer"},
+        {"name": "b", "data_type": "double precision"},
+        {"name": "c", "data_type": "text"},
+    ]
+    config.update(kwargs)
+
+    return config
+
+
+def load_rows(config, data=CSV_DATA) -> list:
+    parser = Parser(config)
+
+    return [
+        row
+        for package in parser.load_packages(io.StringIO(data), "test.csv")
+        for row in package.rows
+    ]
+
+
+class TestCsvParser(unittest.TestCase):
+    def test_columnar_equals_row_mode(self):
+        """The columnar mode should produce the same rows as the row mode."""
+        for chunk_size in (1, 2, 5000):
+            row_rows = load_rows(create_config(chunk_size=chunk_size))
+            columnar_rows = load_rows(
+                create_config(chunk_size=chunk_size, columnar=True)
+            )
+
+            self.assertEqual(columnar_rows, row_rows)
+
+        self.assertEqual(len(row_rows), 3)
+        self.assertEqual(row_rows[0][2], (1, 2.5, "x"))
+        self.assertEqual(row_rows[1][2], (3, None, "y"))
+
+    def test_columnar_no_columns(self):
+        rows = load_rows(create_config(columns=[], columnar=True))
+
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[2][0], "node_3")
+        self.assertEqual(rows[2][2], ())
+
+    def test_columnar_parse_error(self):
+        data = CSV_DATA + "node_4,2022-03-11T00:15:00+00:00,five,1.0,z\n"
+
+        with self.assertRaises(ParseError):
+            load_rows(create_config(columnar=True), data)
+
+    def test_columnar_missing_values(self):
+        data = CSV_DATA + "node_4,2022-03-11T00:15:00+00:00,5\n"
+
+        with self.assertRaises(ParseError):
+            load_rows(create_config(columnar=True), data)
+
+    def test_columnar_missing_timestamp(self):
+        """A row too short to hold the timestamp column is a parse error."""
+        data = (
+            "entity,a,b,c,timestamp\n"
+            "node_1,1,2.0,x,2022-03-11T00:15:00+00:00\n"
+            "node_2,1,2.0,x\n"
+        )
+
+        with self.assertRaises(ParseError):
+            load_rows(create_config(columnar=True), data)
+
+    def test_timestamp_format(self):
+        """An explicit timestamp format should give the same timestamps."""
+        expected = load_rows(create_config())
+
+        for columnar in (False, True):
+            for timestamp_format in ("iso", "%Y-%m-%dT%H:%M:%S%z"):
+                rows = load_rows(
+                    create_config(
+                        columnar=columnar, timestamp_format=timestamp_format
+                    )
+                )
+
+                self.assertEqual(rows, expected)
+
+
+class TestCreateTimestampParser(unittest.TestCase):
+    def test_memoized(self):
+        parse = create_timestamp_parser("iso")
+
+        first = parse("2022-03-11T00:15:00+00:00")
+        second = parse("2022-03-11T00:15:00+00:00")
+
+        self.assertIs(first, second)
+        self.assertEqual(parse.cache_info().hits, 1)
+
+    def test_strptime_format(self):
+        parse = create_timestamp_parser("%Y%m%d%H%M")
+
+        self.assertEqual(
+            parse("202203110015"), datetime.datetime(2022, 3, 11, 0, 15)
+        )
+
+    def test_invalid_value(self):
+        parse = create_timestamp_parser("%Y%m%d%H%M")
+
+        with self.assertRaises(ValueError):
+            parse("2022-03-11")
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from minerva.loading.loader import Loader
+from minerva.loading.ingest import IngestDaemon, PollingWatcher, \
+    InotifyWatcher, move_file
+
+CSV_DATA = "entity,timestamp\nnode_1,2022-03-11T00:00:00+00:00\n"
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met within timeout")
+
+        time.sleep(0.01)
+
+
+class TestWatchers(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.spool_dir = Path(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_polling_watcher(self):
+        (self.spool_dir / "a.csv").write_text(CSV_DATA)
+        (self.spool_dir / "b.txt").write_text(CSV_DATA)
+        (self.spool_dir / "done").mkdir()
+
+        watcher = PollingWatcher([self.spool_dir], "*.csv", settle_time=0)
+
+        self.assertEqual(watcher.poll(0), [self.spool_dir / "a.csv"])
+
+    def test_polling_watcher_settle_time(self):
+        (self.spool_dir / "a.csv").write_text(CSV_DATA)
+
+        watcher = PollingWatcher([self.spool_dir], "*.csv", settle_time=60)
+
+        self.assertEqual(watcher.poll(0), [])
+
+    def test_inotify_watcher(self):
+        (self.spool_dir / "existing.csv").write_text(CSV_DATA)
+
+        watcher = InotifyWatcher([self.spool_dir], "*.csv")
+
+        try:
+            self.assertEqual(watcher.poll(0), [self.spool_dir / "existing.csv"])
+
+            (self.spool_dir / "new.csv").write_text(CSV_DATA)
+            (self.spool_dir / "ignored.txt").write_text(CSV_DATA)
+
+            self.assertEqual(watcher.poll(1), [self.spool_dir / "new.csv"])
+            self.assertEqual(watcher.poll(0), [])
+        finally:
+            watcher.close()
+
+
+class TestIngestDaemon(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.spool_dir = Path(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_process_files(self):
+        (self.spool_dir / "good.csv").write_text(CSV_DATA)
+        (self.spool_dir / "bad.csv").write_text("no,entity,column\n1,2,3\n")
+
+        loader = Loader()
+        loader.pretend = True
+
+        daemon = IngestDaemon(
+            loader, "csv", None,
+            PollingWatcher([self.spool_dir], "*.csv", settle_time=0),
+            jobs=2, poll_interval=0.01
+        )
+
+        stop_event = threading.Event()
+
+        thread = threading.Thread(target=daemon.run, args=(stop_event,))
+        thread.start()
+
+        try:
+            wait_for(lambda: daemon.processed_count + daemon.failed_count == 2)
+        finally:
+            stop_event.set()
+            thread.join()
+
+        self.assertTrue((self.spool_dir / "done" / "good.csv").is_file())
+        self.assertTrue((self.spool_dir / "failed" / "bad.csv").is_file())
+        self.assertEqual(list(self.spool_dir.glob("*.csv")), [])
+
+    def test_stop_leaves_waiting_files(self):
+        """Stopping waits for the files being loaded, not for all reported files."""
+        paths = [self.spool_dir / f"{index}.csv" for index in range(5)]
+
+        for path in paths:
+            path.write_text(CSV_DATA)
+
+        started = threading.Event()
+        release = threading.Event()
+
+        class BlockingLoader:
+            def load_data(self, file_type, config, file_path):
+                started.set()
+                release.wait(5)
+
+        class OnceWatcher:
+            reported = False
+
+            def poll(self, timeout):
+                if self.reported:
+                    time.sleep(timeout)
+
+                    return []
+
+                self.reported = True
+
+                return list(paths)
+
+        daemon = IngestDaemon(
+            BlockingLoader(), "csv", None, OnceWatcher(), jobs=1,
+            poll_interval=0.01
+        )
+
+        stop_event = threading.Event()
+
+        thread = threading.Thread(target=daemon.run, args=(stop_event,))
+        thread.start()
+
+        try:
+            self.assertTrue(started.wait(5))
+            stop_event.set()
+        finally:
+            release.set()
+            thread.join()
+
+        self.assertEqual(daemon.processed_count, 1)
+        self.assertEqual(len(list(self.spool_dir.glob("*.csv"))), 4)
+
+    def test_move_file_no_overwrite(self):
+        target_dir = self.spool_dir / "done"
+        target_dir.mkdir()
+        (target_dir / "a.csv").write_text("old")
+        (self.spool_dir / "a.csv").write_text("new")
+
+        target = move_file(self.spool_dir / "a.csv", target_dir)
+
+        self.assertNotEqual(target.name, "a.csv")
+        self.assertEqual(target.read_text(), "new")
+        self.assertEqual((target_dir / "a.csv").read_text(), "old")
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from minerva.directory import DataSource, EntityType
+from minerva.directory.entityref import EntityIdRef
+from minerva.error import ConfigurationError
+from minerva.loading.loader import split_batches, trend_store_lock_keys, \
+    merge_trend_packages, create_store_db_context
+from minerva.storage.notification import Package
+from minerva.storage.notification.notificationstore import NoSuchNotificationStore
+from minerva.storage import datatype
+from minerva.storage.trend.datapackage import DataPackage, DataPackageType
+from minerva.storage.trend.granularity import create_granularity
+from minerva.storage.trend.trend import Trend
+from minerva.storage.trend.trendstore import TrendStore
+from minerva.storage.trend.trendstorepart import TrendStorePart
+
+
+class TestSplitBatches(unittest.TestCase):
+    def test_split_batches(self):
+        self.assertEqual(
+            split_batches([1, 2, 3, 4, 5], 2), [[1, 2, 3], [4, 5]]
+        )
+
+    def test_split_batches_more_batches_than_items(self):
+        self.assertEqual(split_batches([1, 2], 8), [[1], [2]])
+
+    def test_split_batches_empty(self):
+        self.assertEqual(split_batches([], 4), [])
+
+    def test_split_batches_max_size(self):
+        self.assertEqual(
+            split_batches(list(range(7)), 2, 3), [[0, 1, 2], [3, 4, 5], [6]]
+        )
+
+
+class TestTrendStoreLockKeys(unittest.TestCase):
+    def test_keys_per_part_and_timestamp(self):
+        trend_store = TrendStore(
+            42, DataSource(1, 'src', ''), EntityType(11, 'cell', ''),
+            create_granularity('900s'), 86400, '30 days'
+        )
+
+        trend_store.parts = [
+            TrendStorePart(
+                part_id, trend_store, name,
+                [Trend(i, trend, datatype.registry['integer'], part_id, '')
+                 for i, trend in enumerate(trends)]
+            )
+            for part_id, name, trends in [
+                (100, 'part-a', ['x']), (101, 'part-b', ['y']), (102, 'part-c', ['z'])
+            ]
+        ]
+        trend_store.index_parts()
+
+        timestamps = [datetime(2020, 1, 1, 12, 0), datetime(2020, 1, 1, 12, 15)]
+
+        package = DataPackage(
+            DataPackageType('cell', EntityIdRef, lambda p: 'cell'),
+            create_granularity('900s'),
+            [
+                Trend.Descriptor(name, datatype.registry['integer'], '')
+                for name in ['y', 'x', 'unknown']
+            ],
+            [(1, timestamp, (1, 2, 3)) for timestamp in timestamps]
+        )
+
+        self.assertEqual(trend_store_lock_keys(trend_store, package), [
+            '100/2020-01-01T12:00:00', '100/2020-01-01T12:15:00',
+            '101/2020-01-01T12:00:00', '101/2020-01-01T12:15:00',
+        ])
+
+
+def trend_package(entity_type_name, rows):
+    return DataPackage(
+        DataPackageType(entity_type_name, EntityIdRef, lambda p: entity_type_name),
+        create_granularity('900s'),
+        [Trend.Descriptor('x', datatype.registry['integer'], '')],
+        rows
+    )
+
+
+class TestMergeTrendPackages(unittest.TestCase):
+    def test_notification_packages_pass_through(self):
+        timestamp = datetime(2020, 1, 1, 12, 0)
+        notifications = Package(['severity'], [(EntityIdRef(1), timestamp, [3])])
+
+        packages = merge_trend_packages([
+            trend_package('cell', [(EntityIdRef(1), timestamp, (1,))]),
+            notifications,
+            trend_package('cell', [(EntityIdRef(2), timestamp, (2,))]),
+        ])
+
+        self.assertEqual(len(packages), 2)
+        self.assertIs(packages[0], notifications)
+        self.assertEqual(len(packages[1].rows), 2)
+
+
+@mock.patch('minerva.loading.loader.end_job')
+@mock.patch('minerva.loading.loader.start_job', return_value=1)
+@mock.patch(
+    'minerva.loading.loader.get_data_source_by_name',
+    return_value=lambda cursor: DataSource(1, 'alarms', '')
+)
+class TestStoreNotificationPackage(unittest.TestCase):
+    def store(self, store_cmd, stop_on_missing_store=False):
+        def store_lock(keys):
+            raise AssertionError('notification packages are not locked')
+
+        package = Package(
+            ['severity'], [(EntityIdRef(1), datetime(2020, 1, 1, 12, 0), [3])]
+        )
+
+        store_db_context = create_store_db_context(
+            'alarms', store_cmd, mock.MagicMock, stop_on_missing_store,
+            trend_store_options={'binary_copy': True}, store_lock=store_lock
+        )
+
+        with store_db_context() as store_package:
+            store_package(package, {})
+
+    def test_store_without_trend_options(self, *mocks):
+        calls = []
+
+        def store_cmd(package, job_id):
+            return lambda data_source: lambda conn: calls.append(data_source.name)
+
+        self.store(store_cmd)
+
+        self.assertEqual(calls, ['alarms'])
+
+    def test_missing_notification_store(self, *mocks):
+        def store_cmd(package, job_id):
+            def bind_data_source(data_source):
+                def execute(conn):
+                    raise NoSuchNotificationStore(data_source)
+
+                return execute
+
+            return bind_data_source
+
+        with self.assertLogs(level='WARNING'):
+            self.store(store_cmd)
+
+        with self.assertRaises(ConfigurationError):
+            self.store(store_cmd, stop_on_missing_store=True)
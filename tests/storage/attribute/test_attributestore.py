@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from minerva.storage.attribute.attributestore import AttributeStore
+
+
+class FakeCursor:
+    """Return the result sets in order, one per executed query."""
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.queries = []
+        self.rows = None
+
+    def execute(self, query, args=None):
+        self.queries.append(query)
+        self.rows = self.results.pop(0)
+
+    def fetchall(self):
+        return self.rows
+
+
+class TestAttributeStore(unittest.TestCase):
+    def test_get_all(self):
+        cursor = FakeCursor([
+            [
+                (1, 10, "src-a", "", 20, "cell", ""),
+                (2, 11, "src-b", "", 21, "site", ""),
+                (3, 10, "src-a", "", 21, "site", ""),
+            ],
+            [
+                (100, "height", "real", "", 1),
+                (101, "power", "integer", "", 1),
+                (102, "name", "text", "", 2),
+            ],
+        ])
+
+        attribute_stores = AttributeStore.get_all(cursor)
+
+        self.assertEqual(len(cursor.queries), 2)
+        self.assertEqual([store.id for store in attribute_stores], [1, 2, 3])
+        self.assertEqual(
+            [attribute.name for attribute in attribute_stores[0].attributes],
+            ["height", "power"]
+        )
+        self.assertIs(attribute_stores[0].attributes[0].attribute_store, attribute_stores[0])
+        self.assertEqual(attribute_stores[1].table_name(), "src-b_site")
+        self.assertEqual(attribute_stores[2].attributes, [])
@@ -189,7 +189,7 @@ class TestDataPackage(unittest.TestCase):
             ),
         ]
 
-        lines = data_package._create_copy_from_lines(output_descriptors)
+        lines = list(data_package._create_copy_from_lines(output_descriptors))
 
         self.assertEqual(
             lines[0], "123001\t2013-08-30 15:30:00+00:00\t405\t0.0\ttrue\t\n"
@@ -214,7 +214,7 @@ class TestDataPackage(unittest.TestCase):
                 datatype.copy_from_serializer_config(datatype.registry["smallint[]"]),
             )
         ]
-        lines = data_package._create_copy_from_lines(output_descriptors)
+        lines = list(data_package._create_copy_from_lines(output_descriptors))
 
         self.assertEqual(
             lines[0], "123001\t2013-08-30 15:30:00+00:00\t{0,1,2,4,7,4,2,1,0}\n"
@@ -240,7 +240,7 @@ class TestDataPackage(unittest.TestCase):
             )
         ]
 
-        lines = data_package._create_copy_from_lines(output_descriptors)
+        lines = list(data_package._create_copy_from_lines(output_descriptors))
 
         self.assertEqual(lines[1], "123002\t2013-08-30 15:30:00+00:00\t{0,1,2}\n")
         self.assertEqual(lines[2], "123003\t2013-08-30 15:30:00+00:00\t{\\N,\\N,\\N}\n")
@@ -260,7 +260,7 @@ class TestDataPackage(unittest.TestCase):
             )
         ]
 
-        lines = data_package._create_copy_from_lines(output_descriptors)
+        lines = list(data_package._create_copy_from_lines(output_descriptors))
 
         self.assertEqual(lines[0], "123001\t2013-08-30 15:30:00+00:00\t{\\N,\\N}\n")
         self.assertEqual(lines[1], "123002\t2013-08-30 15:30:00+00:00\t{\\N,\\N}\n")
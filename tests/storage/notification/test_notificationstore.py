@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+import unittest
+from datetime import datetime
+
+import psycopg2.extensions
+
+from minerva.directory import DataSource
+from minerva.directory.entityref import EntityIdRef
+from minerva.storage.notification import NotificationStore, Package, Record
+from minerva.storage.notification.attribute import Attribute
+
+
+class FakeCursor:
+    def __init__(self):
+        self.copies = []
+
+    def copy_expert(self, query, file, size=8192):
+        self.copies.append((query, file.read()))
+
+
+class ReadingCursor:
+    """Reads the COPY data like psycopg2 does, including its error handling."""
+
+    def copy_expert(self, query, file, size=8192):
+        try:
+            while file.read(size):
+                pass
+        except Exception:
+            raise psycopg2.extensions.QueryCanceledError('error in .read() call')
+
+
+class FakeNameRef:
+    mapped = []
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    @classmethod
+    def map_to_entity_ids(cls, entity_refs):
+        def f(cursor):
+            cls.mapped.append(entity_refs)
+
+            return [100 + int(name[-1]) for name in entity_refs]
+
+        return f
+
+
+class TestNotificationStore(unittest.TestCase):
+    def create_store(self):
+        data_source = DataSource(1, "alarms", "")
+
+        attributes = [
+            Attribute(1, 1, "severity", "integer", ""),
+            Attribute(2, 1, "text", "text", ""),
+        ]
+
+        return NotificationStore(1, data_source, attributes)
+
+    def test_store_package(self):
+        FakeNameRef.mapped = []
+
+        store = self.create_store()
+        timestamp = datetime(2020, 1, 1, 12, 0)
+
+        package = Package(["severity", "text"], [
+            (FakeNameRef("cell1"), timestamp, [3, "link\tdown"]),
+            (EntityIdRef(7), timestamp, [None, "back\\slash"]),
+            (FakeNameRef("cell2"), timestamp, [1, "multi\nline"]),
+        ])
+
+        cursor = FakeCursor()
+
+        store.store_package(package)(cursor)
+
+        self.assertEqual(FakeNameRef.mapped, [["cell1", "cell2"]])
+        self.assertEqual(len(cursor.copies), 1)
+
+        _, data = cursor.copies[0]
+
+        self.assertEqual(data.splitlines(), [
+            "101\t2020-01-01T12:00:00\t3\tlink\\tdown",
+            "7\t2020-01-01T12:00:00\t\\N\tback\\\\slash",
+            "102\t2020-01-01T12:00:00\t1\tmulti\\nline",
+        ])
+
+    def test_store_package_serialization_error(self):
+        """The serializer error is raised instead of QueryCanceled."""
+        store = NotificationStore(1, DataSource(1, "alarms", ""), [
+            Attribute(1, 1, "cleared", "timestamp", ""),
+        ])
+
+        package = Package(["cleared"], [
+            (EntityIdRef(7), datetime(2020, 1, 1, 12, 0), ["yesterday"]),
+        ])
+
+        with self.assertRaises(AttributeError):
+            store.store_package(package)(ReadingCursor())
+
+    def test_render_table(self):
+        package = Package(["severity", "text"], [
+            (EntityIdRef(7), datetime(2020, 1, 1, 12, 0), [3, "down"]),
+        ])
+
+        lines = package.render_table().splitlines()
+
+        self.assertEqual(len(lines), 3)
+        self.assertIn("severity", lines[0])
+        self.assertIn("down", lines[2])
+
+    def test_store_empty_package(self):
+        cursor = FakeCursor()
+
+        self.create_store().store_package(Package(["severity"], []))(cursor)
+
+        self.assertEqual(cursor.copies, [])
+
+    def test_store_records(self):
+        timestamp = datetime(2020, 1, 1, 12, 0)
+
+        records = [
+            Record(EntityIdRef(1), timestamp, ["severity"], [1]),
+            Record(EntityIdRef(2), timestamp, ["severity", "text"], [2, "a"]),
+            Record(EntityIdRef(3), timestamp, ["severity"], [3]),
+        ]
+
+        cursor = FakeCursor()
+
+        self.create_store().store_records(records)(cursor)
+
+        self.assertEqual(len(cursor.copies), 2)
+        self.assertEqual(len(cursor.copies[0][1].splitlines()), 2)
+        self.assertEqual(len(cursor.copies[1][1].splitlines()), 1)
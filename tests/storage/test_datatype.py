@@ -4,6 +4,8 @@ import decimal
 from datetime import datetime
 import unittest
 
+import pytz
+
 from minerva.storage import datatype
 from minerva.storage.datatype import ParseError
 
@@ -600,3 +602,120 @@ class TestDataTypeUtils(unittest.TestCase):
             datatype.registry['smallint[]'],
             datatype.registry['smallint[]']
         )
+
+
+class TestDataTypeBinarySerializer(unittest.TestCase):
+    def test_null(self):
+        for data_type in datatype.registry.values():
+            serialize = data_type.binary_serializer()
+
+            self.assertEqual(serialize(None), b'\xff\xff\xff\xff')
+
+    def test_integer(self):
+        serialize = datatype.registry['integer'].binary_serializer()
+
+        self.assertEqual(serialize(42), b'\x00\x00\x00\x04\x00\x00\x00\x2a')
+        self.assertEqual(serialize('42'), b'\x00\x00\x00\x04\x00\x00\x00\x2a')
+        self.assertEqual(serialize(-1), b'\x00\x00\x00\x04\xff\xff\xff\xff')
+
+    def test_integer_rejects_what_text_format_rejects(self):
+        serialize = datatype.registry['integer'].binary_serializer()
+
+        for value in (4.2, 4.0, '4.2', 'abc', True):
+            with self.assertRaises(ValueError):
+                serialize(value)
+
+    def test_double_precision(self):
+        serialize = datatype.registry['double precision'].binary_serializer()
+
+        self.assertEqual(
+            serialize(1.5), b'\x00\x00\x00\x08\x3f\xf8\x00\x00\x00\x00\x00\x00'
+        )
+
+    def test_timestamp_with_time_zone(self):
+        serialize = datatype.registry['timestamp with time zone'].binary_serializer()
+
+        timestamp = pytz.timezone('Europe/Amsterdam').localize(
+            datetime(2000, 1, 1, 1, 0, 1)
+        )
+
+        # One second after the PostgreSQL epoch
+        self.assertEqual(
+            serialize(timestamp), b'\x00\x00\x00\x08\x00\x00\x00\x00\x00\x0f\x42\x40'
+        )
+
+    def test_timestamp_with_time_zone_naive(self):
+        data_type = datatype.registry['timestamp with time zone']
+
+        naive = datetime(2000, 1, 1, 1, 0, 1)
+
+        # Naive timestamps are in the configured (session) time zone
+        self.assertEqual(
+            data_type.binary_serializer({'timezone': 'Europe/Amsterdam'})(naive),
+            b'\x00\x00\x00\x08\x00\x00\x00\x00\x00\x0f\x42\x40'
+        )
+
+        # and in UTC by default
+        self.assertEqual(
+            data_type.binary_serializer()(naive),
+            b'\x00\x00\x00\x08\x00\x00\x00\x00\xd6\xa2\xe6\x40'
+        )
+
+    def test_timestamp_with_time_zone_copy_text(self):
+        data_type = datatype.registry['timestamp with time zone']
+
+        serialize = data_type.string_serializer(
+            datatype.copy_from_serializer_config(data_type)
+        )
+
+        timestamp = pytz.timezone('Europe/Amsterdam').localize(
+            datetime(2000, 1, 1, 1, 0, 1, 500)
+        )
+
+        # Like the binary format, the text format keeps the offset
+        self.assertEqual(serialize(timestamp), '2000-01-01T01:00:01.000500+0100')
+        self.assertEqual(
+            serialize(timestamp.replace(tzinfo=None)), '2000-01-01T01:00:01.000500'
+        )
+
+    def test_numeric(self):
+        serialize = datatype.registry['numeric'].binary_serializer()
+
+        # ndigits=3, weight=1, sign=positive, dscale=3, digits 1 2345 6780
+        self.assertEqual(
+            serialize(decimal.Decimal('12345.678')),
+            b'\x00\x00\x00\x0e'
+            b'\x00\x03\x00\x01\x00\x00\x00\x03\x00\x01\x09\x29\x1a\x7c'
+        )
+
+        # ndigits=1, weight=-1, sign=negative, dscale=4, digits 1
+        self.assertEqual(
+            serialize('-0.0001'),
+            b'\x00\x00\x00\x0a\x00\x01\xff\xff\x40\x00\x00\x04\x00\x01'
+        )
+
+        self.assertEqual(
+            serialize(0), b'\x00\x00\x00\x08\x00\x00\x00\x00\x00\x00\x00\x00'
+        )
+
+    def test_text(self):
+        serialize = datatype.registry['text'].binary_serializer()
+
+        self.assertEqual(serialize('héllo'), b'\x00\x00\x00\x06h\xc3\xa9llo')
+
+    def test_integer_array(self):
+        serialize = datatype.registry['integer[]'].binary_serializer()
+
+        self.assertEqual(
+            serialize([1, None]),
+            b'\x00\x00\x00\x20'
+            b'\x00\x00\x00\x01\x00\x00\x00\x01\x00\x00\x00\x17'
+            b'\x00\x00\x00\x02\x00\x00\x00\x01'
+            b'\x00\x00\x00\x04\x00\x00\x00\x01'
+            b'\xff\xff\xff\xff'
+        )
+
+        self.assertEqual(
+            serialize([]),
+            b'\x00\x00\x00\x0c\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x17'
+        )
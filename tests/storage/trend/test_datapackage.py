@@ -8,7 +8,8 @@ import pytz
 from minerva.storage import datatype
 
 from minerva.storage.trend.granularity import create_granularity
-from minerva.storage.trend.datapackage import DataPackage
+from minerva.storage.trend.datapackage import DataPackage, ColumnarDataPackage, \
+    deduplicate_rows, DUPLICATES_KEEP_LAST, DUPLICATES_KEEP_FIRST
 from minerva.storage.trend.trend import Trend
 from minerva.test.trend import refined_package_type_for_entity_type
 
@@ -169,3 +170,184 @@ class TestDataPackage(unittest.TestCase):
                     1,
                     "green package should have 1 trends",
                 )
+
+
+class TestColumnarDataPackage(unittest.TestCase):
+    def setUp(self):
+        self.timestamp = pytz.utc.localize(datetime(2015, 2, 25, 10, 0, 0))
+
+        trends = [
+            Trend.Descriptor(name, datatype.registry["integer"], "")
+            for name in ("a", "b", "c", "d")
+        ]
+
+        self.row_package = DataPackage(
+            refined_package_type_for_entity_type("Node"),
+            create_granularity("900s"),
+            trends,
+            [
+                ("Node=001", self.timestamp, (11, 12, 13, 14)),
+                ("Node=002", self.timestamp, (21, 22, 23, 24)),
+                ("Node=003", self.timestamp, (31, 32, 33, 34)),
+            ],
+        )
+
+        self.package = ColumnarDataPackage.from_package(self.row_package)
+
+    def test_rows(self):
+        self.assertEqual(self.package.rows, self.row_package.rows)
+        self.assertFalse(self.package.is_empty())
+        self.assertEqual(self.package.timestamps(), [self.timestamp])
+
+    def test_filter_trends(self):
+        filtered_package = self.package.filter_trends(partial(contains, {"a", "c"}))
+
+        self.assertEqual(
+            filtered_package.rows[2], ("Node=003", self.timestamp, (31, 33))
+        )
+
+    def test_split_shares_columns(self):
+        group_dict = {"a": "blue", "b": "red", "c": "blue", "d": None}
+
+        packages = dict(self.package.split(group_dict.get))
+
+        self.assertEqual(set(packages), {"blue", "red"})
+
+        blue = packages["blue"]
+
+        self.assertEqual(
+            [td.name for td in blue.trend_descriptors], ["a", "c"]
+        )
+        self.assertEqual(blue.rows[0], ("Node=001", self.timestamp, (11, 13)))
+        self.assertIs(blue.entity_refs, self.package.entity_refs)
+        self.assertIs(blue.value_columns[1], self.package.value_columns[2])
+
+    def test_merge_packages(self):
+        merged = DataPackage.merge_packages(
+            [self.package.filter_trends(partial(contains, {"a"}))]
+        )
+
+        self.assertEqual(len(merged), 1)
+        self.assertEqual(merged[0].rows[1], ("Node=002", self.timestamp, [21]))
+
+    def test_empty(self):
+        package = ColumnarDataPackage.from_package(
+            DataPackage(
+                self.row_package.data_package_type,
+                self.row_package.granularity,
+                self.row_package.trend_descriptors,
+                [],
+            )
+        )
+
+        self.assertTrue(package.is_empty())
+        self.assertEqual(package.rows, [])
+        self.assertEqual(len(package.value_columns), 4)
+
+
+class TestMergePackages(unittest.TestCase):
+    def setUp(self):
+        self.timestamp = pytz.utc.localize(datetime(2015, 2, 25, 10, 0, 0))
+        self.data_package_type = refined_package_type_for_entity_type("Node")
+        self.granularity = create_granularity("900s")
+
+    def create_package(self, trend_names, rows, data_package_type=None):
+        return DataPackage(
+            data_package_type or self.data_package_type,
+            self.granularity,
+            [
+                Trend.Descriptor(name, datatype.registry["integer"], "")
+                for name in trend_names
+            ],
+            [
+                (entity_ref, self.timestamp, values)
+                for entity_ref, values in rows
+            ],
+        )
+
+    def test_merge_overlapping(self):
+        """Values of later packages overwrite those of earlier packages."""
+        package_1 = self.create_package(
+            ["a", "b"], [("Node=001", (1, 2)), ("Node=002", (3, 4))]
+        )
+        package_2 = self.create_package(
+            ["c", "b"], [("Node=002", (5, 6)), ("Node=003", (7, 8))]
+        )
+
+        merged, = DataPackage.merge_packages([package_1, package_2])
+
+        self.assertEqual(
+            [td.name for td in merged.trend_descriptors], ["a", "b", "c"]
+        )
+        self.assertEqual(
+            merged.rows,
+            [
+                ("Node=001", self.timestamp, [1, 2, None]),
+                ("Node=002", self.timestamp, [3, 6, 5]),
+                ("Node=003", self.timestamp, [None, 8, 7]),
+            ],
+        )
+
+    def test_merge_sorted_packages_streams(self):
+        """Merged packages are produced before all input is consumed."""
+        other_package_type = refined_package_type_for_entity_type("Other")
+
+        consumed = []
+
+        def packages():
+            for package in [
+                self.create_package(["a"], [("Node=001", (1,))]),
+                self.create_package(["b"], [("Node=001", (2,))]),
+                self.create_package(
+                    ["a"], [("Other=001", (3,))], other_package_type
+                ),
+                self.create_package(
+                    ["b"], [("Other=001", (4,))], other_package_type
+                ),
+            ]:
+                consumed.append(package)
+                yield package
+
+        merged = DataPackage.merge_sorted_packages(packages())
+
+        first = next(merged)
+
+        self.assertEqual(first.rows, [("Node=001", self.timestamp, [1, 2])])
+        self.assertEqual(len(consumed), 3)
+
+        second, = merged
+
+        self.assertEqual(second.rows, [("Other=001", self.timestamp, [3, 4])])
+
+
+class TestDeduplicateRows(unittest.TestCase):
+    rows = [
+        (1, "t1", (1,)),
+        (2, "t1", (2,)),
+        (1, "t1", (3,)),
+        (1, "t2", (4,)),
+    ]
+
+    def test_keep_last(self):
+        self.assertEqual(
+            deduplicate_rows(self.rows, DUPLICATES_KEEP_LAST),
+            [(1, "t1", (3,)), (2, "t1", (2,)), (1, "t2", (4,))],
+        )
+
+    def test_keep_first(self):
+        self.assertEqual(
+            deduplicate_rows(self.rows, DUPLICATES_KEEP_FIRST),
+            [(1, "t1", (1,)), (2, "t1", (2,)), (1, "t2", (4,))],
+        )
+
+    def test_no_policy(self):
+        self.assertIs(deduplicate_rows(self.rows, None), self.rows)
+
+    def test_no_duplicates(self):
+        rows = self.rows[:2]
+
+        self.assertIs(deduplicate_rows(rows, DUPLICATES_KEEP_LAST), rows)
+
+    def test_invalid_policy(self):
+        with self.assertRaises(ValueError):
+            deduplicate_rows(self.rows, "middle")
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+import unittest
+from datetime import datetime
+
+from minerva.storage.trend.materializationstats import ChunkStats, \
+    MaterializationStats, percentile, OUTCOME_ERROR
+
+TIMESTAMP = datetime(2020, 1, 1, 12, 0)
+
+
+class TestPercentile(unittest.TestCase):
+    def test_nearest_rank(self):
+        values = list(range(1, 101))
+
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile(values, 100), 100)
+
+    def test_small_samples(self):
+        self.assertEqual(percentile([], 50), 0.0)
+        self.assertEqual(percentile([3.0], 99), 3.0)
+        self.assertEqual(percentile([1.0, 2.0], 50), 1.0)
+
+
+class TestMaterializationStats(unittest.TestCase):
+    def test_report(self):
+        stats = MaterializationStats()
+
+        for duration in [0.1, 0.2, 0.3]:
+            stats.add(ChunkStats(1, "fast", TIMESTAMP, duration, 0.0, 10))
+
+        stats.add(ChunkStats(2, "slow", TIMESTAMP, 5.0, 1.5, 100))
+        stats.add(
+            ChunkStats(2, "slow", TIMESTAMP, 0.5, 0.0, None, OUTCOME_ERROR, "boom")
+        )
+
+        lines = stats.report().splitlines()
+
+        self.assertIn("p50", lines[0])
+        self.assertIn("p99", lines[0])
+
+        # Highest total duration first, after the header separator
+        self.assertTrue(lines[2].startswith("slow"))
+        self.assertTrue(lines[3].startswith("fast"))
+
+        self.assertEqual(stats.run_count, {1: 3, 2: 2})
+        self.assertEqual(stats.error_count, {2: 1})
+        self.assertEqual(
+            [value.strip() for value in lines[2].split("|")],
+            ["slow", "2", "1", "5.500", "0.500", "5.000", "5.000", "1.500", "100"]
+        )
+
+    def test_sample_size(self):
+        stats = MaterializationStats(sample_size=2)
+
+        for duration in [1.0, 2.0, 3.0]:
+            stats.add(ChunkStats(1, "m", TIMESTAMP, duration, 0.0, 1))
+
+        self.assertEqual(len(stats.samples[1]), 2)
+        self.assertEqual(stats.run_count[1], 3)
+        self.assertEqual(stats.total_duration[1], 6.0)
+
+    def test_log_file(self):
+        log_file = io.StringIO()
+        stats = MaterializationStats(log_file=log_file)
+
+        stats.add(ChunkStats(1, "m", TIMESTAMP, 0.25, 0.125, 7))
+
+        record = json.loads(log_file.getvalue())
+
+        self.assertEqual(record["materialization_id"], 1)
+        self.assertEqual(record["timestamp"], "2020-01-01T12:00:00")
+        self.assertEqual(record["duration"], 0.25)
+        self.assertEqual(record["lock_wait"], 0.125)
+        self.assertEqual(record["row_count"], 7)
+        self.assertEqual(record["outcome"], "success")
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+import unittest
+from contextlib import contextmanager
+
+from minerva.storage.trend.scheduling import ancestors, dependency_levels, \
+    group_by_level, MaterializationScheduler, RunHistory
+
+
+class FakeConnection:
+    def __init__(self):
+        self.rollback_count = 0
+
+    def rollback(self):
+        self.rollback_count += 1
+
+
+@contextmanager
+def fake_connection():
+    yield FakeConnection()
+
+
+class FakeChunk:
+    def __init__(
+            self, log, materialization_id, timestamp, duration=0.0, fail=False,
+            dst_trend_store_part_id=None):
+        self.log = log
+        self.materialization_id = materialization_id
+        self.timestamp = timestamp
+        self.dst_trend_store_part_id = dst_trend_store_part_id
+        self.duration = duration
+        self.fail = fail
+
+    def materialize(self, conn):
+        self.log.start(self)
+        time.sleep(self.duration)
+        self.log.end(self)
+
+        if self.fail:
+            raise Exception("materialization failed")
+
+
+class Log:
+    def __init__(self):
+        self.events = []
+        self.running = {}
+        self.max_running = {}
+        self.running_by_target = {}
+        self.max_running_by_target = {}
+        self.lock = threading.Lock()
+
+    def start(self, chunk):
+        with self.lock:
+            self.events.append(("start", chunk.materialization_id, chunk.timestamp))
+            running = self.running.get(chunk.materialization_id, 0) + 1
+            self.running[chunk.materialization_id] = running
+            self.max_running[chunk.materialization_id] = max(
+                running, self.max_running.get(chunk.materialization_id, 0)
+            )
+            target = chunk.dst_trend_store_part_id
+            running = self.running_by_target.get(target, 0) + 1
+            self.running_by_target[target] = running
+            self.max_running_by_target[target] = max(
+                running, self.max_running_by_target.get(target, 0)
+            )
+
+    def end(self, chunk):
+        with self.lock:
+            self.events.append(("end", chunk.materialization_id, chunk.timestamp))
+            self.running[chunk.materialization_id] -= 1
+            self.running_by_target[chunk.dst_trend_store_part_id] -= 1
+
+    def index(self, event, materialization_id, timestamp):
+        return self.events.index((event, materialization_id, timestamp))
+
+
+class TestAncestors(unittest.TestCase):
+    def test_transitive(self):
+        result = ancestors({1: set(), 2: {1}, 3: {2}, 4: {3, 1}})
+
+        self.assertEqual(result[1], set())
+        self.assertEqual(result[2], {1})
+        self.assertEqual(result[3], {1, 2})
+        self.assertEqual(result[4], {1, 2, 3})
+
+    def test_cycle(self):
+        result = ancestors({1: {2}, 2: {1}})
+
+        self.assertIn(2, result[1])
+        self.assertIn(1, result[2])
+
+
+class TestDependencyLevels(unittest.TestCase):
+    def test_levels(self):
+        # 1: raw, 2: time aggregation of 1, 3: entity aggregation of 2,
+        # 4: aggregation of both 1 and 3
+        levels = dependency_levels({1: set(), 2: {1}, 3: {2}, 4: {1, 3}})
+
+        self.assertEqual(levels, {1: 0, 2: 1, 3: 2, 4: 3})
+
+    def test_cycle(self):
+        levels = dependency_levels({1: {2}, 2: {1}, 3: {1}})
+
+        self.assertEqual(set(levels), {1, 2, 3})
+        self.assertGreater(levels[3], levels[1])
+
+    def test_group_by_level(self):
+        log = Log()
+        chunks = [
+            FakeChunk(log, 3, 1),
+            FakeChunk(log, 1, 2),
+            FakeChunk(log, 2, 1),
+            FakeChunk(log, 1, 1),
+            FakeChunk(log, 5, 1),
+        ]
+
+        groups = group_by_level(chunks, {1: 0, 2: 1, 3: 2})
+
+        self.assertEqual(
+            [
+                [(chunk.materialization_id, chunk.timestamp) for chunk in group]
+                for group in groups
+            ],
+            [[(1, 2), (1, 1), (5, 1)], [(2, 1)], [(3, 1)]]
+        )
+
+
+class TestRunHistory(unittest.TestCase):
+    def test_wasted_rerun(self):
+        log = Log()
+        history = RunHistory()
+
+        self.assertFalse(history.record(FakeChunk(log, 2, 1), {1}))
+        self.assertFalse(history.record(FakeChunk(log, 1, 1), set()))
+        self.assertTrue(history.record(FakeChunk(log, 2, 1), {1}))
+
+        self.assertEqual(history.rerun_count[2], 1)
+        self.assertEqual(history.wasted_count[2], 1)
+        self.assertIn("wasted: 1", history.report())
+
+    def test_rerun_without_upstream_run(self):
+        log = Log()
+        history = RunHistory()
+
+        history.record(FakeChunk(log, 1, 1), set())
+        history.record(FakeChunk(log, 2, 1), {1})
+        history.record(FakeChunk(log, 2, 1), {1})
+
+        self.assertEqual(history.rerun_count[2], 1)
+        self.assertEqual(history.wasted_count[2], 0)
+
+    def test_max_size(self):
+        log = Log()
+        history = RunHistory(max_size=2)
+
+        for timestamp in range(3):
+            history.record(FakeChunk(log, 1, timestamp))
+
+        self.assertFalse(history.record(FakeChunk(log, 1, 0)))
+        self.assertTrue(history.record(FakeChunk(log, 1, 2)))
+
+
+class TestMaterializationScheduler(unittest.TestCase):
+    def test_newest_first(self):
+        log = Log()
+        chunks = [FakeChunk(log, 1, timestamp) for timestamp in [1, 3, 2]]
+
+        MaterializationScheduler({1: set()}, fake_connection, 1).run(chunks)
+
+        self.assertEqual(
+            [timestamp for event, _, timestamp in log.events if event == "start"],
+            [3, 2, 1]
+        )
+
+    def test_upstream_before_downstream(self):
+        log = Log()
+        chunks = [
+            FakeChunk(log, 2, 1),
+            FakeChunk(log, 2, 2),
+            FakeChunk(log, 1, 1, duration=0.02),
+            FakeChunk(log, 1, 2, duration=0.02),
+        ]
+
+        MaterializationScheduler({1: set(), 2: {1}}, fake_connection, 4).run(chunks)
+
+        self.assertEqual(len(log.events), 8)
+
+        last_upstream_end = max(log.index("end", 1, t) for t in [1, 2])
+        first_downstream_start = min(log.index("start", 2, t) for t in [1, 2])
+
+        self.assertLess(last_upstream_end, first_downstream_start)
+
+    def test_history(self):
+        log = Log()
+        history = RunHistory()
+        chunks = [FakeChunk(log, 1, 1), FakeChunk(log, 2, 1)]
+
+        scheduler = MaterializationScheduler(
+            {1: set(), 2: {1}}, fake_connection, 2, history=history
+        )
+
+        scheduler.run(chunks)
+        scheduler.run(chunks)
+
+        self.assertEqual(sum(history.rerun_count.values()), 2)
+        self.assertEqual(history.wasted_count[2], 1)
+
+    def test_independent_in_parallel(self):
+        log = Log()
+        chunks = [FakeChunk(log, i, 1, duration=0.05) for i in range(4)]
+
+        started = time.monotonic()
+        MaterializationScheduler(
+            {i: set() for i in range(4)}, fake_connection, 4
+        ).run(chunks)
+
+        self.assertLess(time.monotonic() - started, 0.15)
+
+    def test_max_per_target(self):
+        log = Log()
+        chunks = [FakeChunk(log, 1, t, duration=0.01) for t in range(6)]
+
+        MaterializationScheduler({1: set()}, fake_connection, 4).run(chunks)
+
+        self.assertEqual(log.max_running[1], 1)
+
+        log = Log()
+        chunks = [FakeChunk(log, 1, t, duration=0.02) for t in range(6)]
+
+        MaterializationScheduler(
+            {1: set()}, fake_connection, 4, max_per_target=2
+        ).run(chunks)
+
+        self.assertEqual(log.max_running[1], 2)
+
+    def test_max_per_target_across_materializations(self):
+        """Materializations writing to the same part do not run in parallel."""
+        log = Log()
+        chunks = [
+            FakeChunk(log, materialization_id, t, duration=0.01,
+                      dst_trend_store_part_id=10)
+            for materialization_id in range(3) for t in range(2)
+        ]
+
+        MaterializationScheduler(
+            {i: set() for i in range(3)}, fake_connection, 4
+        ).run(chunks)
+
+        self.assertEqual(len(log.events), 12)
+        self.assertEqual(log.max_running_by_target[10], 1)
+
+    def test_cycle_does_not_block(self):
+        log = Log()
+        chunks = [FakeChunk(log, 1, 1), FakeChunk(log, 2, 1)]
+
+        MaterializationScheduler({1: {2}, 2: {1}}, fake_connection, 2).run(chunks)
+
+        self.assertEqual(len(log.events), 4)
+
+    def test_failure_does_not_block(self):
+        log = Log()
+        chunks = [FakeChunk(log, 1, 1, fail=True), FakeChunk(log, 2, 1)]
+
+        with self.assertLogs(level="ERROR"):
+            MaterializationScheduler(
+                {1: set(), 2: {1}}, fake_connection, 2
+            ).run(chunks)
+
+        self.assertEqual(len(log.events), 4)
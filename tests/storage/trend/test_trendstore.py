@@ -1,8 +1,22 @@
 import unittest
+from datetime import datetime, timedelta
+from unittest import mock
 
+import psycopg2.extensions
+from psycopg2 import sql
+
+from minerva.db.error import UniqueViolation, DataTypeMismatch
 from minerva.directory import DataSource, EntityType
+from minerva.directory.entityref import EntityRef
+from minerva.storage import datatype
+from minerva.storage.trend.datapackage import DataPackage, DataPackageType, \
+    ColumnarDataPackage, DUPLICATES_KEEP_FIRST
+from minerva.storage.trend.trend import Trend
+from minerva.storage.trend.trendstorepart import TrendStorePart
+from minerva.directory.metadatacache import metadata_cache
 from minerva.storage.trend.granularity import create_granularity
 from minerva.storage.trend.trendstore import TrendStore
+from minerva.db.query import Table
 
 
 class TestTrendStore(unittest.TestCase):
@@ -18,6 +32,71 @@ class TestTrendStore(unittest.TestCase):
 
         self.assertIsNotNone(trend_store)
 
+    def test_from_joined_rows(self):
+        common = (
+            '1 day', 86400, '30 days', 11, 'TestType', '', 1, 'test-source', ''
+        )
+
+        rows = [
+            (42,) + common + (100, 'part-a', 1000, 'x', 'integer', ''),
+            (42,) + common + (100, 'part-a', 1001, 'y', 'text', ''),
+            (42,) + common + (101, 'part-b', 1002, 'z', 'integer', ''),
+            (42,) + common + (102, 'part-empty', None, None, None, None),
+            (43,) + common[:-3] + (2, 'other-source', '') + (
+                None, None, None, None, None, None
+            ),
+        ]
+
+        trend_stores = TrendStore.from_joined_rows(rows)
+
+        self.assertEqual([ts.id for ts in trend_stores], [42, 43])
+
+        trend_store = trend_stores[0]
+
+        self.assertEqual(trend_store.entity_type.name, 'TestType')
+        self.assertEqual(trend_store.data_source.name, 'test-source')
+        self.assertEqual(
+            [part.name for part in trend_store.parts],
+            ['part-a', 'part-b', 'part-empty']
+        )
+        self.assertEqual(
+            [trend.name for trend in trend_store.part_by_name['part-a'].trends],
+            ['x', 'y']
+        )
+        self.assertIs(trend_store._trend_part_mapping['z'].trend_store, trend_store)
+        self.assertEqual(trend_store.part_by_name['part-empty'].trends, [])
+
+        self.assertEqual(trend_stores[1].parts, [])
+        self.assertEqual(trend_stores[1].data_source.name, 'other-source')
+
+    def test_warm_cache(self):
+        rows = [
+            (42, '1 day', 86400, '30 days', 11, 'TestType', '', 1, 'test-source', '',
+             100, 'part-a', 1000, 'x', 'integer', ''),
+        ]
+
+        class Cursor:
+            def execute(self, query, args=None):
+                self.query = query
+
+            def fetchall(self):
+                return rows
+
+        metadata_cache.clear()
+
+        try:
+            self.assertEqual(TrendStore.warm_cache()(Cursor()), 1)
+
+            trend_store = TrendStore.get_by_entity_type_name(
+                DataSource(1, 'test-source', ''), 'testtype',
+                create_granularity('1 day')
+            )(None)
+
+            self.assertEqual(trend_store.id, 42)
+            self.assertEqual(metadata_cache.hits, 1)
+        finally:
+            metadata_cache.clear()
+
 # Removed - old version
 #
 #    def test_base_table_name(self):
@@ -31,3 +110,339 @@ class TestTrendStore(unittest.TestCase):
 #        )
 #
 #        self.assertEqual(trend_store.table_name(), 'test-trend-store')
+
+
+class CountingRef(EntityRef):
+    """Maps names like 'e12' to 12 and counts the mappings."""
+    map_count = 0
+
+    @classmethod
+    def map_to_entity_ids(cls, entity_refs):
+        def f(cursor):
+            cls.map_count += 1
+
+            return [int(ref[1:]) for ref in entity_refs]
+
+        return f
+
+
+class StoreCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def close(self):
+        pass
+
+    def execute(self, query, args=None):
+        self.conn.queries.append(query)
+
+    def fetchone(self):
+        return (datetime(2020, 1, 1, 12, 5),)
+
+
+class StoreConnection:
+    def __init__(self):
+        self.queries = []
+        self.commit_count = 0
+        self.rollback_count = 0
+
+    def cursor(self):
+        return StoreCursor(self)
+
+    def commit(self):
+        self.commit_count += 1
+
+    def rollback(self):
+        self.rollback_count += 1
+
+
+class TestTrendStoreStore(unittest.TestCase):
+    def setUp(self):
+        CountingRef.map_count = 0
+
+        self.trend_store = TrendStore(
+            42, DataSource(1, 'src', ''), EntityType(11, 'cell', ''),
+            create_granularity('900s'), 86400, '30 days'
+        )
+
+        self.trend_store.parts = [
+            TrendStorePart(
+                part_id, self.trend_store, name,
+                [Trend(i, trend, datatype.registry['integer'], part_id, '')
+                 for i, trend in enumerate(trends)]
+            )
+            for part_id, name, trends in [
+                (100, 'part-a', ['x', 'y']), (101, 'part-b', ['z'])
+            ]
+        ]
+        self.trend_store.index_parts()
+
+        self.package_type = DataPackageType('cell', CountingRef, lambda p: 'cell')
+        self.trend_descriptors = [
+            Trend.Descriptor(name, datatype.registry['integer'], '')
+            for name in ['x', 'y', 'z']
+        ]
+        self.timestamps = [
+            datetime(2020, 1, 1, 12, 0) + timedelta(minutes=15 * i) for i in range(2)
+        ]
+        self.rows = [
+            (f'e{entity}', timestamp, (1, 2, 3))
+            for entity in range(3) for timestamp in self.timestamps
+        ]
+
+    def store_calls(self, package, side_effect=None):
+        conn = StoreConnection()
+        calls = []
+
+        def store_copy_from(
+                part, data_package, modified, job_id, table=None,
+                binary_copy=False, duplicate_policy=None):
+            def f(cursor):
+                calls.append(
+                    ('copy', part.name, data_package.refined_rows(cursor))
+                )
+
+                if side_effect is not None:
+                    side_effect()
+
+            return f
+
+        def store_via_staging(
+                part, data_package, modified, job_id, binary_copy=False,
+                duplicate_policy=None):
+            def f(cursor):
+                calls.append(
+                    ('staging', part.name, data_package.refined_rows(cursor))
+                )
+
+            return f
+
+        with mock.patch.object(TrendStorePart, 'store_copy_from', store_copy_from), \
+                mock.patch.object(TrendStorePart, 'store_via_staging', store_via_staging):
+            self.trend_store.store(package, 7)(conn)
+
+        return conn, calls
+
+    def test_store_parts_in_one_transaction(self):
+        for package in [
+            DataPackage(self.package_type, self.trend_store.granularity,
+                        self.trend_descriptors, self.rows),
+            ColumnarDataPackage.from_package(
+                DataPackage(self.package_type, self.trend_store.granularity,
+                            self.trend_descriptors, self.rows)
+            ),
+        ]:
+            CountingRef.map_count = 0
+
+            conn, calls = self.store_calls(package)
+
+            self.assertEqual(CountingRef.map_count, 1)
+            self.assertEqual(conn.commit_count, 1)
+            self.assertEqual([call[:2] for call in calls], [
+                ('copy', 'part-a'), ('copy', 'part-b')
+            ])
+            self.assertEqual(calls[0][2][0], (0, self.timestamps[0], (1, 2)))
+            self.assertEqual(calls[1][2][0], (0, self.timestamps[0], (3,)))
+
+            # One query for the timestamp and one to mark all parts modified
+            self.assertEqual(len(conn.queries), 2)
+            self.assertIn('mark_modified', conn.queries[1])
+
+    def test_existing_records_via_staging(self):
+        def fail():
+            raise UniqueViolation()
+
+        package = DataPackage(
+            self.package_type, self.trend_store.granularity,
+            self.trend_descriptors, self.rows
+        )
+
+        conn, calls = self.store_calls(package, fail)
+
+        self.assertEqual(conn.rollback_count, 1)
+        self.assertEqual(conn.commit_count, 1)
+        self.assertEqual(CountingRef.map_count, 2)
+        self.assertEqual([call[:2] for call in calls], [
+            ('copy', 'part-a'), ('staging', 'part-a'), ('staging', 'part-b')
+        ])
+
+
+class CopyConnection(StoreConnection):
+    class Info:
+        @staticmethod
+        def parameter_status(name):
+            return 'UTC'
+
+    info = Info()
+
+
+class CopyCursor(StoreCursor):
+    """Reads the COPY data like psycopg2 does, including its error handling."""
+
+    def __init__(self, conn):
+        StoreCursor.__init__(self, conn)
+        self.connection = conn
+        self.copied = []
+
+    def copy_expert(self, query, file, size=8192):
+        try:
+            while True:
+                data = file.read(size)
+
+                if not data:
+                    break
+
+                self.copied.append(data)
+        except Exception:
+            raise psycopg2.extensions.QueryCanceledError('error in .read() call')
+
+
+class TestTrendStorePartCopyErrors(unittest.TestCase):
+    def setUp(self):
+        self.part = TrendStorePart(
+            100, None, 'part-a',
+            [Trend(1, 'x', datatype.registry['integer'], 100, '')]
+        )
+
+        self.package = DataPackage(
+            DataPackageType('cell', CountingRef, lambda p: 'cell'),
+            create_granularity('900s'),
+            [Trend.Descriptor('x', datatype.registry['integer'], '')],
+            [('e1', datetime(2020, 1, 1, 12, 0), ('not a number',))]
+        )
+
+    def test_binary_value_mismatch(self):
+        cursor = CopyCursor(CopyConnection())
+
+        with self.assertRaises(DataTypeMismatch) as context:
+            self.part.store_copy_from(
+                self.package, datetime(2020, 1, 1, 12, 5), 7, binary_copy=True
+            )(cursor)
+
+        self.assertIn('not a number', str(context.exception))
+
+    def test_store_rolls_back_on_mismatch(self):
+        conn = CopyConnection()
+        conn.cursor = lambda: CopyCursor(conn)
+
+        with self.assertRaises(DataTypeMismatch):
+            self.part.store(self.package, 7, binary_copy=True)(conn)
+
+        self.assertEqual(conn.rollback_count, 1)
+        self.assertEqual(conn.commit_count, 0)
+
+
+class TestTrendStorePartDuplicatePolicy(unittest.TestCase):
+    def setUp(self):
+        self.part = TrendStorePart(
+            100, None, 'part-a',
+            [Trend(1, 'x', datatype.registry['integer'], 100, '')]
+        )
+
+        timestamp = datetime(2020, 1, 1, 12, 0)
+
+        self.package = DataPackage(
+            DataPackageType('cell', CountingRef, lambda p: 'cell'),
+            create_granularity('900s'),
+            [Trend.Descriptor('x', datatype.registry['integer'], '')],
+            [('e1', timestamp, (1,)), ('e1', timestamp, (2,))]
+        )
+
+    def copied_values(self, **kwargs):
+        cursor = CopyCursor(CopyConnection())
+
+        self.part.store_copy_from(
+            self.package, datetime(2020, 1, 1, 12, 5), 7, **kwargs
+        )(cursor)
+
+        return [line.split('\t')[-1] for line in ''.join(cursor.copied).splitlines()]
+
+    def test_keep_last_by_default(self):
+        self.assertEqual(self.copied_values(), ['2'])
+
+    def test_policy_per_call(self):
+        self.assertEqual(
+            self.copied_values(duplicate_policy=DUPLICATES_KEEP_FIRST), ['1']
+        )
+        self.assertEqual(self.copied_values(duplicate_policy=None), ['1', '2'])
+        self.assertEqual(self.copied_values(), ['2'])
+
+    def test_keep_all_existing_records(self):
+        """
+        With policy None, duplicates that fail the first COPY are stored
+        through a deduplicated staging table.
+        """
+        conn = CopyConnection()
+        cursors = []
+
+        def cursor():
+            cursors.append(CopyCursor(conn))
+
+            if len(cursors) == 1:
+                def copy_expert(query, file, size=8192):
+                    raise UniqueViolation()
+
+                cursors[0].copy_expert = copy_expert
+
+            return cursors[-1]
+
+        conn.cursor = cursor
+
+        self.part.store(self.package, 7, duplicate_policy=None)(conn)
+
+        self.assertEqual(conn.rollback_count, 1)
+        self.assertEqual(conn.commit_count, 1)
+
+        copied = ''.join(cursors[1].copied).splitlines()
+
+        self.assertEqual([line.split('\t')[-1] for line in copied], ['1', '2'])
+
+        queries = [sql_fragments(query) for query in conn.queries]
+        delete_index = next(
+            index for index, query in enumerate(queries)
+            if query.startswith('DELETE') and 'ctid < later.ctid' in query
+        )
+        insert_index = next(
+            index for index, query in enumerate(queries)
+            if query.startswith('INSERT')
+        )
+
+        self.assertLess(delete_index, insert_index)
+
+
+def sql_fragments(composable):
+    """Return the literal SQL parts of a composed query as one string."""
+    if isinstance(composable, sql.Composed):
+        return "".join(sql_fragments(part) for part in composable)
+    elif isinstance(composable, sql.SQL):
+        return composable.string
+    else:
+        return "?"
+
+
+class TestTrendStorePartStaging(unittest.TestCase):
+    def test_tmp_table_name_from_id(self):
+        """Long part names must not lead to truncated, clashing names."""
+        conn = StoreConnection()
+
+        part = TrendStorePart(100, None, 'x' * 80, [])
+
+        tmp_table = part._create_tmp_table()(conn.cursor())
+
+        self.assertEqual(tmp_table.name, 'tmp_part_100')
+
+    def test_copy_missing_updates_on_conflict(self):
+        """Concurrently inserted records must not fail the staging insert."""
+        conn = StoreConnection()
+
+        TrendStorePart._copy_missing_from_tmp(
+            Table("pg_temp", "tmp_part"), Table("trend", "part"), ["x"]
+        )(conn.cursor())
+
+        query = sql_fragments(conn.queries[0])
+
+        self.assertIn("WHERE ?.entity_id IS NULL", query)
+        self.assertIn(
+            'ON CONFLICT (entity_id, "timestamp") DO UPDATE SET ?=?, ?=?',
+            query
+        )